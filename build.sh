@@ -0,0 +1,12 @@
+#!/usr/bin/env bash
+# Build de Render: python manage.py ... antes de arrancar gunicorn.
+# WhiteNoise solo sirve los archivos que existen en STATIC_ROOT al arrancar,
+# así que todo lo que se escribe ahí (collectstatic y generar_textos) tiene
+# que generarse aquí y no después.
+set -o errexit
+
+pip install -r requirements.txt
+
+python manage.py collectstatic --no-input
+python manage.py migrate --no-input
+python manage.py generar_textos
@@ -67,6 +67,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'usuarios.middleware.PlanAccessMiddleware',
+    'usuarios.middleware.UserActivityMiddleware',
 ]
 
 ROOT_URLCONF = 'campayo.urls'
@@ -168,6 +170,11 @@ STATICFILES_DIRS = [
 # Configuración de WhiteNoise para servir archivos estáticos en producción
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Archivos con hash en el nombre (nombre.hash.ext): los de collectstatic y los
+# textos de tests generados con `manage.py generar_textos`. Se sirven con
+# caché de un año e immutable.
+WHITENOISE_IMMUTABLE_FILE_TEST = r'^.+\.[0-9a-f]{12}\.\w+$'
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -184,6 +191,9 @@ LOGIN_URL = '/usuarios/login/'
 LOGIN_REDIRECT_URL = '/usuarios/dashboard/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Segundos entre escrituras de la última actividad de los usuarios (ultima_actividad)
+INTERVALO_ACTIVIDAD = config('INTERVALO_ACTIVIDAD', default=300, cast=int)
+
 # ============================================================================
 # EMAIL CONFIGURATION
 # ============================================================================
@@ -206,6 +216,12 @@ SERVER_EMAIL = config('SERVER_EMAIL', default='servidor@campayo.com')
 # Site URL para enlaces en emails
 SITE_URL = config('SITE_URL', default='http://localhost:8000')
 
+# Aviso a gestores de nuevas solicitudes de cambio de plan: 'inmediato' (un
+# email por solicitud) o 'resumen' (un email por gestor cada
+# RESUMEN_SOLICITUDES_MINUTOS, enviado por el comando enviar_resumen_solicitudes)
+NOTIFICACION_SOLICITUDES = config('NOTIFICACION_SOLICITUDES', default='inmediato')
+RESUMEN_SOLICITUDES_MINUTOS = config('RESUMEN_SOLICITUDES_MINUTOS', default=60, cast=int)
+
 # ============================================================================
 # LOGGING CONFIGURATION
 # ============================================================================
@@ -0,0 +1,64 @@
+# ejercicios/acceso.py
+from .prerequisitos import obtener_grafo, BLOQUE, TEST
+
+
+class EvaluadorAcceso:
+    """
+    Evalúa en memoria el acceso de un usuario a todo el catálogo de ejercicios.
+
+    Toma los ejercicios realizados y los tests y bloques completados de la
+    foto de progreso del usuario (usuarios.progreso) y consulta los requisitos
+    de cada bloque en el grafo de prerequisitos compilado. A partir de ahí
+    responde lo mismo que Ejercicio.puede_acceder_con_detalles sin volver a
+    consultar la base de datos. Acepta tanto modelos Ejercicio como registros
+    del catálogo (ejercicios.catalogo).
+    """
+
+    def __init__(self, usuario):
+        from usuarios.progreso import obtener_progreso
+
+        self.usuario = usuario
+        self.progreso = obtener_progreso(usuario)
+
+        # Requisitos pendientes de todos los bloques, comprobados de una vez
+        grafo = obtener_grafo()
+        nodos_bloque = [nodo for nodo in grafo.requisitos if nodo[0] == BLOQUE]
+        self.pendientes_por_bloque = {
+            nodo[1]: pendientes
+            for nodo, pendientes in grafo.evaluar(nodos_bloque, grafo.satisfechos(self.progreso)).items()
+        }
+
+    def test_completado(self, test_nombre):
+        """Indica si el usuario tiene el test marcado como completado."""
+        return self.progreso.test_completado(test_nombre)
+
+    def bloque_completado(self, bloque_numero):
+        """Indica si el usuario ha completado todos los ejercicios del bloque."""
+        return self.progreso.bloque_completado(bloque_numero)
+
+    def puede_acceder(self, ejercicio):
+        """
+        Devuelve (puede_acceder, motivo) para un ejercicio.
+        """
+        if not ejercicio.activo:
+            return False, "Ejercicio no disponible"
+
+        if self.usuario.es_gestor():
+            return True, ""
+
+        if ejercicio.requiere_pro and not self.usuario.es_pro():
+            return False, "Requiere plan Pro"
+
+        # Verificar requisitos del bloque
+        pendientes = self.pendientes_por_bloque.get(ejercicio.bloque)
+        if pendientes:
+            tipo, valor = pendientes[0]
+            if tipo == TEST:
+                return False, f"Debes completar el test: {valor}"
+            return False, f"Debes completar todos los ejercicios del bloque {valor}"
+
+        return True, ""
+
+    def completado(self, ejercicio):
+        """Indica si el usuario ya ha realizado el ejercicio."""
+        return self.progreso.ejercicio_realizado(ejercicio.codigo)
@@ -1,6 +1,7 @@
 # ejercicios/admin.py
 from django.contrib import admin
 from .models import CategoriaEjercicio, Ejercicio, BloquePrevio
+from .catalogo import invalidar_catalogo
 
 
 @admin.register(CategoriaEjercicio)
@@ -53,16 +54,19 @@ class EjercicioAdmin(admin.ModelAdmin):
     
     def activar_ejercicios(self, request, queryset):
         queryset.update(activo=True)
+        invalidar_catalogo()  # update() no emite post_save
         self.message_user(request, f'{queryset.count()} ejercicios activados')
     activar_ejercicios.short_description = "Activar ejercicios seleccionados"
     
     def desactivar_ejercicios(self, request, queryset):
         queryset.update(activo=False)
+        invalidar_catalogo()  # update() no emite post_save
         self.message_user(request, f'{queryset.count()} ejercicios desactivados')
     desactivar_ejercicios.short_description = "Desactivar ejercicios seleccionados"
     
     def marcar_como_pro(self, request, queryset):
         queryset.update(requiere_pro=True)
+        invalidar_catalogo()  # update() no emite post_save
         self.message_user(request, f'{queryset.count()} ejercicios marcados como Pro')
     marcar_como_pro.short_description = "Marcar como ejercicios Pro"
     
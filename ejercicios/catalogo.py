@@ -0,0 +1,182 @@
+# ejercicios/catalogo.py
+from collections import defaultdict
+from types import MappingProxyType
+
+from .versionado import RegistroVersionado
+
+CLAVE_VERSION = 'catalogo:version'
+
+
+class _Registro:
+    """
+    Registro compacto e inmutable: sin __dict__ y sin asignación tras crearse.
+    """
+    __slots__ = ()
+
+    def __init__(self, **valores):
+        for campo in self.__slots__:
+            object.__setattr__(self, campo, valores[campo])
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError(f"{type(self).__name__} es de solo lectura")
+
+    def __delattr__(self, nombre):
+        raise AttributeError(f"{type(self).__name__} es de solo lectura")
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self}>"
+
+
+class CategoriaCatalogo(_Registro):
+    """Datos de una CategoriaEjercicio."""
+    __slots__ = ('id', 'codigo', 'nombre', 'descripcion', 'orden', 'activa')
+
+    def __str__(self):
+        return f"{self.codigo}: {self.nombre}"
+
+
+class EjercicioCatalogo(_Registro):
+    """
+    Datos de un Ejercicio necesarios para listar y comprobar acceso.
+    El contenido (descripción, instrucciones, configuración) sigue en la base de datos.
+    """
+    __slots__ = (
+        'id', 'codigo', 'nombre', 'categoria_id', 'categoria_codigo',
+        'nivel', 'bloque', 'orden_en_bloque', 'activo', 'requiere_pro',
+    )
+
+    def __str__(self):
+        return f"{self.codigo} - {self.nombre} (Nivel {self.nivel})"
+
+    @property
+    def codigo_base(self):
+        """Código sin el nivel. Ejemplo: EL1_N1 -> EL1, EO2_N3 -> EO2"""
+        return self.codigo.split('_')[0]
+
+
+class BloquePrevioCatalogo(_Registro):
+    """Requisitos de un bloque, con los bloques requeridos ya convertidos a enteros."""
+    __slots__ = ('bloque_actual', 'bloques_requeridos', 'test_requerido')
+
+    def __str__(self):
+        return f"Bloque {self.bloque_actual} - Requiere: {self.bloques_requeridos}"
+
+
+def _indexar(ejercicios, campo):
+    indice = defaultdict(list)
+    for ejercicio in ejercicios:
+        indice[getattr(ejercicio, campo)].append(ejercicio)
+    return MappingProxyType({clave: tuple(valores) for clave, valores in indice.items()})
+
+
+class CatalogoEjercicios:
+    """
+    Catálogo inmutable de categorías, ejercicios y requisitos de bloque.
+
+    Los ejercicios se indexan por id, código, categoría, bloque y nivel.
+    Las consultas de solo lectura sobre Ejercicio se resuelven aquí en lugar
+    de ir a la base de datos; el catálogo se reconstruye cuando cambia su
+    versión (ver ejercicios.signals y ejercicios.versionado).
+    """
+
+    def __init__(self, categorias, ejercicios, bloques_previos):
+        self.categorias = tuple(sorted(categorias, key=lambda c: (c.orden, c.id)))
+        self.ejercicios = tuple(ejercicios)
+        self.bloques_previos = MappingProxyType({b.bloque_actual: b for b in bloques_previos})
+
+        self.por_id = MappingProxyType({e.id: e for e in self.ejercicios})
+        self.por_codigo = MappingProxyType({e.codigo: e for e in self.ejercicios})
+
+        ordenados = sorted(self.ejercicios, key=lambda e: (e.nivel, e.orden_en_bloque, e.id))
+        self.por_categoria = _indexar(ordenados, 'categoria_id')
+        self.por_bloque = _indexar(ordenados, 'bloque')
+        self.por_nivel = _indexar(ordenados, 'nivel')
+
+    @classmethod
+    def cargar(cls):
+        """Construye el catálogo con una consulta por modelo."""
+        from .models import CategoriaEjercicio, Ejercicio, BloquePrevio
+
+        categorias = [
+            CategoriaCatalogo(
+                id=c.id, codigo=c.codigo, nombre=c.nombre,
+                descripcion=c.descripcion, orden=c.orden, activa=c.activa
+            )
+            for c in CategoriaEjercicio.objects.all()
+        ]
+        codigos_categoria = {c.id: c.codigo for c in categorias}
+
+        campos = ('id', 'codigo', 'nombre', 'categoria_id', 'nivel', 'bloque',
+                  'orden_en_bloque', 'activo', 'requiere_pro')
+        ejercicios = [
+            EjercicioCatalogo(categoria_codigo=codigos_categoria.get(fila['categoria_id'], ''), **fila)
+            for fila in Ejercicio.objects.values(*campos)
+        ]
+
+        bloques_previos = [
+            BloquePrevioCatalogo(
+                bloque_actual=b.bloque_actual,
+                bloques_requeridos=tuple(b.get_bloques_requeridos_list()),
+                test_requerido=b.test_requerido
+            )
+            for b in BloquePrevio.objects.all()
+        ]
+        return cls(categorias, ejercicios, bloques_previos)
+
+    def categorias_activas(self):
+        """Categorías activas en su orden de presentación."""
+        return [categoria for categoria in self.categorias if categoria.activa]
+
+    def ejercicio(self, ejercicio_id):
+        """Ejercicio por id (acepta el id como texto, p.ej. de un POST) o None."""
+        try:
+            return self.por_id.get(int(ejercicio_id))
+        except (TypeError, ValueError):
+            return None
+
+    def activos(self, categoria_id=None, bloque=None, nivel=None):
+        """
+        Ejercicios activos, opcionalmente filtrados por categoría, bloque y/o nivel,
+        ordenados por nivel y orden en el bloque.
+        """
+        # Partir del índice más selectivo y filtrar el resto en memoria
+        candidatos = None
+        for indice, clave in ((self.por_categoria, categoria_id),
+                              (self.por_bloque, bloque),
+                              (self.por_nivel, nivel)):
+            if clave is None:
+                continue
+            seleccion = indice.get(clave, ())
+            if candidatos is None or len(seleccion) < len(candidatos):
+                candidatos = seleccion
+        if candidatos is None:
+            candidatos = sorted(self.ejercicios, key=lambda e: (e.nivel, e.orden_en_bloque, e.id))
+
+        return [
+            e for e in candidatos
+            if e.activo
+            and (categoria_id is None or e.categoria_id == categoria_id)
+            and (bloque is None or e.bloque == bloque)
+            and (nivel is None or e.nivel == nivel)
+        ]
+
+
+_registro = RegistroVersionado(CLAVE_VERSION, CatalogoEjercicios.cargar)
+
+
+def obtener_catalogo():
+    """
+    Devuelve el catálogo del proceso. Solo se reconstruye cuando cambia su
+    versión en la base de datos, es decir, cuando se modifican categorías,
+    ejercicios o requisitos de bloque (ver ejercicios.versionado).
+    """
+    return _registro.obtener()
+
+
+def invalidar_catalogo():
+    """
+    Marca el catálogo como obsoleto en todos los procesos, que lo reconstruyen
+    en cuanto revisan la versión (REVISION_VERSION segundos como mucho).
+    Hay que llamarla también tras un queryset.update(), que no emite señales.
+    """
+    _registro.invalidar()
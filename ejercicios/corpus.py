@@ -0,0 +1,232 @@
+# ejercicios/corpus.py
+import hashlib
+import json
+import logging
+import random
+from functools import lru_cache
+from types import MappingProxyType
+
+from django.db import DatabaseError
+from django.utils.cache import quote_etag
+
+from .catalogo import _Registro
+from .versionado import RegistroVersionado
+
+logger = logging.getLogger(__name__)
+
+CLAVE_VERSION = 'corpus:version'
+
+# Requisitos de un test de lectura para usarse en los ejercicios EL5-EL8
+PALABRAS_MINIMAS = 300
+CARACTERES_MINIMOS = 100
+
+# Si hay menos tests válidos que esto se añaden los textos por defecto
+TEXTOS_MINIMOS = 6
+
+# Máximo de párrafos que se sirven en un fragmento (el.js pide de 4 a 8)
+PARRAFOS_POR_FRAGMENTO = 8
+
+# Fragmentos serializados que se guardan por proceso. No van a la caché de
+# Django: es la de las sesiones y las estadísticas, y cada rango y
+# maquetación distintos serían una entrada más que las desalojaría
+FRAGMENTOS_EN_MEMORIA = 256
+
+TEXTOS_POR_DEFECTO = (
+    {
+        'name': 'Lectura Rápida Campayo',
+        'text_content': '''La técnica de lectura rápida desarrollada por Ramón Campayo ha revolucionado la forma en que miles de personas procesan información escrita. Este método se basa en principios científicos que permiten incrementar la velocidad de lectura sin sacrificar la comprensión.
+
+El entrenamiento visual es fundamental para desarrollar esta habilidad. Los ojos deben aprender a realizar movimientos más eficientes, reduciendo las fijaciones y ampliando el campo de visión periférica. La práctica constante de ejercicios específicos fortalece estos músculos oculares.
+
+La concentración mental juega un papel crucial en el proceso. Cuando la mente está relajada pero alerta, el cerebro puede procesar información a velocidades sorprendentes. Las técnicas de relajación y meditación complementan perfectamente el entrenamiento técnico.
+
+Los resultados obtenidos por los estudiantes del método Campayo son extraordinarios. Muchos han logrado multiplicar por cinco o diez su velocidad de lectura inicial, manteniendo e incluso mejorando su nivel de comprensión. Esto se traduce en ventajas significativas tanto en el ámbito académico como profesional.''',
+        'word_count': 167
+    },
+    {
+        'name': 'Neuroplasticidad y Aprendizaje',
+        'text_content': '''El cerebro humano posee una capacidad extraordinaria para adaptarse y reorganizarse. Esta propiedad, conocida como neuroplasticidad, permite que las conexiones neuronales se modifiquen y fortalezcan a través del entrenamiento y la práctica deliberada.
+
+La lectura rápida aprovecha esta neuroplasticidad para crear nuevas rutas neuronales más eficientes. Cuando practicamos ejercicios de velocidad de lectura, estamos literalmente reentrenando nuestro cerebro para procesar información visual de manera más efectiva.
+
+Los estudios en neurociencia han demostrado que el entrenamiento visual intensivo puede modificar la estructura y función de áreas cerebrales específicas. Las regiones responsables del procesamiento visual y la comprensión lectora se vuelven más activas y coordinadas.
+
+Este proceso de reorganización neural no tiene límites de edad. Tanto jóvenes como adultos pueden beneficiarse del entrenamiento en lectura rápida, desarrollando habilidades que permanecerán activas durante toda la vida. La clave está en la consistencia y la práctica regular.''',
+        'word_count': 162
+    },
+    {
+        'name': 'Tecnología y Educación',
+        'text_content': '''La integración de la tecnología en los procesos educativos ha transformado radicalmente la manera en que adquirimos y procesamos conocimientos. Las herramientas digitales ofrecen posibilidades antes impensables para personalizar el aprendizaje según las necesidades individuales de cada estudiante.
+
+Los dispositivos móviles y las aplicaciones especializadas permiten llevar el entrenamiento de lectura rápida a cualquier lugar. Esta flexibilidad facilita la práctica regular, elemento esencial para el desarrollo de habilidades de velocidad lectora. La gamificación convierte el aprendizaje en una experiencia más atractiva y motivadora.
+
+Las plataformas online pueden adaptar automáticamente el nivel de dificultad según el progreso del usuario. Los algoritmos de inteligencia artificial analizan el rendimiento en tiempo real y sugieren ejercicios específicos para mejorar áreas débiles. Esta personalización optimiza significativamente los resultados del entrenamiento.
+
+La realidad virtual y aumentada abren nuevas fronteras en el entrenamiento visual. Estas tecnologías permiten crear entornos tridimensionales donde los ojos pueden practicar movimientos y patrones de lectura en espacios virtuales, expandiendo las posibilidades tradicionales del entrenamiento en papel.''',
+        'word_count': 185
+    },
+    {
+        'name': 'Memoria y Comprensión',
+        'text_content': '''La relación entre velocidad de lectura y comprensión es uno de los aspectos más fascinantes del método Campayo. Contrariamente a la creencia popular, aumentar la velocidad de lectura puede mejorar la comprensión y retención de información.
+
+Cuando leemos lentamente, la mente tiende a divagar y perder concentración. El cerebro procesa información mucho más rápido de lo que generalmente leemos, creando espacios vacíos que se llenan con pensamientos irrelevantes. La lectura rápida mantiene la mente ocupada y enfocada.
+
+Las técnicas de memorización se complementan perfectamente con la lectura acelerada. Los mapas mentales, las asociaciones visuales y los métodos mnemotécnicos permiten organizar y retener grandes cantidades de información procesada a alta velocidad.
+
+La práctica regular desarrolla una forma de lectura más activa e interactiva. El lector rápido no solo consume información pasivamente, sino que la analiza, relaciona y organiza mentalmente mientras lee. Este proceso activo mejora significativamente la comprensión y el aprendizaje.''',
+        'word_count': 158
+    },
+)
+
+
+class TextoCorpus(_Registro):
+    """
+    Texto de lectura listo para los ejercicios.
+
+    - test_id: TestLectura de origen, o None si es un texto por defecto
+    - parrafos: tupla de párrafos no vacíos, igual que los separa el.js
+    - hash: huella del contenido; identifica el texto mientras no cambie
+    """
+    __slots__ = ('test_id', 'nombre', 'palabras', 'parrafos', 'hash')
+
+    def __str__(self):
+        return f"{self.nombre} ({self.palabras} palabras)"
+
+    @classmethod
+    def crear(cls, test_id, nombre, contenido, palabras):
+        parrafos = tuple(parrafo for parrafo in contenido.split('\n') if parrafo.strip())
+        huella = hashlib.sha256('\n'.join(parrafos).encode('utf-8')).hexdigest()[:16]
+        return cls(test_id=test_id, nombre=nombre, palabras=palabras, parrafos=parrafos, hash=huella)
+
+    @property
+    def texto(self):
+        return '\n\n'.join(self.parrafos)
+
+    def fragmento(self, desde, hasta):
+        """
+        Párrafos [desde, hasta) unidos como los une el.js. Lanza ValueError
+        si el rango no es válido o supera PARRAFOS_POR_FRAGMENTO.
+        """
+        if not 0 <= desde < hasta <= len(self.parrafos) or hasta - desde > PARRAFOS_POR_FRAGMENTO:
+            raise ValueError(f"Rango de párrafos no válido: {desde}-{hasta}")
+        return '\n\n'.join(self.parrafos[desde:hasta])
+
+
+def _textos_por_defecto():
+    return [
+        TextoCorpus.crear(None, texto['name'], texto['text_content'], texto['word_count'])
+        for texto in TEXTOS_POR_DEFECTO
+    ]
+
+
+class CorpusLectura:
+    """
+    Conjunto inmutable de textos para los ejercicios de lectura EL5-EL8.
+
+    Sustituye al muestreo con order_by('?') sobre TestLectura: los textos se
+    cargan una vez por versión y se eligen por índice, así que muestrear k
+    textos cuesta O(k) y no toca la base de datos.
+    """
+
+    def __init__(self, textos):
+        self.textos = tuple(textos)
+        self.por_hash = MappingProxyType({texto.hash: texto for texto in self.textos})
+
+    def __len__(self):
+        return len(self.textos)
+
+    @classmethod
+    def cargar(cls):
+        """Carga los tests de lectura válidos con una consulta."""
+        from test_lectura.models import TestLectura
+
+        textos = []
+        filas = TestLectura.objects.filter(
+            activo=True,
+            numero_palabras__gte=PALABRAS_MINIMAS
+        ).order_by('id').values_list('id', 'titulo', 'nombre', 'texto_contenido', 'numero_palabras')
+        for test_id, titulo, nombre, contenido, numero_palabras in filas:
+            contenido = (contenido or '').strip()
+            if len(contenido) > CARACTERES_MINIMOS:
+                textos.append(TextoCorpus.crear(
+                    test_id,
+                    titulo or nombre or f'Test {test_id}',
+                    contenido,
+                    numero_palabras or len(contenido.split())
+                ))
+
+        if len(textos) < TEXTOS_MINIMOS:
+            textos.extend(_textos_por_defecto())
+        return cls(textos)
+
+    def muestrear(self, k):
+        """Devuelve hasta k textos distintos elegidos al azar."""
+        indices = random.sample(range(len(self.textos)), min(k, len(self.textos)))
+        return [self.textos[indice] for indice in indices]
+
+    def texto(self, huella):
+        """Texto con ese hash de contenido, o None."""
+        return self.por_hash.get(huella)
+
+
+_registro = RegistroVersionado(CLAVE_VERSION, CorpusLectura.cargar)
+
+
+def obtener_corpus():
+    """
+    Devuelve el corpus vigente del proceso. Se reconstruye cuando cambia su
+    versión en la base de datos, es decir, cuando se modifica un TestLectura
+    (ver test_lectura.signals y ejercicios.versionado).
+    """
+    return _registro.obtener()
+
+
+def invalidar_corpus():
+    """
+    Marca el corpus como obsoleto en todos los procesos, que lo reconstruyen
+    en cuanto revisan la versión (REVISION_VERSION segundos como mucho).
+    """
+    _registro.invalidar()
+
+
+def muestrear_textos(k):
+    """
+    Elige k textos del corpus. Si no se puede cargar, usa los textos por
+    defecto para que el ejercicio siga funcionando.
+    """
+    try:
+        return obtener_corpus().muestrear(k)
+    except DatabaseError as e:
+        logger.error(f"CORPUS: no se pudieron cargar los tests de lectura: {e}")
+        return CorpusLectura(_textos_por_defecto()).muestrear(k)
+
+
+@lru_cache(maxsize=FRAGMENTOS_EN_MEMORIA)
+def obtener_fragmento(texto, desde, hasta, palabras_por_linea=None, segmentos_por_linea=1):
+    """
+    Devuelve (cuerpo, etag) del fragmento [desde, hasta) de un texto del
+    corpus: el JSON ya serializado y su ETag fuerte. Si se indican palabras
+    por línea, el JSON incluye también las líneas y segmentos ya calculados
+    (ver ejercicios.maquetacion).
+    Se calcula una vez por proceso para cada texto y parámetros; los textos
+    del corpus son inmutables, así que nunca queda obsoleto, y el navegador
+    no lo vuelve a pedir (ETag y Cache-Control immutable en la vista).
+    Lanza ValueError si el rango no es válido.
+    """
+    from .maquetacion import maquetar
+
+    contenido = texto.fragmento(desde, hasta)
+    datos = {
+        'success': True,
+        'hash': texto.hash,
+        'name': texto.nombre,
+        'desde': desde,
+        'hasta': hasta,
+        'total_parrafos': len(texto.parrafos),
+        'text_content': contenido
+    }
+    if palabras_por_linea:
+        datos.update(maquetar(contenido, palabras_por_linea, segmentos_por_linea).como_dict())
+
+    cuerpo = json.dumps(datos).encode('utf-8')
+    return cuerpo, quote_etag(hashlib.sha256(cuerpo).hexdigest()[:32])
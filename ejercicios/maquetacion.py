@@ -0,0 +1,97 @@
+# ejercicios/maquetacion.py
+import math
+import re
+from array import array
+from functools import lru_cache
+
+# Parámetros de maquetación de los ejercicios de lectura, igual que en el.js:
+# (palabras por línea, segmentos por línea)
+MAQUETACION_POR_EJERCICIO = {
+    'EL5': (2, 1),   # columnas de 2 palabras
+    'EL6': (3, 1),   # columnas de 3 palabras
+    'EL7': (11, 3),  # lectura guiada en 3 fotos por renglón
+    'EL8': (11, 2),  # lectura guiada en 2 fotos por renglón
+}
+
+# Límites admitidos al pedir una maquetación desde el navegador
+PALABRAS_POR_LINEA_MAX = 20
+SEGMENTOS_POR_LINEA_MAX = 4
+
+# Fragmentos distintos maquetados que se guardan por proceso
+MAQUETACIONES_EN_MEMORIA = 512
+
+_FIN_FRASE = re.compile(r'[.!?]+')
+
+
+def maquetacion_de(codigo):
+    """(palabras, segmentos) por línea para un código de ejercicio, o None."""
+    for prefijo, parametros in MAQUETACION_POR_EJERCICIO.items():
+        if prefijo in codigo:
+            return parametros
+    return None
+
+
+class Maquetacion:
+    """
+    Texto partido en líneas y segmentos como lo hace el.js
+    (processTextIntoColumns, processTextForGuidedReading y
+    splitLineIntoSegments).
+
+    - palabras: tupla con todas las palabras del texto
+    - lineas: desplazamientos de palabra; la línea i va de lineas[i] a lineas[i + 1]
+    - cortes: para cada línea, el final de cada segmento relativo a la línea;
+      los de la línea i están entre inicio_cortes[i] e inicio_cortes[i + 1]
+    """
+    __slots__ = ('palabras', 'lineas', 'cortes', 'inicio_cortes')
+
+    def __init__(self, texto, palabras_por_linea, segmentos_por_linea=1):
+        palabras = []
+        lineas = array('I', [0])
+        cortes = array('H')
+        inicio_cortes = array('I', [0])
+
+        for frase in _FIN_FRASE.split(texto):
+            palabras_frase = frase.split()
+            for inicio in range(0, len(palabras_frase), palabras_por_linea):
+                linea = palabras_frase[inicio:inicio + palabras_por_linea]
+                palabras.extend(linea)
+                lineas.append(len(palabras))
+
+                por_segmento = math.ceil(len(linea) / segmentos_por_linea)
+                for segmento in range(segmentos_por_linea):
+                    if segmento * por_segmento < len(linea):
+                        cortes.append(min((segmento + 1) * por_segmento, len(linea)))
+                inicio_cortes.append(len(cortes))
+
+        self.palabras = tuple(palabras)
+        self.lineas = lineas
+        self.cortes = cortes
+        self.inicio_cortes = inicio_cortes
+
+    def __len__(self):
+        return len(self.lineas) - 1
+
+    def linea(self, indice):
+        return ' '.join(self.palabras[self.lineas[indice]:self.lineas[indice + 1]])
+
+    def segmentos(self, indice):
+        """Segmentos de una línea como pares [inicio, fin) de palabras."""
+        cortes = self.cortes[self.inicio_cortes[indice]:self.inicio_cortes[indice + 1]]
+        return [[inicio, fin] for inicio, fin in zip((0,) + tuple(cortes[:-1]), cortes)]
+
+    def como_dict(self):
+        """Líneas y segmentos listos para pintar en el.js."""
+        return {
+            'lineas': [self.linea(indice) for indice in range(len(self))],
+            'segmentos': [self.segmentos(indice) for indice in range(len(self))],
+        }
+
+
+@lru_cache(maxsize=MAQUETACIONES_EN_MEMORIA)
+def maquetar(texto, palabras_por_linea, segmentos_por_linea=1):
+    """
+    Maquetación de un texto. Se calcula una vez por proceso para cada texto
+    y configuración; el propio texto es la clave, así que no hay que
+    invalidar nada cuando cambia un test.
+    """
+    return Maquetacion(texto, palabras_por_linea, segmentos_por_linea)
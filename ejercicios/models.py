@@ -1,4 +1,6 @@
 # ejercicios/models.py
+import uuid
+
 from django.db import models
 
 
@@ -68,71 +70,10 @@ class Ejercicio(models.Model):
     
     def puede_acceder(self, usuario, password=None):
         """
-        Verifica si un usuario puede acceder a este test.
-        LÓGICA DE DESBLOQUEO CORREGIDA
+        Verifica si un usuario puede acceder a este ejercicio.
+        Devuelve (puede_acceder, motivo); ver puede_acceder_con_detalles.
         """
-        if not self.activo:
-            return False, "Test no disponible"
-        
-        if usuario.es_gestor():
-            return True, ""
-        
-        # Verificar plan pro si es requerido
-        if self.requiere_pro and not usuario.es_pro():
-            return False, "Requiere plan Pro"
-        
-        # Verificar password si es requerido
-        if self.requiere_password:
-            if not password or password != self.password_acceso:
-                return False, "Password incorrecto"
-        
-        # LÓGICA ESPECÍFICA POR TIPO DE TEST
-        if self.nombre == 'test_inicial':
-            return True, ""
-        
-        elif self.nombre == 'test_1':
-            # Requiere test_inicial + bloque 1 completo
-            from usuarios.models import ProgresoTests
-            
-            if not ProgresoTests.objects.filter(
-                usuario=usuario,
-                test_nombre='test_inicial',
-                completado=True
-            ).exists():
-                return False, "Debes completar primero el Test Inicial"
-            
-            if not usuario.bloque_completado(1):
-                return False, "Debes completar todos los ejercicios del Bloque 1 (niveles 1, 2 y 3)"
-        
-        elif self.nombre == 'test_2':
-            # Requiere test_1 + bloque 2 completo
-            from usuarios.models import ProgresoTests
-            
-            if not ProgresoTests.objects.filter(
-                usuario=usuario,
-                test_nombre='test_1',
-                completado=True
-            ).exists():
-                return False, "Debes completar primero el Test 1"
-            
-            if not usuario.bloque_completado(2):
-                return False, "Debes completar todos los ejercicios del Bloque 2 (niveles 4, 5 y 6)"
-        
-        else:
-            # Resto de tests: requieren test_2 + bloque 3 completo
-            from usuarios.models import ProgresoTests
-            
-            if not ProgresoTests.objects.filter(
-                usuario=usuario,
-                test_nombre='test_2',
-                completado=True
-            ).exists():
-                return False, "Debes completar primero el Test 2"
-            
-            if not usuario.bloque_completado(3):
-                return False, "Debes completar todos los ejercicios del Bloque 3 (niveles 7, 8 y 9)"
-        
-        return True, ""
+        return self.puede_acceder_con_detalles(usuario)
     
     def get_requisitos_acceso(self, usuario):
         """
@@ -156,45 +97,20 @@ class Ejercicio(models.Model):
     
     def get_requisitos_para_bloque(self):
         """
-        Obtiene los requisitos específicos para acceder al bloque de este ejercicio.
+        Obtiene los requisitos específicos para acceder al bloque de este ejercicio,
+        como nodos del grafo de prerequisitos: ('test', nombre) o ('bloque', n).
+        Tupla vacía si el bloque no tiene requisitos.
         """
-        try:
-            bloque_previo = BloquePrevio.objects.get(bloque_actual=self.bloque)
-            return bloque_previo
-        except BloquePrevio.DoesNotExist:
-            return None
+        from .prerequisitos import BLOQUE, obtener_grafo
+        return obtener_grafo().requisitos_de((BLOQUE, self.bloque))
 
     def puede_acceder_con_detalles(self, usuario):
         """
         Verifica acceso con detalles específicos de por qué no puede acceder.
+        Para evaluar muchos ejercicios a la vez usar EvaluadorAcceso directamente.
         """
-        if not self.activo:
-            return False, "Ejercicio no disponible"
-        
-        if usuario.es_gestor():
-            return True, ""
-        
-        if self.requiere_pro and not usuario.es_pro():
-            return False, "Requiere plan Pro"
-        
-        # Verificar requisitos del bloque
-        bloque_requisito = self.get_requisitos_para_bloque()
-        if bloque_requisito and not bloque_requisito.usuario_cumple_requisitos(usuario):
-            # Determinar exactamente qué falta
-            if bloque_requisito.test_requerido:
-                from usuarios.models import ProgresoTests
-                if not ProgresoTests.objects.filter(
-                    usuario=usuario,
-                    test_nombre=bloque_requisito.test_requerido,
-                    completado=True
-                ).exists():
-                    return False, f"Debes completar el test: {bloque_requisito.test_requerido}"
-            
-            for bloque_req in bloque_requisito.get_bloques_requeridos_list():
-                if not usuario.bloque_completado(bloque_req):
-                    return False, f"Debes completar todos los ejercicios del bloque {bloque_req}"
-        
-        return True, ""
+        from .acceso import EvaluadorAcceso
+        return EvaluadorAcceso(usuario).puede_acceder(self)
 
 class BloquePrevio(models.Model):
     """
@@ -223,20 +139,27 @@ class BloquePrevio(models.Model):
         """
         Verifica si un usuario cumple los requisitos para acceder al bloque.
         """
-        # Verificar test requerido
-        if self.test_requerido:
-            from usuarios.models import ProgresoTests
-            if not ProgresoTests.objects.filter(
-                usuario=usuario, 
-                test_nombre=self.test_requerido,
-                completado=True
-            ).exists():
-                return False
-        
-        # Verificar bloques completados completamente
-        bloques_requeridos = self.get_bloques_requeridos_list()
-        for bloque in bloques_requeridos:
-            if not usuario.bloque_completado(bloque):
-                return False
-        
-        return True
\ No newline at end of file
+        from usuarios.progreso import obtener_progreso
+        from .prerequisitos import BLOQUE, obtener_grafo
+        grafo = obtener_grafo()
+        satisfechos = grafo.satisfechos(obtener_progreso(usuario))
+        return not grafo.pendientes((BLOQUE, self.bloque_actual), satisfechos)
+
+class VersionDatos(models.Model):
+    """
+    Versión de un conjunto de datos que los procesos guardan en memoria
+    (catálogo, grafo de prerequisitos, corpus). Cada proceso compara su
+    copia con esta fila; ver ejercicios.versionado. La versión es aleatoria
+    y no un contador para que, si una transacción que la sube se deshace,
+    la siguiente subida no pueda repetir el valor deshecho.
+    """
+    clave = models.CharField(max_length=50, primary_key=True)
+    version = models.UUIDField(default=uuid.uuid4)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Versión de Datos'
+        verbose_name_plural = 'Versiones de Datos'
+    
+    def __str__(self):
+        return f"{self.clave} v{self.version}"
@@ -0,0 +1,137 @@
+# ejercicios/prerequisitos.py
+import logging
+
+from .versionado import RegistroVersionado
+
+logger = logging.getLogger(__name__)
+
+# Tipos de nodo del grafo
+TEST = 'test'
+BLOQUE = 'bloque'
+
+CLAVE_VERSION = 'prerequisitos:version'
+
+
+class GrafoPrerequisitos:
+    """
+    Grafo de dependencias entre tests y bloques.
+
+    Cada nodo es una tupla (tipo, valor), p.ej. ('test', 'test_1') o
+    ('bloque', 2), y tiene asociada la tupla ordenada de nodos que requiere.
+    El progreso de un usuario se expresa como el conjunto de nodos
+    satisfechos, así que saber qué está desbloqueado es una operación de
+    conjuntos y no hace falta consultar la base de datos por cada nodo.
+    """
+
+    def __init__(self, requisitos):
+        self.requisitos = requisitos
+        self.bloques_referenciados = frozenset(
+            valor
+            for nodos in requisitos.values()
+            for tipo, valor in nodos
+            if tipo == BLOQUE
+        )
+
+    def requisitos_de(self, nodo):
+        """Requisitos de un nodo, en el orden en que deben comprobarse."""
+        return self.requisitos.get(nodo, ())
+
+    def satisfechos(self, progreso):
+        """
+        Conjunto de nodos satisfechos para una foto de progreso
+        (ver usuarios.progreso.ProgresoUsuario).
+        """
+        nodos = {(TEST, nombre) for nombre in progreso.tests_completados}
+        nodos.update(
+            (BLOQUE, bloque)
+            for bloque in self.bloques_referenciados
+            if progreso.bloque_completado(bloque)
+        )
+        return frozenset(nodos)
+
+    def pendientes(self, nodo, satisfechos):
+        """Requisitos del nodo que todavía no están satisfechos."""
+        return [requisito for requisito in self.requisitos_de(nodo) if requisito not in satisfechos]
+
+    def evaluar(self, nodos, satisfechos):
+        """Comprueba muchos nodos a la vez: {nodo: requisitos pendientes}."""
+        return {nodo: self.pendientes(nodo, satisfechos) for nodo in nodos}
+
+    def desbloqueados(self, satisfechos):
+        """Nodos compilados cuyos requisitos están todos satisfechos."""
+        return {
+            nodo for nodo, requisitos in self.requisitos.items()
+            if satisfechos.issuperset(requisitos)
+        }
+
+
+def _resolver_test(nombre, nombres_tests):
+    """
+    Traduce un nombre de test tal y como aparece en los datos a un nombre real.
+    Acepta la forma corta usada en los JSON de carga ('inicial' -> 'test_inicial').
+    """
+    nombre = (nombre or '').strip()
+    if not nombre:
+        return None
+    if nombre in nombres_tests:
+        return nombre
+    if f'test_{nombre}' in nombres_tests:
+        return f'test_{nombre}'
+    return None
+
+
+def compilar_grafo():
+    """
+    Compila el grafo a partir de las filas de BloquePrevio y de los campos
+    test_previo_requerido y bloque_requerido de TestLectura. Lee las filas
+    directamente y no del catálogo de ejercicios: el catálogo tiene su
+    propia versión y otro proceso podría tenerlo todavía sin revisar.
+    """
+    from test_lectura.models import TestLectura
+    from .models import BloquePrevio
+
+    filas_tests = list(TestLectura.objects.values_list('nombre', 'test_previo_requerido', 'bloque_requerido'))
+    nombres_tests = {nombre for nombre, _, _ in filas_tests}
+    requisitos = {}
+
+    for bloque_previo in BloquePrevio.objects.all():
+        nodos = []
+        if bloque_previo.test_requerido:
+            test = _resolver_test(bloque_previo.test_requerido, nombres_tests) or bloque_previo.test_requerido
+            nodos.append((TEST, test))
+        nodos.extend((BLOQUE, bloque) for bloque in bloque_previo.get_bloques_requeridos_list())
+        requisitos[(BLOQUE, bloque_previo.bloque_actual)] = tuple(nodos)
+
+    for nombre, test_previo, bloque_requerido in filas_tests:
+        nodos = []
+        if test_previo:
+            previo = _resolver_test(test_previo, nombres_tests)
+            if previo is None:
+                logger.warning(f"PREREQUISITOS: test previo '{test_previo}' de {nombre} no existe, se ignora")
+            elif previo != nombre:
+                nodos.append((TEST, previo))
+        if bloque_requerido:
+            nodos.append((BLOQUE, bloque_requerido))
+        requisitos[(TEST, nombre)] = tuple(nodos)
+
+    return GrafoPrerequisitos(requisitos)
+
+
+_registro = RegistroVersionado(CLAVE_VERSION, compilar_grafo)
+
+
+def obtener_grafo():
+    """
+    Devuelve el grafo compilado del proceso. Solo se recompila cuando cambia
+    su versión en la base de datos, es decir, cuando se modifican filas de
+    BloquePrevio o TestLectura (ver ejercicios.versionado).
+    """
+    return _registro.obtener()
+
+
+def invalidar_grafo():
+    """
+    Marca el grafo como obsoleto en todos los procesos, que lo recompilan
+    en cuanto revisan la versión (REVISION_VERSION segundos como mucho).
+    """
+    _registro.invalidar()
@@ -0,0 +1,25 @@
+# ejercicios/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .catalogo import invalidar_catalogo
+from .models import CategoriaEjercicio, Ejercicio, BloquePrevio
+from .prerequisitos import invalidar_grafo
+
+
+@receiver([post_save, post_delete], sender=CategoriaEjercicio)
+@receiver([post_save, post_delete], sender=Ejercicio)
+def catalogo_cambiado(sender, instance, **kwargs):
+    """
+    Reconstruye el catálogo de ejercicios cuando cambian categorías o ejercicios.
+    """
+    invalidar_catalogo()
+
+
+@receiver([post_save, post_delete], sender=BloquePrevio)
+def bloque_previo_cambiado(sender, instance, **kwargs):
+    """
+    Recompila el catálogo y el grafo de prerequisitos cuando cambian las reglas de bloques.
+    """
+    invalidar_catalogo()
+    invalidar_grafo()
@@ -1,3 +1,221 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from .catalogo import CatalogoEjercicios
+from .corpus import CorpusLectura, PALABRAS_MINIMAS
+from .models import BloquePrevio, CategoriaEjercicio, Ejercicio, VersionDatos
+from .versionado import RegistroVersionado
+
+
+class RegistroVersionadoTests(TestCase):
+    """
+    Cada RegistroVersionado con la misma clave hace de un proceso distinto:
+    solo comparten la fila de VersionDatos.
+    """
+
+    def setUp(self):
+        self.categoria = CategoriaEjercicio.objects.create(codigo='EL', nombre='Lectura', descripcion='')
+        self.ejercicio = Ejercicio.objects.create(
+            categoria=self.categoria, codigo='EL1', nombre='EL1', descripcion='', instrucciones='',
+            nivel=1, bloque=1
+        )
+
+    def _procesos(self, construir):
+        return RegistroVersionado('test:version', construir), RegistroVersionado('test:version', construir)
+
+    def test_invalidacion_llega_a_otro_proceso_tras_la_revision(self):
+        web, admin = self._procesos(CatalogoEjercicios.cargar)
+        self.assertEqual([e.codigo for e in web.obtener().activos()], ['EL1'])
+
+        # Cambio sin signals desde otro proceso (p.ej. una acción del admin)
+        Ejercicio.objects.filter(pk=self.ejercicio.pk).update(activo=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.invalidar()
+        self.assertTrue(VersionDatos.objects.filter(clave='test:version').exists())
+
+        # Dentro del periodo de revisión se sigue sirviendo la copia del proceso
+        self.assertEqual([e.codigo for e in web.obtener().activos()], ['EL1'])
+        with override_settings(REVISION_VERSION_DATOS=0):
+            self.assertEqual(web.obtener().activos(), [])
+
+    def test_invalidacion_deshecha_no_deja_copia_obsoleta(self):
+        from django.db import transaction
+
+        web, _ = self._procesos(CatalogoEjercicios.cargar)
+        with override_settings(REVISION_VERSION_DATOS=0):
+            try:
+                with transaction.atomic():
+                    Ejercicio.objects.filter(pk=self.ejercicio.pk).update(nivel=2)
+                    web.invalidar()
+                    self.assertEqual(web.obtener().activos()[0].nivel, 2)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+            Ejercicio.objects.filter(pk=self.ejercicio.pk).update(nivel=3)
+            web.invalidar()
+            self.assertEqual(web.obtener().activos()[0].nivel, 3)
+
+    def test_sin_cambios_no_reconstruye(self):
+        construidos = []
+
+        def construir():
+            construidos.append(1)
+            return CatalogoEjercicios.cargar()
+
+        web, _ = self._procesos(construir)
+        with override_settings(REVISION_VERSION_DATOS=0):
+            web.obtener()
+            web.obtener()
+        self.assertEqual(len(construidos), 1)
+
+    def test_texto_desactivado_deja_de_servirse(self):
+        from test_lectura.models import TestLectura
+
+        contenido = ' '.join(['palabra'] * PALABRAS_MINIMAS)
+        test = TestLectura.objects.create(
+            nombre='test_corpus', titulo='Texto de prueba', descripcion='', instrucciones='',
+            texto_titulo='Texto de prueba', texto_contenido=contenido, numero_palabras=PALABRAS_MINIMAS
+        )
+        web, admin = self._procesos(CorpusLectura.cargar)
+        huella = next(texto.hash for texto in web.obtener().textos if texto.test_id == test.pk)
+
+        TestLectura.objects.filter(pk=test.pk).update(activo=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            admin.invalidar()
+        with override_settings(REVISION_VERSION_DATOS=0):
+            self.assertIsNone(web.obtener().texto(huella))
+
+
+class RequisitosBloqueTests(TestCase):
+
+    def setUp(self):
+        categoria = CategoriaEjercicio.objects.create(codigo='EL', nombre='Lectura', descripcion='')
+        self.ejercicio = Ejercicio.objects.create(
+            categoria=categoria, codigo='EL2', nombre='EL2', descripcion='', instrucciones='',
+            nivel=1, bloque=2
+        )
+        BloquePrevio.objects.create(bloque_actual=2, bloques_requeridos='1', test_requerido='inicial')
+
+    @override_settings(REVISION_VERSION_DATOS=0)
+    def test_requisitos_salen_del_grafo(self):
+        self.assertEqual(self.ejercicio.get_requisitos_para_bloque(), (('test', 'inicial'), ('bloque', 1)))
+        self.ejercicio.bloque = 1
+        self.assertEqual(self.ejercicio.get_requisitos_para_bloque(), ())
+
+    def test_sin_consultas_dentro_de_la_revision(self):
+        with override_settings(REVISION_VERSION_DATOS=0):
+            self.ejercicio.get_requisitos_para_bloque()
+        with self.assertNumQueries(0):
+            self.ejercicio.get_requisitos_para_bloque()
+
+
+class GrafoPrerequisitosTests(TestCase):
+
+    def setUp(self):
+        from test_lectura.models import TestLectura
+
+        self.bloque_previo = BloquePrevio.objects.create(bloque_actual=2, bloques_requeridos='1', test_requerido='inicial')
+        for nombre, previo, bloque in (('test_inicial', '', None), ('test_1', 'inicial', 1), ('moby', 'test_1', None)):
+            TestLectura.objects.create(
+                nombre=nombre, titulo=nombre, descripcion='', instrucciones='', texto_titulo=nombre,
+                texto_contenido='texto', test_previo_requerido=previo, bloque_requerido=bloque
+            )
+
+    def test_requisitos_salen_solo_de_los_datos(self):
+        from .prerequisitos import BLOQUE, TEST, compilar_grafo
+
+        grafo = compilar_grafo()
+        self.assertEqual(grafo.requisitos_de((TEST, 'test_inicial')), ())
+        self.assertEqual(grafo.requisitos_de((TEST, 'test_1')), ((TEST, 'test_inicial'), (BLOQUE, 1)))
+        self.assertEqual(grafo.requisitos_de((TEST, 'moby')), ((TEST, 'test_1'),))
+        self.assertEqual(grafo.requisitos_de((TEST, 'desconocido')), ())
+
+    def test_grafo_no_usa_la_copia_del_catalogo(self):
+        from unittest import mock
+
+        from .prerequisitos import BLOQUE, TEST, compilar_grafo
+
+        # Otro proceso: ve la versión nueva del grafo con el catálogo aún sin revisar
+        catalogo_viejo = CatalogoEjercicios.cargar()
+        web, admin = RegistroVersionado('test:grafo', compilar_grafo), RegistroVersionado('test:grafo', compilar_grafo)
+        web.obtener()
+
+        BloquePrevio.objects.filter(pk=self.bloque_previo.pk).update(bloques_requeridos='1', test_requerido='test_1')
+        with self.captureOnCommitCallbacks(execute=True):
+            RegistroVersionado('test:catalogo', CatalogoEjercicios.cargar).invalidar()
+            admin.invalidar()
+
+        with override_settings(REVISION_VERSION_DATOS=0), \
+                mock.patch('ejercicios.catalogo.obtener_catalogo', return_value=catalogo_viejo):
+            grafo = web.obtener()
+        self.assertEqual(grafo.requisitos_de((BLOQUE, 2)), ((TEST, 'test_1'), (BLOQUE, 1)))
+
+
+class FragmentosTests(TestCase):
+
+    def test_fragmento_no_usa_la_cache_compartida(self):
+        from django.core.cache import cache
+
+        from .corpus import CorpusLectura, _textos_por_defecto, obtener_fragmento
+
+        cache.clear()
+        texto = CorpusLectura(_textos_por_defecto()).textos[0]
+        primero = obtener_fragmento(texto, 0, 2, 6, 2)
+        self.assertIs(obtener_fragmento(texto, 0, 2, 6, 2), primero)
+        self.assertEqual(cache._cache, {})
+        with self.assertRaises(ValueError):
+            obtener_fragmento(texto, 2, 0)
+
+
+class MaquetacionTests(TestCase):
+    """Líneas y segmentos calculados igual que processTextIntoColumns / splitLineIntoSegments de el.js."""
+
+    def maquetar(self, codigo, texto):
+        from .maquetacion import maquetacion_de, maquetar
+
+        return maquetar(texto, *maquetacion_de(codigo)).como_dict()
+
+    def test_el5_columnas_de_dos_palabras(self):
+        self.assertEqual(self.maquetar('EL5_columnas', 'Uno dos tres... ¿Cuatro cinco?! Seis.'), {
+            'lineas': ['Uno dos', 'tres', '¿Cuatro cinco', 'Seis'],
+            'segmentos': [[[0, 2]], [[0, 1]], [[0, 2]], [[0, 1]]],
+        })
+
+    def test_el6_columnas_de_tres_palabras(self):
+        self.assertEqual(self.maquetar('EL6_columnas', 'El sol sale por el este cada mañana. ¡Vamos ya!'), {
+            'lineas': ['El sol sale', 'por el este', 'cada mañana', '¡Vamos ya'],
+            'segmentos': [[[0, 3]], [[0, 3]], [[0, 2]], [[0, 2]]],
+        })
+
+    def test_el7_tres_segmentos_por_linea(self):
+        texto = (
+            'Leer rápido no consiste en pasar la vista más deprisa sino en captar '
+            'varias palabras de un solo golpe. ¿Listo?'
+        )
+        self.assertEqual(self.maquetar('EL7_guiada', texto), {
+            'lineas': [
+                'Leer rápido no consiste en pasar la vista más deprisa sino',
+                'en captar varias palabras de un solo golpe',
+                '¿Listo',
+            ],
+            'segmentos': [[[0, 4], [4, 8], [8, 11]], [[0, 3], [3, 6], [6, 8]], [[0, 1]]],
+        })
+
+    def test_el8_dos_segmentos_por_linea(self):
+        texto = (
+            'La práctica diaria del método ensancha el campo visual del lector '
+            'y reduce las regresiones poco a poco!! Bien.'
+        )
+        self.assertEqual(self.maquetar('EL8_guiada', texto), {
+            'lineas': [
+                'La práctica diaria del método ensancha el campo visual del lector',
+                'y reduce las regresiones poco a poco',
+                'Bien',
+            ],
+            'segmentos': [[[0, 6], [6, 11]], [[0, 4], [4, 7]], [[0, 1]]],
+        })
+
+    def test_codigo_sin_maquetacion(self):
+        from .maquetacion import maquetacion_de
+
+        self.assertIsNone(maquetacion_de('EM1_memoria'))
@@ -7,6 +7,7 @@ app_name = 'ejercicios'
 urlpatterns = [
     path('', views.lista_ejercicios_view, name='lista'),
     path('<int:ejercicio_id>/', views.detalle_ejercicio_view, name='detalle'),
+    path('textos/<slug:huella>/', views.fragmento_texto_view, name='fragmento_texto'),
     path('completar/', views.completar_ejercicio_view, name='completar'),
     path('progreso/', views.mi_progreso_view, name='mi_progreso'),
 ]
\ No newline at end of file
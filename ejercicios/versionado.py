@@ -0,0 +1,70 @@
+# ejercicios/versionado.py
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+
+# Segundos que un proceso reutiliza su copia sin volver a mirar la versión
+REVISION_VERSION = 5
+
+
+class RegistroVersionado:
+    """
+    Objeto de solo lectura compartido por todo el proceso.
+
+    Se construye la primera vez que se pide y se reutiliza mientras no
+    cambie su versión, guardada en la base de datos (VersionDatos con
+    `clave`). Cada proceso vuelve a leer la versión como mucho una vez cada
+    REVISION_VERSION segundos (o settings.REVISION_VERSION_DATOS), así que un
+    cambio hecho desde otro proceso (otro worker, el admin, preparar_datos)
+    se ve en todos los procesos pasado ese tiempo. No depende de la caché,
+    que puede ser local a cada proceso (LocMemCache).
+    """
+
+    def __init__(self, clave, construir):
+        self.clave = clave
+        self.construir = construir
+        self._valor = None
+        self._version = None
+        self._revisado = None
+        self._lock = threading.Lock()
+
+    @property
+    def revision(self):
+        return getattr(settings, 'REVISION_VERSION_DATOS', REVISION_VERSION)
+
+    def _leer_version(self):
+        from .models import VersionDatos
+
+        return VersionDatos.objects.filter(clave=self.clave).values_list('version', flat=True).first()
+
+    def obtener(self):
+        """Devuelve el objeto vigente, reconstruyéndolo si su versión ha cambiado."""
+        ahora = time.monotonic()
+        if self._valor is not None and self._revisado is not None and ahora - self._revisado < self.revision:
+            return self._valor
+
+        version = self._leer_version()
+        with self._lock:
+            if self._valor is None or version != self._version:
+                self._valor = self.construir()
+                self._version = version
+            self._revisado = ahora
+        return self._valor
+
+    def invalidar(self):
+        """
+        Cambia la versión en la base de datos dentro de la transacción en
+        curso: los demás procesos solo la ven, y reconstruyen su copia, si
+        los datos cambiados se confirman. Este proceso la relee al confirmar.
+        """
+        from .models import VersionDatos
+
+        VersionDatos.objects.update_or_create(clave=self.clave, defaults={'version': uuid.uuid4()})
+
+        def _revisar():
+            self._revisado = None
+
+        transaction.on_commit(_revisar)
@@ -122,37 +122,63 @@ window.ELExercises = (function() {
         return container;
     }
 
-    // Función para obtener texto aleatorio de tests de lectura
-    function getRandomTestText() {
-        if (window.availableTests && Array.isArray(window.availableTests) && window.availableTests.length > 0) {
-            const randomIndex = Math.floor(Math.random() * window.availableTests.length);
-            const selectedTest = window.availableTests[randomIndex];
-            
-            console.log(`Usando texto del test: "${selectedTest.name}"`);
-            
-            // Dividir en párrafos y tomar solo un fragmento aleatorio
-            const paragraphs = selectedTest.text_content.split('\n').filter(p => p.trim() !== '');
-            
-            if (paragraphs.length > 3) {
-                // Seleccionar aleatoriamente un fragmento de 4-8 párrafos para tener aproximadamente 20 líneas
-                const fragmentSize = Math.min(8, Math.max(4, Math.floor(paragraphs.length / 2)));
-                const startIndex = Math.floor(Math.random() * (paragraphs.length - fragmentSize));
-                const selectedParagraphs = paragraphs.slice(startIndex, startIndex + fragmentSize);
-                
-                return selectedParagraphs.join('\n\n');
-            }
-            
-            return selectedTest.text_content;
-        } else {
-            // Texto por defecto si no hay tests disponibles
-            return `La lectura rápida es una habilidad fundamental para el desarrollo personal y profesional. Mediante la técnica fotográfica podemos incrementar significativamente nuestra velocidad de lectura.
+    // Texto por defecto si no hay texto de lectura o no se puede descargar
+    const DEFAULT_TEXT = `La lectura rápida es una habilidad fundamental para el desarrollo personal y profesional. Mediante la técnica fotográfica podemos incrementar significativamente nuestra velocidad de lectura.
 
 El entrenamiento constante y la práctica diaria son elementos clave para el éxito. Los ejercicios de Campayo han demostrado ser extraordinariamente efectivos para miles de estudiantes.
 
 La concentración y la relajación mental facilitan enormemente el proceso de aprendizaje. El campo de visión periférica se puede desarrollar mediante ejercicios específicos.
 
 La técnica de lectura en columnas permite entrenar el movimiento ocular de forma sistemática. Los ojos aprenden a realizar movimientos más eficientes y precisos.`;
+
+    // Función para obtener un fragmento aleatorio del texto de lectura.
+    // Solo se descarga el rango de párrafos que se va a leer, ya partido en
+    // líneas y segmentos por el servidor; se sirve con caché inmutable, así
+    // que repetir el ejercicio no vuelve a pedirlo.
+    // Devuelve una promesa con {text, lines, segments}; si no hay texto o
+    // falla la descarga, lines y segments son null y se usa el texto por defecto.
+    function getRandomTestText() {
+        const texto = window.EXERCISE_CONFIG.textoLectura;
+        const fallback = { text: DEFAULT_TEXT, lines: null, segments: null };
+        if (!texto || !texto.total_parrafos) {
+            return Promise.resolve(fallback);
+        }
+
+        console.log(`Usando texto del test: "${texto.name}"`);
+
+        let desde = 0;
+        let hasta = texto.total_parrafos;
+        if (texto.total_parrafos > 3) {
+            // Seleccionar aleatoriamente un fragmento de 4-8 párrafos para tener aproximadamente 20 líneas
+            const fragmentSize = Math.min(8, Math.max(4, Math.floor(texto.total_parrafos / 2)));
+            desde = Math.floor(Math.random() * (texto.total_parrafos - fragmentSize));
+            hasta = desde + fragmentSize;
         }
+
+        const params = new URLSearchParams({ desde: desde, hasta: hasta });
+        if (texto.palabras_por_linea) {
+            params.set('palabras', texto.palabras_por_linea);
+            params.set('segmentos', texto.segmentos_por_linea || 1);
+        }
+
+        return fetch(`${texto.url}?${params}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => ({
+                text: data.text_content,
+                lines: data.lineas || null,
+                segments: data.segmentos
+                    ? data.segmentos.map(line => line.map(([start, end]) => ({ start, end })))
+                    : null
+            }))
+            .catch(error => {
+                console.error('Error al obtener el texto de lectura:', error);
+                return fallback;
+            });
     }
 
     // Función para procesar texto en líneas para lectura en columnas
@@ -403,20 +429,22 @@ La técnica de lectura en columnas permite entrenar el movimiento ocular de form
 
     // EL5: Lectura en columnas (2 palabras por línea) con metrónomo
     function startEL5(config) {
-        const text = getRandomTestText();
-        const wordsPerLine = 2;
-        const lines = processTextIntoColumns(text, wordsPerLine);
+        getRandomTestText().then(reading => {
+            const wordsPerLine = 2;
+            const lines = reading.lines || processTextIntoColumns(reading.text, wordsPerLine);
         
-        startColumnReading(lines, wordsPerLine, config);
+            startColumnReading(lines, wordsPerLine, config);
+        });
     }
 
     // EL6: Lectura en columnas (3 palabras por línea) con metrónomo
     function startEL6(config) {
-        const text = getRandomTestText();
-        const wordsPerLine = 3;
-        const lines = processTextIntoColumns(text, wordsPerLine);
+        getRandomTestText().then(reading => {
+            const wordsPerLine = 3;
+            const lines = reading.lines || processTextIntoColumns(reading.text, wordsPerLine);
         
-        startColumnReading(lines, wordsPerLine, config);
+            startColumnReading(lines, wordsPerLine, config);
+        });
     }
 
     // Función común para lectura en columnas
@@ -550,20 +578,22 @@ La técnica de lectura en columnas permite entrenar el movimiento ocular de form
 
     // EL7: Lectura guiada en 3 fotos por renglón con metrónomo
     function startEL7(config) {
-        const text = getRandomTestText();
-        const lines = processTextForGuidedReading(text);
-        const sectionsPerLine = 3;
+        getRandomTestText().then(reading => {
+            const lines = reading.lines || processTextForGuidedReading(reading.text);
+            const sectionsPerLine = 3;
         
-        startGuidedReading(lines, sectionsPerLine, config);
+            startGuidedReading(lines, sectionsPerLine, config, reading.lines && reading.segments);
+        });
     }
 
     // EL8: Lectura guiada en 2 fotos por renglón con metrónomo
     function startEL8(config) {
-        const text = getRandomTestText();
-        const lines = processTextForGuidedReading(text);
-        const sectionsPerLine = 2;
+        getRandomTestText().then(reading => {
+            const lines = reading.lines || processTextForGuidedReading(reading.text);
+            const sectionsPerLine = 2;
         
-        startGuidedReading(lines, sectionsPerLine, config);
+            startGuidedReading(lines, sectionsPerLine, config, reading.lines && reading.segments);
+        });
     }
 
     // Función para dividir una línea en segmentos equitativos
@@ -584,14 +614,23 @@ La técnica de lectura en columnas permite entrenar el movimiento ocular de form
         return segments;
     }
 
+    // Segmentos de una línea: los calculados por el servidor si los hay
+    function getLineSegments(state, lineIndex, numSegments) {
+        if (state.lineSegments) {
+            return state.lineSegments[lineIndex];
+        }
+        return splitLineIntoSegments(state.textLines[lineIndex], numSegments);
+    }
+
     // Función común para lectura guiada
-    function startGuidedReading(lines, sectionsPerLine, config) {
+    function startGuidedReading(lines, sectionsPerLine, config, lineSegments) {
         const textContainer = document.getElementById('guided-text');
         const lineCounter = document.getElementById('line-counter');
         const totalLines = document.getElementById('total-lines');
         
         const state = ExerciseCore.getState();
         state.textLines = lines;
+        state.lineSegments = lineSegments || null;
         state.currentLine = 0;
         state.currentSection = 0;
         state.totalSteps = lines.length * sectionsPerLine;
@@ -645,7 +684,7 @@ La técnica de lectura en columnas permite entrenar el movimiento ocular de form
                 const text = state.textLines[state.currentLine];
                 
                 // Dividir la línea en segmentos equitativos
-                const segments = splitLineIntoSegments(text, sectionsPerLine);
+                const segments = getLineSegments(state, state.currentLine, sectionsPerLine);
                 
                 // Verificar si la sección actual existe
                 if (state.currentSection >= segments.length) {
@@ -822,7 +861,7 @@ La técnica de lectura en columnas permite entrenar el movimiento ocular de form
                 
                 // Dividir la línea en segmentos equitativos
                 const text = state.textLines[state.currentLine];
-                const segments = splitLineIntoSegments(text, sectionsPerLine);
+                const segments = getLineSegments(state, state.currentLine, sectionsPerLine);
                 
                 // Verificar si la sección actual existe
                 if (state.currentSection >= segments.length) {
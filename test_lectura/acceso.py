@@ -0,0 +1,113 @@
+# test_lectura/acceso.py
+from collections import defaultdict
+
+from .models import SesionTest
+
+
+class EvaluadorTests:
+    """
+    Evalúa en memoria el estado de todos los tests de lectura para un usuario.
+
+    Carga de una vez todas las sesiones completadas del usuario agrupadas por
+    test y toma tests y bloques completados de la foto de progreso
+    (usuarios.progreso), así que la lista de tests cuesta un número fijo de
+    consultas sea cual sea el número de tests.
+    """
+
+    def __init__(self, usuario):
+        from usuarios.progreso import obtener_progreso
+
+        self.usuario = usuario
+        self.progreso = obtener_progreso(usuario)
+
+        # Sesiones completadas agrupadas por test, de la más reciente a la más antigua
+        self.sesiones_por_test = defaultdict(list)
+        self.sesiones = list(
+            SesionTest.objects.filter(
+                usuario=usuario,
+                completado=True
+            ).order_by('-fecha_fin')
+        )
+        for sesion in self.sesiones:
+            self.sesiones_por_test[sesion.test_id].append(sesion)
+
+    def puede_acceder(self, test, password=None):
+        """
+        Devuelve (puede_acceder, mensaje) igual que TestLectura.puede_acceder.
+        Las comprobaciones de progreso salen de la foto ya cargada.
+        """
+        return test.puede_acceder(self.usuario, password)
+
+    def intentos(self, test):
+        """Sesiones completadas del test, de la más reciente a la más antigua."""
+        return self.sesiones_por_test.get(test.id, [])
+
+    def ya_completado(self, test):
+        """Indica si el usuario ha completado el test al menos una vez."""
+        return bool(self.intentos(test))
+
+    def mejor_sesion(self, test):
+        """Sesión completada con mayor velocidad de lectura, o None."""
+        intentos = self.intentos(test)
+        if not intentos:
+            return None
+        return max(intentos, key=lambda sesion: sesion.velocidad_lectura)
+
+    def estado(self, test):
+        """
+        Datos de un test para la lista: acceso final, mensaje y mejor resultado.
+        """
+        puede_acceder, mensaje_error = self.puede_acceder(test)
+        ya_completado = self.ya_completado(test)
+
+        mejor_resultado = None
+        mejor_sesion = self.mejor_sesion(test)
+        if mejor_sesion:
+            mejor_resultado = {
+                'velocidad_lectura': mejor_sesion.velocidad_lectura,
+                'velocidad_memorizacion': mejor_sesion.velocidad_memorizacion,
+                'respuestas_correctas': mejor_sesion.respuestas_correctas,
+                'fecha': mejor_sesion.fecha_fin,
+                'sesion_id': mejor_sesion.id
+            }
+
+        # Lógica final de acceso
+        acceso_final = puede_acceder and not ya_completado
+        mensaje_final = mensaje_error if not puede_acceder else ('Ya completado' if ya_completado else '')
+
+        return {
+            'test': test,
+            'puede_acceder': acceso_final,
+            'mensaje_error': mensaje_final,
+            'ya_completado': ya_completado,
+            'mejor_resultado': mejor_resultado
+        }
+
+    def estadisticas(self):
+        """
+        Estadísticas globales del usuario calculadas sobre las sesiones cargadas.
+        """
+        total_tests = len(self.sesiones)
+        if total_tests == 0:
+            return {
+                'total_tests': 0,
+                'mejor_velocidad': 0,
+                'mejor_vm': 0,
+                'promedio_comprension': 0
+            }
+
+        promedio_respuestas = sum(s.respuestas_correctas for s in self.sesiones) / total_tests
+        return {
+            'total_tests': total_tests,
+            'mejor_velocidad': max(s.velocidad_lectura for s in self.sesiones),
+            'mejor_vm': max(s.velocidad_memorizacion for s in self.sesiones),
+            'promedio_comprension': round((promedio_respuestas / 20) * 100, 1)
+        }
+
+    def evolucion_por_test(self, tests):
+        """Intentos de cada test realizado, indexados por nombre de test."""
+        return {
+            test.nombre: {'test': test, 'intentos': self.intentos(test)}
+            for test in tests
+            if self.ya_completado(test)
+        }
@@ -1,6 +1,8 @@
 # test_lectura/admin.py
 from django.contrib import admin
 from .models import TestLectura, PreguntaTest, OpcionRespuesta, SesionTest, RespuestaUsuario
+from .claves import obtener_clave
+from ejercicios.corpus import invalidar_corpus
 
 
 class OpcionRespuestaInline(admin.TabularInline):
@@ -60,11 +62,15 @@ class TestLecturaAdmin(admin.ModelAdmin):
     
     def activar_tests(self, request, queryset):
         queryset.update(activo=True)
+        # update() no emite señales
+        invalidar_corpus()
         self.message_user(request, f'{queryset.count()} tests activados')
     activar_tests.short_description = "Activar tests seleccionados"
     
     def desactivar_tests(self, request, queryset):
         queryset.update(activo=False)
+        # update() no emite señales
+        invalidar_corpus()
         self.message_user(request, f'{queryset.count()} tests desactivados')
     desactivar_tests.short_description = "Desactivar tests seleccionados"
     
@@ -135,15 +141,41 @@ class SesionTestAdmin(admin.ModelAdmin):
         }),
     )
     
+    def save_model(self, request, obj, form, change):
+        # Los cambios manuales invalidan el resultado guardado
+        obj.resultado_snapshot = None
+        super().save_model(request, obj, form, change)
+    
     # Acciones personalizadas
     actions = ['recalcular_velocidades']
     
     def recalcular_velocidades(self, request, queryset):
+        """
+        Vuelve a puntuar las respuestas guardadas con la clave vigente del
+        test y recalcula las velocidades.
+        """
         updated = 0
-        for sesion in queryset:
+        respuestas_cambiadas = []
+        for sesion in queryset.select_related('test').prefetch_related('respuestas'):
+            respuestas = list(sesion.respuestas.all())
+            if respuestas:
+                clave = obtener_clave(sesion.test)
+                for respuesta in respuestas:
+                    es_correcta = clave.es_correcta(respuesta.opcion_seleccionada_id)
+                    if respuesta.es_correcta != es_correcta:
+                        respuesta.es_correcta = es_correcta
+                        respuestas_cambiadas.append(respuesta)
+                sesion.respuestas_correctas = sum(1 for respuesta in respuestas if respuesta.es_correcta)
+            
+            # El resultado guardado se regenera al volver a verlo
+            sesion.resultado_snapshot = None
             if sesion.tiempo_lectura and sesion.test.numero_palabras > 0:
                 sesion.calcular_velocidades()
                 updated += 1
+            else:
+                sesion.save(update_fields=['respuestas_correctas', 'resultado_snapshot'])
+
+        RespuestaUsuario.objects.bulk_update(respuestas_cambiadas, ['es_correcta'], batch_size=500)
         self.message_user(request, f'Velocidades recalculadas para {updated} sesiones')
     recalcular_velocidades.short_description = "Recalcular velocidades"
 
@@ -0,0 +1,68 @@
+# test_lectura/claves.py
+from types import MappingProxyType
+
+
+class ClaveRespuestas:
+    """
+    Clave de respuestas de un test, inmutable y compacta.
+
+    - correctas: {pregunta_id: opcion_id correcta}
+    - opciones: {opcion_id: pregunta_id} con todas las opciones válidas del test
+    - opciones_correctas: ids de todas las opciones marcadas como correctas
+
+    La versión es la fecha_actualizacion del test con la que se construyó;
+    al editar preguntas u opciones se actualiza esa fecha (ver signals), así
+    que una clave con otra versión está obsoleta.
+    """
+    __slots__ = ('test_id', 'version', 'correctas', 'opciones', 'opciones_correctas')
+
+    def __init__(self, test_id, version, correctas, opciones, opciones_correctas):
+        object.__setattr__(self, 'test_id', test_id)
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'correctas', MappingProxyType(dict(correctas)))
+        object.__setattr__(self, 'opciones', MappingProxyType(dict(opciones)))
+        object.__setattr__(self, 'opciones_correctas', frozenset(opciones_correctas))
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("ClaveRespuestas es de solo lectura")
+
+    @classmethod
+    def construir(cls, test_id, version):
+        """Construye la clave de un test con una consulta."""
+        from .models import OpcionRespuesta
+
+        correctas = {}
+        opciones = {}
+        opciones_correctas = set()
+        for opcion_id, pregunta_id, es_correcta in OpcionRespuesta.objects.filter(
+            pregunta__test_id=test_id
+        ).values_list('id', 'pregunta_id', 'es_correcta'):
+            opciones[opcion_id] = pregunta_id
+            if es_correcta:
+                correctas.setdefault(pregunta_id, opcion_id)
+                opciones_correctas.add(opcion_id)
+        return cls(test_id, version, correctas, opciones, opciones_correctas)
+
+    def pertenece(self, pregunta_id, opcion_id):
+        """Indica si la opción es de esa pregunta de este test."""
+        return self.opciones.get(opcion_id) == pregunta_id
+
+    def es_correcta(self, opcion_id):
+        """Indica si la opción está marcada como correcta."""
+        return opcion_id in self.opciones_correctas
+
+
+_claves = {}
+
+
+def obtener_clave(test):
+    """
+    Devuelve la clave de respuestas vigente de un TestLectura.
+    Se construye la primera vez y se reutiliza en el proceso mientras no
+    cambie test.fecha_actualizacion.
+    """
+    clave = _claves.get(test.pk)
+    if clave is None or clave.version != test.fecha_actualizacion:
+        clave = ClaveRespuestas.construir(test.pk, test.fecha_actualizacion)
+        _claves[test.pk] = clave
+    return clave
@@ -0,0 +1,66 @@
+# test_lectura/cuestionario.py
+import hashlib
+import json
+
+from django.utils.cache import quote_etag
+
+
+class Cuestionario:
+    """
+    Preguntas y opciones de un test ya serializadas.
+
+    - preguntas: tupla de {'id', 'pregunta', 'opciones': [{'id', 'texto'}]}
+    - cuerpo: respuesta JSON de preguntas_test_view, en bytes
+    - etag: ETag fuerte calculado sobre el cuerpo
+    - letras: {opcion_id: letra} (A, B, C, D) según el orden de cada opción
+
+    Igual que la clave de respuestas (test_lectura.claves), se versiona con
+    la fecha_actualizacion del test. No se debe modificar lo que devuelve.
+    """
+    __slots__ = ('test_id', 'version', 'preguntas', 'cuerpo', 'etag', 'letras')
+
+    def __init__(self, test_id, version, preguntas, letras):
+        self.test_id = test_id
+        self.version = version
+        self.preguntas = tuple(preguntas)
+        self.letras = letras
+        self.cuerpo = json.dumps({
+            'success': True,
+            'preguntas': self.preguntas,
+            'total_preguntas': len(self.preguntas)
+        }).encode('utf-8')
+        self.etag = quote_etag(hashlib.sha256(self.cuerpo).hexdigest()[:32])
+
+    @classmethod
+    def construir(cls, test_id, version):
+        """Carga preguntas y opciones del test con dos consultas."""
+        from .models import PreguntaTest
+
+        preguntas = []
+        letras = {}
+        for pregunta in PreguntaTest.objects.filter(test_id=test_id).prefetch_related('opciones'):
+            opciones = []
+            for opcion in pregunta.opciones.all():
+                opciones.append({'id': opcion.id, 'texto': opcion.texto})
+                letras[opcion.id] = chr(64 + opcion.orden + 1)
+            preguntas.append({
+                'id': pregunta.id,
+                'pregunta': pregunta.pregunta,
+                'opciones': opciones
+            })
+        return cls(test_id, version, preguntas, letras)
+
+
+_cuestionarios = {}
+
+
+def obtener_cuestionario(test):
+    """
+    Devuelve el cuestionario vigente de un TestLectura. Se construye y
+    serializa una vez por proceso y versión del test.
+    """
+    cuestionario = _cuestionarios.get(test.pk)
+    if cuestionario is None or cuestionario.version != test.fecha_actualizacion:
+        cuestionario = Cuestionario.construir(test.pk, test.fecha_actualizacion)
+        _cuestionarios[test.pk] = cuestionario
+    return cuestionario
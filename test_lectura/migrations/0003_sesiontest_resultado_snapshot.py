@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2025-11-04 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_lectura', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sesiontest',
+            name='resultado_snapshot',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
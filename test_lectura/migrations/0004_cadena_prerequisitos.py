@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2025-11-12 10:05
+
+import uuid
+
+from django.db import migrations
+
+# Cadena de desbloqueo del método Campayo que antes estaba fija en el código:
+# {nombre: (test_previo_requerido, bloque_requerido)}; el resto de tests
+# requieren test_2 y el bloque 3. A partir de aquí el grafo de prerequisitos
+# sale solo de los datos y se cambia desde el admin.
+CADENA = {
+    'test_inicial': ('', None),
+    'test_1': ('test_inicial', 1),
+    'test_2': ('test_1', 2),
+}
+CADENA_POR_DEFECTO = ('test_2', 3)
+
+
+def guardar_cadena(apps, schema_editor):
+    TestLectura = apps.get_model('test_lectura', 'TestLectura')
+    VersionDatos = apps.get_model('ejercicios', 'VersionDatos')
+
+    for test in TestLectura.objects.all():
+        test.test_previo_requerido, test.bloque_requerido = CADENA.get(test.nombre, CADENA_POR_DEFECTO)
+        test.save(update_fields=['test_previo_requerido', 'bloque_requerido'])
+
+    # Los procesos en marcha recompilan el grafo (ver ejercicios.prerequisitos)
+    VersionDatos.objects.update_or_create(clave='prerequisitos:version', defaults={'version': uuid.uuid4()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_lectura', '0003_sesiontest_resultado_snapshot'),
+        ('ejercicios', '0002_version_datos'),
+    ]
+
+    operations = [
+        migrations.RunPython(guardar_cadena, migrations.RunPython.noop),
+    ]
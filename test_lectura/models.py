@@ -61,7 +61,9 @@ class TestLectura(models.Model):
     def puede_acceder(self, usuario, password=None):
         """
         Verifica si un usuario puede acceder a este test.
-        LÓGICA DE DESBLOQUEO CORREGIDA:
+        Los requisitos salen del grafo de prerequisitos (ejercicios.prerequisitos),
+        compilado a partir de test_previo_requerido y bloque_requerido. Los
+        datos iniciales (migración 0004 y preparar_datos) siguen la cadena:
         - test_inicial: SIEMPRE accesible para cualquier usuario registrado
         - test_1: requiere test_inicial completado Y todos los ejercicios del bloque 1
         - test_2: requiere test_1 completado Y todos los ejercicios del bloque 2
@@ -83,73 +85,32 @@ class TestLectura(models.Model):
             if not password or password != self.password_acceso:
                 return False, "Password incorrecto"
         
-        # LÓGICA DE DESBLOQUEO ESPECÍFICA
-        if self.nombre == 'test_inicial':
-            # TEST INICIAL: SIEMPRE ACCESIBLE para usuarios registrados
-            return True, ""
-        
-        elif self.nombre == 'test_1':
-            # TEST 1: requiere test_inicial completado Y bloque 1 completado
-            from usuarios.models import ProgresoTests
-            
-            # Verificar test_inicial completado
-            test_inicial_completado = ProgresoTests.objects.filter(
-                usuario=usuario,
-                test_nombre='test_inicial',
-                completado=True
-            ).exists()
-            
-            if not test_inicial_completado:
-                return False, "Debes completar primero el Test Inicial"
-            
-            # Verificar bloque 1 completado completamente
-            if not usuario.bloque_completado(1):
-                return False, "Debes completar todos los ejercicios del Bloque 1 (niveles 1, 2 y 3)"
-            
-            # Si llegamos aquí, puede acceder
-            return True, ""
+        from ejercicios.prerequisitos import obtener_grafo, TEST
+        from usuarios.progreso import obtener_progreso
         
-        elif self.nombre == 'test_2':
-            # TEST 2: requiere test_1 completado Y bloque 2 completado
-            from usuarios.models import ProgresoTests
-            
-            # Verificar test_1 completado
-            test_1_completado = ProgresoTests.objects.filter(
-                usuario=usuario,
-                test_nombre='test_1',
-                completado=True
-            ).exists()
-            
-            if not test_1_completado:
-                return False, "Debes completar primero el Test 1"
-            
-            # Verificar bloque 2 completado completamente
-            if not usuario.bloque_completado(2):
-                return False, "Debes completar todos los ejercicios del Bloque 2 (niveles 4, 5 y 6)"
-            
-            # Si llegamos aquí, puede acceder
-            return True, ""
+        grafo = obtener_grafo()
+        pendientes = grafo.pendientes((TEST, self.nombre), grafo.satisfechos(obtener_progreso(usuario)))
+        if pendientes:
+            return False, mensaje_requisito_pendiente(pendientes[0])
         
-        else:
-            # RESTO DE TESTS: requieren test_2 completado Y bloque 3 completado
-            from usuarios.models import ProgresoTests
-            
-            # Verificar test_2 completado
-            test_2_completado = ProgresoTests.objects.filter(
-                usuario=usuario,
-                test_nombre='test_2',
-                completado=True
-            ).exists()
-            
-            if not test_2_completado:
-                return False, "Debes completar primero el Test 2"
-            
-            # Verificar bloque 3 completado completamente
-            if not usuario.bloque_completado(3):
-                return False, "Debes completar todos los ejercicios del Bloque 3 (niveles 7, 8 y 9)"
-            
-            # Si llegamos aquí, puede acceder
-            return True, ""
+        return True, ""
+
+
+def mensaje_requisito_pendiente(requisito):
+    """
+    Mensaje para el usuario sobre el primer requisito pendiente de un test.
+    """
+    from ejercicios.prerequisitos import TEST
+    
+    tipo, valor = requisito
+    if tipo == TEST:
+        return f"Debes completar primero el {valor.replace('_', ' ').title()}"
+    
+    primer_nivel = (valor - 1) * 3 + 1
+    return (
+        f"Debes completar todos los ejercicios del Bloque {valor} "
+        f"(niveles {primer_nivel}, {primer_nivel + 1} y {primer_nivel + 2})"
+    )
 
 
 class PreguntaTest(models.Model):
@@ -209,6 +170,9 @@ class SesionTest(models.Model):
     # Estado
     completado = models.BooleanField(default=False)
     
+    # Resultado completo calculado al finalizar (ver test_lectura.resultados)
+    resultado_snapshot = models.JSONField(null=True, blank=True, editable=False)
+    
     class Meta:
         verbose_name = 'Sesión de Test'
         verbose_name_plural = 'Sesiones de Test'
@@ -287,7 +251,11 @@ class RespuestaUsuario(models.Model):
     def __str__(self):
         return f"{self.sesion.usuario.nombre_completo} - {self.pregunta}"
     
-    def save(self, *args, **kwargs):
-        # Verificar automáticamente si la respuesta es correcta
-        self.es_correcta = self.opcion_seleccionada.es_correcta
+    def save(self, *args, clave=None, **kwargs):
+        # Verificar automáticamente si la respuesta es correcta. Con la clave
+        # del test (test_lectura.claves) no hace falta cargar la opción.
+        if clave is not None:
+            self.es_correcta = clave.es_correcta(self.opcion_seleccionada_id)
+        else:
+            self.es_correcta = self.opcion_seleccionada.es_correcta
         super().save(*args, **kwargs)
\ No newline at end of file
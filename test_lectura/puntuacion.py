@@ -0,0 +1,88 @@
+# test_lectura/puntuacion.py
+import json
+
+from .claves import obtener_clave
+from .models import RespuestaUsuario
+
+
+class RespuestasInvalidas(ValueError):
+    """Las respuestas enviadas no corresponden a las preguntas del test."""
+
+
+def _sin_repetidas(pares):
+    """object_pairs_hook de json.loads: una pregunta no puede venir dos veces."""
+    claves = [clave for clave, _ in pares]
+    if len(set(claves)) != len(claves):
+        raise RespuestasInvalidas("Hay preguntas respondidas más de una vez")
+    return dict(pares)
+
+
+def leer_respuestas(texto):
+    """
+    Lee el JSON {pregunta_id: opcion_id} enviado por el navegador. Lanza
+    RespuestasInvalidas si no se puede leer o repite alguna pregunta.
+    """
+    try:
+        return json.loads(texto, object_pairs_hook=_sin_repetidas)
+    except RespuestasInvalidas:
+        raise
+    except (TypeError, ValueError):
+        raise RespuestasInvalidas("Formato de respuestas no válido")
+
+
+def _normalizar(respuestas):
+    """
+    Convierte el diccionario {pregunta_id: opcion_id} recibido del navegador
+    a enteros. Lanza RespuestasInvalidas si algún identificador no es válido.
+    """
+    if not isinstance(respuestas, dict):
+        raise RespuestasInvalidas("Formato de respuestas no válido")
+    try:
+        pares = {int(pregunta_id): int(opcion_id) for pregunta_id, opcion_id in respuestas.items()}
+    except (TypeError, ValueError):
+        raise RespuestasInvalidas("Identificadores de respuesta no válidos")
+    if len(pares) != len(respuestas):
+        # p.ej. "7" y "07"
+        raise RespuestasInvalidas("Hay preguntas respondidas más de una vez")
+    return pares
+
+
+def puntuar_respuestas(sesion, respuestas):
+    """
+    Valida y puntúa todas las respuestas de una sesión.
+
+    Comprueba contra la clave de respuestas del test (test_lectura.claves)
+    que cada opción existe, pertenece al test de la sesión y corresponde a
+    la pregunta con la que se envía, y que están respondidas todas las
+    preguntas del test, sin consultar la base de datos si la clave ya está
+    construida.
+    Devuelve (respuestas_usuario, respuestas_correctas) con los objetos
+    RespuestaUsuario sin guardar y ya marcados como correctos o no, listos
+    para un bulk_create.
+    """
+    pares = _normalizar(respuestas)
+    clave = obtener_clave(sesion.test)
+
+    sin_responder = set(clave.opciones.values()) - pares.keys()
+    if sin_responder:
+        raise RespuestasInvalidas(f"Faltan {len(sin_responder)} preguntas por responder")
+
+    respuestas_usuario = []
+    respuestas_correctas = 0
+    for pregunta_id, opcion_id in pares.items():
+        if not clave.pertenece(pregunta_id, opcion_id):
+            raise RespuestasInvalidas(
+                f"La opción {opcion_id} no corresponde a la pregunta {pregunta_id}"
+            )
+
+        es_correcta = clave.es_correcta(opcion_id)
+        respuestas_usuario.append(RespuestaUsuario(
+            sesion=sesion,
+            pregunta_id=pregunta_id,
+            opcion_seleccionada_id=opcion_id,
+            es_correcta=es_correcta
+        ))
+        if es_correcta:
+            respuestas_correctas += 1
+
+    return respuestas_usuario, respuestas_correctas
@@ -0,0 +1,174 @@
+# test_lectura/resultados.py
+from .claves import obtener_clave
+from .cuestionario import obtener_cuestionario
+
+# Versión del formato de SesionTest.resultado_snapshot
+VERSION_SNAPSHOT = 1
+
+
+def construir_resultado(sesion, respuestas):
+    """
+    Calcula el resultado completo de una sesión completada: detalle por
+    pregunta, evaluaciones y tiempo formateado. Es exactamente el contexto
+    de resultado_test_view salvo la propia sesión.
+
+    respuestas: iterable de (pregunta_id, opcion_seleccionada_id, es_correcta).
+    Textos y letras salen del cuestionario del test y las opciones
+    correctas de su clave de respuestas, así que no hace consultas si ya
+    están construidos.
+    """
+    cuestionario = obtener_cuestionario(sesion.test)
+    clave = obtener_clave(sesion.test)
+    seleccion = {
+        pregunta_id: (opcion_id, es_correcta)
+        for pregunta_id, opcion_id, es_correcta in respuestas
+    }
+
+    respuestas_detalle = []
+    for pregunta in cuestionario.preguntas:
+        if pregunta['id'] not in seleccion:
+            continue
+        opcion_seleccionada_id, es_correcta = seleccion[pregunta['id']]
+        respuestas_detalle.append({
+            'pregunta_numero': len(respuestas_detalle) + 1,
+            'pregunta_texto': pregunta['pregunta'],
+            'opciones': [
+                {
+                    'letra': cuestionario.letras[opcion['id']],
+                    'texto': opcion['texto'],
+                    'es_correcta': clave.es_correcta(opcion['id']),
+                    'fue_seleccionada': opcion['id'] == opcion_seleccionada_id
+                }
+                for opcion in pregunta['opciones']
+            ],
+            'es_correcta': es_correcta
+        })
+
+    porcentaje_aciertos = 0
+    if sesion.total_preguntas:
+        porcentaje_aciertos = round((sesion.respuestas_correctas / sesion.total_preguntas * 100), 1)
+
+    evaluaciones = generar_evaluaciones(sesion)
+
+    return {
+        'respuestas_detalle': respuestas_detalle,
+        'comprension_porcentaje': porcentaje_aciertos,
+        'respuestas_correctas': sesion.respuestas_correctas,
+        'total_preguntas': sesion.total_preguntas,
+        'velocidad_lectura': sesion.velocidad_lectura,
+        'velocidad_memorizacion': sesion.velocidad_memorizacion,
+        'tiempo_lectura_formateado': formatear_tiempo(sesion.tiempo_lectura),
+        'evaluacion_velocidad': evaluaciones['velocidad'],
+        'evaluacion_vm': evaluaciones['vm'],
+        'evaluacion_comprension': evaluaciones['comprension'],
+        'mensaje_motivacional': evaluaciones['mensaje']
+    }
+
+
+def guardar_snapshot(sesion, respuestas):
+    """
+    Calcula el resultado y lo guarda en sesion.resultado_snapshot.
+    Devuelve el resultado calculado.
+    """
+    resultado = construir_resultado(sesion, respuestas)
+    sesion.resultado_snapshot = {'version': VERSION_SNAPSHOT, 'resultado': resultado}
+    sesion.save(update_fields=['resultado_snapshot'])
+    return resultado
+
+
+def resultado_guardado(sesion):
+    """Resultado guardado de la sesión, o None si no hay snapshot vigente."""
+    snapshot = sesion.resultado_snapshot
+    if snapshot and snapshot.get('version') == VERSION_SNAPSHOT:
+        return snapshot['resultado']
+    return None
+
+
+def formatear_tiempo(duracion):
+    """Formatea un timedelta a formato legible"""
+    if not duracion:
+        return "N/A"
+    total_segundos = int(duracion.total_seconds())
+    minutos = total_segundos // 60
+    segundos = total_segundos % 60
+    return f"{minutos}:{segundos:02d}"
+
+
+def generar_evaluaciones(sesion):
+    """Genera evaluaciones personalizadas según resultados"""
+    v = sesion.velocidad_lectura
+    vm = sesion.velocidad_memorizacion
+    comprension = (sesion.respuestas_correctas / sesion.total_preguntas) * 100 if sesion.total_preguntas else 0
+    
+    # Evaluación velocidad
+    if v < 200:
+        eval_v = {
+            'nivel': 'Lento',
+            'descripcion': 'Tu velocidad de lectura está por debajo del promedio. Con práctica constante usando los ejercicios del método Campayo, mejorarás significativamente.'
+        }
+    elif v < 400:
+        eval_v = {
+            'nivel': 'Promedio',
+            'descripcion': 'Tienes una velocidad de lectura normal. Los ejercicios de entrenamiento te ayudarán a duplicar o triplicar esta velocidad.'
+        }
+    elif v < 700:
+        eval_v = {
+            'nivel': 'Rápido',
+            'descripcion': '¡Excelente! Lees más rápido que el promedio. Continúa practicando para alcanzar la lectura fotográfica.'
+        }
+    else:
+        eval_v = {
+            'nivel': 'Avanzado',
+            'descripcion': '¡Impresionante! Estás en el camino hacia la lectura fotográfica. Sigue entrenando para perfeccionar tu técnica.'
+        }
+    
+    # Evaluación Vm
+    if vm < v * 0.5:
+        eval_vm = {
+            'nivel': 'Mejorable',
+            'descripcion': 'Tu comprensión puede mejorar. Enfócate en entender lo que lees en lugar de solo ver las palabras.'
+        }
+    elif vm < v * 0.7:
+        eval_vm = {
+            'nivel': 'Bueno',
+            'descripcion': 'Buen balance entre velocidad y comprensión. Continúa practicando para aumentar ambas.'
+        }
+    else:
+        eval_vm = {
+            'nivel': 'Excelente',
+            'descripcion': '¡Perfecto! Mantienes excelente comprensión a alta velocidad. Este es el objetivo del método Campayo.'
+        }
+    
+    # Evaluación comprensión
+    if comprension < 60:
+        eval_comp = {
+            'nivel': 'Bajo',
+            'descripcion': 'Menos del 60% de comprensión. Intenta leer más despacio y enfócate en entender el contenido.'
+        }
+    elif comprension < 75:
+        eval_comp = {
+            'nivel': 'Aceptable',
+            'descripcion': 'Comprensión aceptable. Con práctica podrás mantener esta comprensión a mayor velocidad.'
+        }
+    else:
+        eval_comp = {
+            'nivel': 'Excelente',
+            'descripcion': '¡Muy bien! Excelente nivel de comprensión. Este es el nivel que debes mantener.'
+        }
+    
+    # Mensaje motivacional
+    if v >= 700 and comprension >= 75:
+        mensaje = '¡Extraordinario! Estás dominando el método Campayo. Sigue así.'
+    elif v >= 400 and comprension >= 70:
+        mensaje = '¡Muy bien! Estás progresando excelentemente. Continúa con los ejercicios.'
+    elif v < 300 and comprension < 60:
+        mensaje = 'No te desanimes. La práctica diaria con los ejercicios te llevará al siguiente nivel.'
+    else:
+        mensaje = 'Buen trabajo. Sigue practicando los ejercicios para mejorar cada día.'
+    
+    return {
+        'velocidad': eval_v,
+        'vm': eval_vm,
+        'comprension': eval_comp,
+        'mensaje': mensaje
+    }
\ No newline at end of file
@@ -0,0 +1,44 @@
+# test_lectura/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ejercicios.corpus import invalidar_corpus
+from ejercicios.prerequisitos import invalidar_grafo
+from .models import TestLectura, PreguntaTest, OpcionRespuesta
+
+
+@receiver([post_save, post_delete], sender=TestLectura)
+def test_lectura_cambiado(sender, instance, **kwargs):
+    """
+    Recompila el grafo de prerequisitos y el corpus de textos de los
+    ejercicios cuando cambia un test de lectura.
+    """
+    invalidar_grafo()
+    invalidar_corpus()
+
+
+def _tocar_test(test_id):
+    """
+    Actualiza fecha_actualizacion del test para que su clave de respuestas
+    (test_lectura.claves) se reconstruya. Con update() no se emite post_save,
+    así que no se recompila el grafo de prerequisitos.
+    """
+    if test_id:
+        TestLectura.objects.filter(pk=test_id).update(fecha_actualizacion=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=PreguntaTest)
+def pregunta_cambiada(sender, instance, **kwargs):
+    """Invalida la clave de respuestas del test de la pregunta."""
+    _tocar_test(instance.test_id)
+
+
+@receiver([post_save, post_delete], sender=OpcionRespuesta)
+def opcion_cambiada(sender, instance, **kwargs):
+    """Invalida la clave de respuestas del test de la opción."""
+    if OpcionRespuesta.pregunta.is_cached(instance):
+        test_id = instance.pregunta.test_id
+    else:
+        test_id = PreguntaTest.objects.filter(pk=instance.pregunta_id).values_list('test_id', flat=True).first()
+    _tocar_test(test_id)
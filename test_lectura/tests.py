@@ -1,3 +1,373 @@
+import json
+from datetime import timedelta
+
 from django.test import TestCase
+from django.urls import reverse
+
+from usuarios.tests import SIN_ACTIVIDAD, crear_usuario
+
+from .models import OpcionRespuesta, PreguntaTest, RespuestaUsuario, SesionTest, TestLectura
+
+
+def crear_test(nombre='test_inicial', preguntas=2, opciones=3):
+    """Test con `preguntas` preguntas de `opciones` opciones; la primera es la correcta."""
+    test = TestLectura.objects.create(
+        nombre=nombre, titulo=nombre, descripcion='', instrucciones='', texto_titulo=nombre,
+        texto_contenido=' '.join(['palabra'] * 600)
+    )
+    for orden in range(preguntas):
+        pregunta = PreguntaTest.objects.create(test=test, pregunta=f'Pregunta {orden + 1}', orden=orden)
+        for opcion in range(opciones):
+            OpcionRespuesta.objects.create(
+                pregunta=pregunta, texto=f'Opción {opcion + 1}', es_correcta=opcion == 0, orden=opcion
+            )
+    return test
+
+
+def opciones_de(test):
+    """[(pregunta_id, [opcion_id, ...]), ...] en orden, con la correcta primero."""
+    return [
+        (pregunta.id, [opcion.id for opcion in pregunta.opciones.all()])
+        for pregunta in test.preguntas.prefetch_related('opciones')
+    ]
+
+
+@SIN_ACTIVIDAD
+class FinalizarTestTests(TestCase):
+
+    def setUp(self):
+        self.usuario = crear_usuario()
+        self.test = crear_test()
+        self.opciones = opciones_de(self.test)
+        self.sesion = SesionTest.objects.create(
+            usuario=self.usuario, test=self.test, tiempo_lectura=timedelta(minutes=3)
+        )
+        self.client.force_login(self.usuario)
+
+    def _finalizar(self, respuestas):
+        if not isinstance(respuestas, str):
+            respuestas = json.dumps(respuestas)
+        return self.client.post(
+            reverse('test_lectura:finalizar_test'), {'sesion_id': self.sesion.id, 'respuestas': respuestas}
+        )
+
+    def _rechazada(self, respuestas):
+        respuesta = self._finalizar(respuestas)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(RespuestaUsuario.objects.exists())
+        self.sesion.refresh_from_db()
+        self.assertFalse(self.sesion.completado)
+        return respuesta
+
+    def test_puntua_con_la_clave(self):
+        (p1, opciones1), (p2, opciones2) = self.opciones
+        respuesta = self._finalizar({str(p1): str(opciones1[0]), str(p2): str(opciones2[2])})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.json()['success'])
+
+        self.sesion.refresh_from_db()
+        self.assertTrue(self.sesion.completado)
+        self.assertEqual((self.sesion.respuestas_correctas, self.sesion.total_preguntas), (1, 2))
+        for guardada in RespuestaUsuario.objects.select_related('opcion_seleccionada'):
+            self.assertEqual(guardada.es_correcta, guardada.opcion_seleccionada.es_correcta)
+
+    def test_opcion_de_otro_test(self):
+        ajena = opciones_de(crear_test('test_1'))[0][1][0]
+        (p1, opciones1), (p2, _) = self.opciones
+        self._rechazada({str(p1): str(opciones1[0]), str(p2): str(ajena)})
+
+    def test_opcion_de_otra_pregunta(self):
+        (p1, opciones1), (p2, _) = self.opciones
+        self._rechazada({str(p1): str(opciones1[0]), str(p2): str(opciones1[1])})
+
+    def test_pregunta_repetida(self):
+        (p1, opciones1), (p2, opciones2) = self.opciones
+        self._rechazada(f'{{"{p1}": "{opciones1[0]}", "{p1}": "{opciones1[1]}", "{p2}": "{opciones2[0]}"}}')
+        self._rechazada({str(p1): str(opciones1[0]), f'0{p1}': str(opciones1[1]), str(p2): str(opciones2[0])})
+
+    def test_faltan_respuestas(self):
+        (p1, opciones1), _ = self.opciones
+        self._rechazada({str(p1): str(opciones1[0])})
+        self._rechazada({})
+        self.assertEqual(
+            self.client.post(reverse('test_lectura:finalizar_test'), {'sesion_id': self.sesion.id}).status_code, 400
+        )
+
+    def test_formato_no_valido(self):
+        self._rechazada('no es json')
+        self._rechazada('[1, 2]')
+        (p1, _), (p2, opciones2) = self.opciones
+        self._rechazada({str(p1): 'a', str(p2): str(opciones2[0])})
+
+    def test_sesion_ya_finalizada(self):
+        respuestas = {str(pregunta_id): str(opciones[0]) for pregunta_id, opciones in self.opciones}
+        self.assertEqual(self._finalizar(respuestas).status_code, 200)
+
+        respuesta = self._finalizar(respuestas)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(RespuestaUsuario.objects.count(), 2)
+
+
+class ClaveRespuestasTests(TestCase):
+    """
+    La clave de respuestas y el cuestionario se guardan por proceso y se
+    versionan con test.fecha_actualizacion, que actualizan las señales de
+    PreguntaTest y OpcionRespuesta.
+    """
+
+    def setUp(self):
+        self.test = crear_test()
+        (self.pregunta_id, self.opciones), _ = opciones_de(self.test)
+
+    def _test(self):
+        # Cada petición lee el test de la base de datos
+        return TestLectura.objects.get(pk=self.test.pk)
+
+    def test_cambiar_la_correcta_invalida_la_clave(self):
+        from .claves import obtener_clave
+
+        correcta, otra = self.opciones[0], self.opciones[1]
+        self.assertTrue(obtener_clave(self._test()).es_correcta(correcta))
+
+        OpcionRespuesta.objects.filter(pk=correcta).update(es_correcta=False)
+        opcion = OpcionRespuesta.objects.get(pk=otra)
+        opcion.es_correcta = True
+        opcion.save()
+        opcion = OpcionRespuesta.objects.get(pk=correcta)
+        opcion.save()
+
+        clave = obtener_clave(self._test())
+        self.assertFalse(clave.es_correcta(correcta))
+        self.assertTrue(clave.es_correcta(otra))
+        self.assertEqual(clave.correctas[self.pregunta_id], otra)
+
+    def test_borrar_una_opcion_invalida_la_clave(self):
+        from .claves import obtener_clave
+
+        self.assertTrue(obtener_clave(self._test()).pertenece(self.pregunta_id, self.opciones[2]))
+        OpcionRespuesta.objects.get(pk=self.opciones[2]).delete()
+        self.assertFalse(obtener_clave(self._test()).pertenece(self.pregunta_id, self.opciones[2]))
+
+    def test_sin_cambios_reutiliza_la_clave(self):
+        from .claves import obtener_clave
+
+        obtener_clave(self._test())
+        test = self._test()
+        with self.assertNumQueries(0):
+            obtener_clave(test)
+
+    def test_editar_opciones_y_preguntas_invalida_el_cuestionario(self):
+        from .cuestionario import obtener_cuestionario
+
+        anterior = obtener_cuestionario(self._test())
+
+        opcion = OpcionRespuesta.objects.get(pk=self.opciones[1])
+        opcion.texto = 'Texto corregido'
+        opcion.save()
+        cuestionario = obtener_cuestionario(self._test())
+        self.assertNotEqual(cuestionario.etag, anterior.etag)
+        self.assertEqual(cuestionario.preguntas[0]['opciones'][1]['texto'], 'Texto corregido')
+
+        pregunta = PreguntaTest.objects.get(pk=self.pregunta_id)
+        pregunta.pregunta = 'Pregunta corregida'
+        pregunta.save()
+        self.assertEqual(obtener_cuestionario(self._test()).preguntas[0]['pregunta'], 'Pregunta corregida')
+
+
+@SIN_ACTIVIDAD
+class PreguntasTestTests(TestCase):
+
+    def setUp(self):
+        self.usuario = crear_usuario()
+        self.test = crear_test()
+        self.sesion = SesionTest.objects.create(usuario=self.usuario, test=self.test)
+        self.client.force_login(self.usuario)
+
+    def _finalizar_lectura(self):
+        respuesta = self.client.post(
+            reverse('test_lectura:finalizar_lectura'), {'sesion_id': self.sesion.id, 'tiempo_lectura_ms': 200000}
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()['preguntas_url']
+
+    def test_antes_de_leer_no_hay_preguntas(self):
+        url = reverse('test_lectura:preguntas', kwargs={'sesion_id': self.sesion.id})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_la_pagina_carga_las_preguntas_de_la_url(self):
+        url = self._finalizar_lectura()
+        pagina = self.client.get(reverse('test_lectura:iniciar', kwargs={'test_id': self.test.id}))
+        self.assertEqual(pagina.context['fase'], 'preguntas')
+        self.assertContains(pagina, f'data-src="{url}"')
+        self.assertNotContains(pagina, 'Pregunta 1')
+
+    def test_revalidacion_con_etag(self):
+        url = self._finalizar_lectura()
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['total_preguntas'], 2)
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+        etag = respuesta['ETag']
+
+        no_modificado = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(no_modificado.status_code, 304)
+        self.assertEqual(no_modificado.content, b'')
+        self.assertEqual(no_modificado['ETag'], etag)
+
+        # Una pregunta editada cambia el ETag y se vuelve a enviar el cuerpo
+        pregunta = self.test.preguntas.first()
+        pregunta.pregunta = 'Pregunta corregida'
+        pregunta.save()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertEqual(respuesta.json()['preguntas'][0]['pregunta'], 'Pregunta corregida')
+
+    def test_sesion_de_otro_usuario(self):
+        url = self._finalizar_lectura()
+        self.client.force_login(crear_usuario('otro@ejemplo.com'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@SIN_ACTIVIDAD
+class ResultadoSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.usuario = crear_usuario()
+        self.test = crear_test()
+        self.opciones = opciones_de(self.test)
+        self.sesion = SesionTest.objects.create(
+            usuario=self.usuario, test=self.test, tiempo_lectura=timedelta(minutes=3)
+        )
+        self.client.force_login(self.usuario)
+        self.url = reverse('test_lectura:resultado', kwargs={'sesion_id': self.sesion.id})
+
+    def _finalizar(self):
+        (p1, opciones1), (p2, opciones2) = self.opciones
+        respuestas = json.dumps({str(p1): str(opciones1[0]), str(p2): str(opciones2[1])})
+        respuesta = self.client.post(
+            reverse('test_lectura:finalizar_test'), {'sesion_id': self.sesion.id, 'respuestas': respuestas}
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.sesion.refresh_from_db()
+
+    def test_resultado_sale_del_snapshot(self):
+        self._finalizar()
+        self.assertIsNotNone(self.sesion.resultado_snapshot)
+        detalle = self.sesion.resultado_snapshot['resultado']['respuestas_detalle']
+        self.assertEqual([pregunta['es_correcta'] for pregunta in detalle], [True, False])
+
+        # Lo que se muestra es lo guardado, sin recalcular
+        self.sesion.resultado_snapshot['resultado']['mensaje_motivacional'] = 'Guardado'
+        self.sesion.save(update_fields=['resultado_snapshot'])
+
+        # Sesión, usuario y la sesión del test con su TestLectura
+        with self.assertNumQueries(3):
+            respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['mensaje_motivacional'], 'Guardado')
+        self.assertEqual(respuesta.context['respuestas_correctas'], 1)
+
+    def test_sesion_anterior_genera_el_snapshot_al_verla(self):
+        self._finalizar()
+        esperado = self.sesion.resultado_snapshot
+        SesionTest.objects.filter(pk=self.sesion.pk).update(resultado_snapshot=None)
+
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.context['respuestas_detalle']), 2)
+        self.sesion.refresh_from_db()
+        self.assertEqual(self.sesion.resultado_snapshot, esperado)
+
+    def test_snapshot_de_otra_version_se_regenera(self):
+        from .resultados import VERSION_SNAPSHOT
+
+        self._finalizar()
+        SesionTest.objects.filter(pk=self.sesion.pk).update(
+            resultado_snapshot={'version': VERSION_SNAPSHOT - 1, 'resultado': {}}
+        )
+        self.assertEqual(self.client.get(self.url).context['total_preguntas'], 2)
+        self.sesion.refresh_from_db()
+        self.assertEqual(self.sesion.resultado_snapshot['version'], VERSION_SNAPSHOT)
+
+    def test_editar_la_sesion_en_el_admin_borra_el_snapshot(self):
+        from django.contrib import admin
+
+        self._finalizar()
+        self.sesion.respuestas_correctas = 2
+        admin.site._registry[SesionTest].save_model(None, self.sesion, None, True)
+        self.sesion.refresh_from_db()
+        self.assertIsNone(self.sesion.resultado_snapshot)
+        self.assertEqual(self.client.get(self.url).context['respuestas_correctas'], 2)
+
+
+class RespuestaUsuarioTests(TestCase):
+
+    def setUp(self):
+        self.test = crear_test()
+        (self.pregunta_id, self.opciones), _ = opciones_de(self.test)
+        self.sesion = SesionTest.objects.create(usuario=crear_usuario(), test=self.test)
+
+    def test_es_correcta_sale_de_la_opcion(self):
+        respuesta = RespuestaUsuario(
+            sesion_id=self.sesion.pk, pregunta_id=self.pregunta_id, opcion_seleccionada_id=self.opciones[0]
+        )
+        # La opción y el INSERT; no se cargan ni la sesión ni el test
+        with self.assertNumQueries(2):
+            respuesta.save()
+        self.assertTrue(respuesta.es_correcta)
+
+    def test_con_la_clave_no_consulta_la_opcion(self):
+        from .claves import obtener_clave
+
+        clave = obtener_clave(self.test)
+        respuesta = RespuestaUsuario(
+            sesion_id=self.sesion.pk, pregunta_id=self.pregunta_id, opcion_seleccionada_id=self.opciones[1],
+            es_correcta=True
+        )
+        with self.assertNumQueries(1):
+            respuesta.save(clave=clave)
+        self.assertFalse(respuesta.es_correcta)
+
+
+class TextosEstaticosTests(TestCase):
+    """Los textos tienen que existir al arrancar WhiteNoise; por eso se generan en build.sh."""
+
+    def setUp(self):
+        import tempfile
+
+        from . import textos_estaticos
+
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = self.settings(STATIC_ROOT=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.addCleanup(setattr, textos_estaticos, '_manifiesto', None)
+        self.test = crear_test()
+
+    def servidor(self):
+        from django.http import HttpResponseNotFound
+        from whitenoise.middleware import WhiteNoiseMiddleware
+
+        return WhiteNoiseMiddleware(lambda request: HttpResponseNotFound())
+
+    def test_generados_antes_de_arrancar_se_sirven(self):
+        from django.test import RequestFactory
+
+        from .textos_estaticos import generar_textos, url_texto
+
+        generar_textos([self.test], comprimir=False)
+        url = url_texto(self.test)
+        respuesta = self.servidor()(RequestFactory().get(url))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('immutable', respuesta['Cache-Control'])
+
+    def test_generados_con_el_servidor_en_marcha_no_se_sirven(self):
+        from django.test import RequestFactory
+
+        from .textos_estaticos import generar_textos, url_texto
 
-# Create your tests here.
+        servidor = self.servidor()
+        generar_textos([self.test], comprimir=False)
+        self.assertEqual(servidor(RequestFactory().get(url_texto(self.test))).status_code, 404)
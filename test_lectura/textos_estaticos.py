@@ -0,0 +1,106 @@
+# test_lectura/textos_estaticos.py
+import hashlib
+import json
+import logging
+import os
+
+from django.conf import settings
+from django.utils.html import linebreaks
+
+logger = logging.getLogger(__name__)
+
+# Subdirectorio de STATIC_ROOT donde se escriben los textos
+DIRECTORIO = 'textos'
+MANIFIESTO = 'manifest.json'
+VERSION_MANIFIESTO = 1
+
+# Mismo formato que los nombres de ManifestStaticFilesStorage (nombre.hash.ext),
+# así WHITENOISE_IMMUTABLE_FILE_TEST los trata a todos como inmutables
+LONGITUD_HASH = 12
+
+# {test_id: {'hash', 'archivo'}} del manifiesto, cargado una vez por proceso
+_manifiesto = None
+
+
+def huella_texto(contenido):
+    """Hash del contenido de un test tal como está en la base de datos."""
+    return hashlib.sha256((contenido or '').encode('utf-8')).hexdigest()[:LONGITUD_HASH]
+
+
+def _ruta_directorio():
+    return os.path.join(settings.STATIC_ROOT, DIRECTORIO)
+
+
+def generar_textos(tests, comprimir=True):
+    """
+    Escribe el texto de cada test ya convertido a HTML (igual que el filtro
+    linebreaks de la plantilla) en STATIC_ROOT/textos/test-<id>.<hash>.html,
+    con sus versiones .gz y .br si compensan, y guarda el manifiesto
+    {test_id: {'hash', 'archivo'}}. Borra los textos de versiones anteriores.
+    Devuelve el manifiesto generado.
+    """
+    directorio = _ruta_directorio()
+    os.makedirs(directorio, exist_ok=True)
+
+    compresor = None
+    if comprimir:
+        from whitenoise.compress import Compressor
+        compresor = Compressor(quiet=True)
+
+    textos = {}
+    for test in tests:
+        huella = huella_texto(test.texto_contenido)
+        archivo = f'{DIRECTORIO}/test-{test.pk}.{huella}.html'
+        ruta = os.path.join(settings.STATIC_ROOT, archivo)
+        if not os.path.exists(ruta):
+            with open(ruta, 'w', encoding='utf-8') as f:
+                f.write(linebreaks(test.texto_contenido or '', autoescape=True))
+            if compresor:
+                compresor.compress(ruta)
+        textos[str(test.pk)] = {'hash': huella, 'archivo': archivo}
+
+    # Eliminar versiones que ya no están en el manifiesto
+    vigentes = {os.path.basename(entrada['archivo']) for entrada in textos.values()}
+    for nombre in os.listdir(directorio):
+        base = nombre.removesuffix('.gz').removesuffix('.br')
+        if nombre != MANIFIESTO and base not in vigentes:
+            os.remove(os.path.join(directorio, nombre))
+
+    manifiesto = {'version': VERSION_MANIFIESTO, 'textos': textos}
+    with open(os.path.join(directorio, MANIFIESTO), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2)
+
+    global _manifiesto
+    _manifiesto = textos
+    return manifiesto
+
+
+def _cargar_manifiesto():
+    """
+    Lee el manifiesto una vez por proceso. Los textos se generan en el
+    build (build.sh), igual que collectstatic, antes de arrancar el servidor:
+    WhiteNoise solo sirve los archivos que ya estaban al arrancar.
+    """
+    global _manifiesto
+    if _manifiesto is None:
+        try:
+            with open(os.path.join(_ruta_directorio(), MANIFIESTO), encoding='utf-8') as f:
+                datos = json.load(f)
+            _manifiesto = datos['textos'] if datos.get('version') == VERSION_MANIFIESTO else {}
+        except FileNotFoundError:
+            _manifiesto = {}
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"TEXTOS: manifiesto no válido, se incrusta el texto en la página: {e}")
+            _manifiesto = {}
+    return _manifiesto
+
+
+def url_texto(test):
+    """
+    URL estática del texto del test, o None si no se ha generado o el test
+    ha cambiado desde entonces (en ese caso la plantilla incrusta el texto).
+    """
+    entrada = _cargar_manifiesto().get(str(test.pk))
+    if entrada is None or entrada['hash'] != huella_texto(test.texto_contenido):
+        return None
+    return f"{settings.STATIC_URL}{entrada['archivo']}"
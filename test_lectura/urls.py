@@ -14,6 +14,9 @@ urlpatterns = [
     # Finalizar fase de lectura (AJAX)
     path('finalizar-lectura/', views.finalizar_lectura_view, name='finalizar_lectura'),
     
+    # Preguntas de una sesión en curso (AJAX, admite If-None-Match)
+    path('sesion/<int:sesion_id>/preguntas/', views.preguntas_test_view, name='preguntas'),
+    
     # Finalizar test completo (AJAX)
     path('finalizar-test/', views.finalizar_test_view, name='finalizar_test'),
     
@@ -1,17 +1,22 @@
 # test_lectura/views.py - CON DEBUGGING MEJORADO
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.contrib import messages
 from django.utils import timezone
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_GET
 from django.db import transaction, models
-import json
 from django.urls import reverse
 from datetime import timedelta
 import logging
 
 from .models import TestLectura, PreguntaTest, OpcionRespuesta, SesionTest, RespuestaUsuario
+from .acceso import EvaluadorTests
+from .puntuacion import leer_respuestas, puntuar_respuestas, RespuestasInvalidas
+from .cuestionario import obtener_cuestionario
+from .resultados import guardar_snapshot, resultado_guardado
+from .textos_estaticos import url_texto
 from usuarios.models import Usuario, ProgresoTests
 
 logger = logging.getLogger(__name__)
@@ -21,7 +26,8 @@ logger = logging.getLogger(__name__)
 def lista_tests_view(request):
     """
     Vista principal para mostrar todos los tests disponibles.
-    CON DEBUGGING MEJORADO para identificar problemas de acceso.
+    El estado de cada test se calcula en memoria con EvaluadorTests, así que
+    la vista ejecuta un número fijo de consultas.
     """
     usuario = request.user
     
@@ -29,117 +35,32 @@ def lista_tests_view(request):
     logger.info(f"LISTA_TESTS: Usuario {usuario.email} accediendo a lista de tests")
     logger.info(f"LISTA_TESTS: Es gestor: {usuario.es_gestor()}, Plan: {usuario.plan}")
     
+    evaluador = EvaluadorTests(usuario)
+    
     # Obtener tests accesibles para el usuario
+    tests = list(TestLectura.objects.filter(activo=True).order_by('numero_test'))
     tests_disponibles = []
-    tests = TestLectura.objects.filter(activo=True).order_by('numero_test')
     
     for test in tests:
-        # DEBUG: Log detallado de cada test
-        logger.info(f"LISTA_TESTS: Verificando acceso a test {test.nombre}")
-        
-        puede_acceder, mensaje_error = test.puede_acceder(usuario)
+        test_data = evaluador.estado(test)
         
         # DEBUG: Log resultado de verificación
-        logger.info(f"LISTA_TESTS: Test {test.nombre} - puede_acceder: {puede_acceder}, mensaje: '{mensaje_error}'")
-        
-        # Verificar si ya lo ha completado
-        ya_completado = SesionTest.objects.filter(
-            usuario=usuario,
-            test=test,
-            completado=True
-        ).exists()
-        
-        logger.info(f"LISTA_TESTS: Test {test.nombre} - ya_completado: {ya_completado}")
-        
-        # Obtener mejor resultado si existe
-        mejor_resultado = None
-        if ya_completado:
-            mejor_sesion = SesionTest.objects.filter(
-                usuario=usuario,
-                test=test,
-                completado=True
-            ).order_by('-velocidad_lectura').first()
-            
-            if mejor_sesion:
-                mejor_resultado = {
-                    'velocidad_lectura': mejor_sesion.velocidad_lectura,
-                    'velocidad_memorizacion': mejor_sesion.velocidad_memorizacion,
-                    'respuestas_correctas': mejor_sesion.respuestas_correctas,
-                    'fecha': mejor_sesion.fecha_fin,
-                    'sesion_id': mejor_sesion.id
-                }
-        
-        # Lógica final de acceso
-        acceso_final = puede_acceder and not ya_completado
-        mensaje_final = mensaje_error if not puede_acceder else ('Ya completado' if ya_completado else '')
-        
-        logger.info(f"LISTA_TESTS: Test {test.nombre} - acceso_final: {acceso_final}, mensaje_final: '{mensaje_final}'")
+        logger.info(
+            f"LISTA_TESTS: Test {test.nombre} - acceso_final: {test_data['puede_acceder']}, "
+            f"ya_completado: {test_data['ya_completado']}, mensaje_final: '{test_data['mensaje_error']}'"
+        )
         
-        tests_disponibles.append({
-            'test': test,
-            'puede_acceder': acceso_final,
-            'mensaje_error': mensaje_final,
-            'ya_completado': ya_completado,
-            'mejor_resultado': mejor_resultado
-        })
-    
-    # DEBUG: Verificar estado de ProgresoTests del usuario
-    progresos = ProgresoTests.objects.filter(usuario=usuario, completado=True)
-    logger.info(f"LISTA_TESTS: Tests completados por {usuario.email}:")
-    for progreso in progresos:
-        logger.info(f"  - {progreso.test_nombre} completado el {progreso.fecha_realizacion}")
-    
-    # DEBUG: Verificar bloques completados
-    for bloque in [1, 2, 3]:
-        completado = usuario.bloque_completado(bloque)
-        logger.info(f"LISTA_TESTS: Bloque {bloque} completado: {completado}")
-    
-    # Estadísticas globales
-    sesiones_completadas = SesionTest.objects.filter(
-        usuario=usuario,
-        completado=True
-    )
-    
-    total_tests = sesiones_completadas.count()
-    mejor_velocidad = sesiones_completadas.aggregate(
-        models.Max('velocidad_lectura')
-    )['velocidad_lectura__max'] or 0
-    mejor_vm = sesiones_completadas.aggregate(
-        models.Max('velocidad_memorizacion')
-    )['velocidad_memorizacion__max'] or 0
+        tests_disponibles.append(test_data)
     
-    # Promedio de comprensión
-    if total_tests > 0:
-        promedio_comprension = sesiones_completadas.aggregate(
-            models.Avg('respuestas_correctas')
-        )['respuestas_correctas__avg']
-        promedio_comprension = round((promedio_comprension / 20) * 100, 1)
-    else:
-        promedio_comprension = 0
-    
-    # Evolución por test
-    evolucion_por_test = {}
-    for test in tests:
-        intentos = SesionTest.objects.filter(
-            usuario=usuario,
-            test=test,
-            completado=True
-        ).order_by('-fecha_fin')
-        
-        if intentos.exists():
-            evolucion_por_test[test.nombre] = {
-                'test': test,
-                'intentos': intentos
-            }
+    # DEBUG: Estado de progreso del usuario (sale de la foto ya cargada)
+    logger.info(f"LISTA_TESTS: Tests completados por {usuario.email}: {sorted(evaluador.progreso.tests_completados)}")
+    logger.info(f"LISTA_TESTS: Bloques completados: {sorted(evaluador.progreso.bloques_completados())}")
     
     context = {
         'tests_disponibles': tests_disponibles,
         'usuario': usuario,
-        'total_tests': total_tests,
-        'mejor_velocidad': mejor_velocidad,
-        'mejor_vm': mejor_vm,
-        'promedio_comprension': promedio_comprension,
-        'evolucion_por_test': evolucion_por_test
+        **evaluador.estadisticas(),
+        'evolucion_por_test': evaluador.evolucion_por_test(tests)
     }
     
     return render(request, 'test_lectura/lista.html', context)
@@ -207,19 +128,18 @@ def iniciar_test_view(request, test_id):
     
     # Determinar fase
     if sesion.tiempo_lectura:
-        # Ya leyó, mostrar preguntas
-        preguntas = PreguntaTest.objects.filter(test=test).prefetch_related('opciones')
+        # Ya leyó, mostrar preguntas: la página las pide a preguntas_test_view
         context = {
             'test': test,
             'sesion': sesion,
-            'preguntas': preguntas,
             'fase': 'preguntas'
         }
     else:
-        # Fase de lectura
+        # Fase de lectura: el texto se carga del archivo estático si está generado
         context = {
             'test': test,
             'sesion': sesion,
+            'texto_url': url_texto(test),
             'fase': 'lectura'
         }
     
@@ -231,43 +151,25 @@ def iniciar_test_view(request, test_id):
 def finalizar_lectura_view(request):
     """
     Vista AJAX para finalizar la fase de lectura y pasar a las preguntas.
+    Devuelve la URL de las preguntas (preguntas_test_view).
     """
     sesion_id = request.POST.get('sesion_id')
     tiempo_lectura_ms = request.POST.get('tiempo_lectura_ms')
     
     try:
-        sesion = SesionTest.objects.get(id=sesion_id, usuario=request.user)
+        sesion = SesionTest.objects.select_related('test').get(id=sesion_id, usuario=request.user)
         
         # Guardar tiempo de lectura
         tiempo_lectura = timedelta(milliseconds=int(tiempo_lectura_ms))
         sesion.tiempo_lectura = tiempo_lectura
-        sesion.save()
+        sesion.save(update_fields=['tiempo_lectura'])
         
         logger.info(f"FINALIZAR_LECTURA: Tiempo de lectura guardado para sesión {sesion_id}: {tiempo_lectura}")
         
-        # Obtener preguntas del test
-        preguntas = list(PreguntaTest.objects.filter(test=sesion.test).prefetch_related('opciones'))
-        
-        # Preparar datos de preguntas para JSON
-        preguntas_data = []
-        for pregunta in preguntas:
-            opciones_data = []
-            for opcion in pregunta.opciones.all():
-                opciones_data.append({
-                    'id': opcion.id,
-                    'texto': opcion.texto
-                })
-            
-            preguntas_data.append({
-                'id': pregunta.id,
-                'pregunta': pregunta.pregunta,
-                'opciones': opciones_data
-            })
-        
+        # La página se recarga en la fase de preguntas y las pide a preguntas_test_view
         return JsonResponse({
             'success': True,
-            'preguntas': preguntas_data,
-            'total_preguntas': len(preguntas_data)
+            'preguntas_url': reverse('test_lectura:preguntas', kwargs={'sesion_id': sesion.id})
         })
         
     except SesionTest.DoesNotExist:
@@ -278,6 +180,32 @@ def finalizar_lectura_view(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@login_required
+@require_GET
+def preguntas_test_view(request, sesion_id):
+    """
+    Devuelve las preguntas de la sesión en curso, con el cuerpo ya
+    serializado del cuestionario. Admite If-None-Match: si el navegador ya
+    tiene la versión actual (p.ej. al recargar la página de preguntas) se
+    responde 304 sin cuerpo.
+    """
+    sesion = get_object_or_404(
+        SesionTest.objects.select_related('test'),
+        id=sesion_id,
+        usuario=request.user,
+        completado=False,
+        tiempo_lectura__isnull=False
+    )
+    cuestionario = obtener_cuestionario(sesion.test)
+    
+    no_modificado = get_conditional_response(request, etag=cuestionario.etag)
+    if no_modificado is not None:
+        no_modificado['ETag'] = cuestionario.etag
+        patch_cache_control(no_modificado, private=True, no_cache=True)
+        return no_modificado
+    return _respuesta_cuestionario(cuestionario)
+
+
 @login_required
 @require_POST
 def finalizar_test_view(request):
@@ -288,42 +216,36 @@ def finalizar_test_view(request):
     respuestas_json = request.POST.get('respuestas')
     
     try:
+        respuestas = leer_respuestas(respuestas_json)
+        
         with transaction.atomic():
-            sesion = SesionTest.objects.get(id=sesion_id, usuario=request.user)
-            respuestas = json.loads(respuestas_json)
+            sesion = SesionTest.objects.select_related('test').select_for_update(of=('self',)).get(
+                id=sesion_id,
+                usuario=request.user
+            )
+            if sesion.completado:
+                return JsonResponse({'error': 'El test ya ha sido finalizado'}, status=400)
             
             logger.info(f"FINALIZAR_TEST: Procesando respuestas para sesión {sesion_id}")
             
-            # Guardar respuestas
-            respuestas_correctas = 0
-            total_preguntas = len(respuestas)
-            
-            for pregunta_id, opcion_id in respuestas.items():
-                pregunta = PreguntaTest.objects.get(id=pregunta_id)
-                opcion = OpcionRespuesta.objects.get(id=opcion_id)
-                
-                # Crear respuesta del usuario
-                RespuestaUsuario.objects.create(
-                    sesion=sesion,
-                    pregunta=pregunta,
-                    opcion_seleccionada=opcion
-                )
-                
-                if opcion.es_correcta:
-                    respuestas_correctas += 1
+            # Validar y puntuar todas las respuestas de una vez
+            respuestas_usuario, respuestas_correctas = puntuar_respuestas(sesion, respuestas)
+            total_preguntas = len(respuestas_usuario)
+            RespuestaUsuario.objects.bulk_create(respuestas_usuario)
             
             # Actualizar sesión con resultados
             sesion.respuestas_correctas = respuestas_correctas
             sesion.total_preguntas = total_preguntas
-            sesion.fecha_fin = timezone.now()
-            sesion.completado = True
             
-            # Calcular velocidades
-            sesion.calcular_velocidades()
-            
-            # Finalizar sesión (esto actualiza automáticamente ProgresoTests)
+            # Finalizar sesión: calcula velocidades y actualiza ProgresoTests
             sesion.finalizar_sesion()
             
+            # Guardar el resultado completo para la página de resultados
+            guardar_snapshot(sesion, [
+                (respuesta.pregunta_id, respuesta.opcion_seleccionada_id, respuesta.es_correcta)
+                for respuesta in respuestas_usuario
+            ])
+            
             logger.info(f"FINALIZAR_TEST: Test {sesion.test.nombre} completado por {request.user.email}")
             logger.info(f"  - Velocidad lectura: {sesion.velocidad_lectura} ppm")
             logger.info(f"  - Velocidad memorización: {sesion.velocidad_memorizacion} ppm")
@@ -334,6 +256,9 @@ def finalizar_test_view(request):
                 'redirect_url': reverse('test_lectura:resultado', kwargs={'sesion_id': sesion.id})
             })
             
+    except RespuestasInvalidas as e:
+        logger.warning(f"FINALIZAR_TEST: Respuestas no válidas en sesión {sesion_id}: {e}")
+        return JsonResponse({'error': str(e)}, status=400)
     except SesionTest.DoesNotExist:
         logger.error(f"FINALIZAR_TEST: Sesión {sesion_id} no encontrada")
         return JsonResponse({'error': 'Sesión no encontrada'}, status=404)
@@ -348,7 +273,7 @@ def resultado_test_view(request, sesion_id):
     Vista para mostrar los resultados detallados de un test.
     """
     sesion = get_object_or_404(
-        SesionTest, 
+        SesionTest.objects.select_related('test'), 
         id=sesion_id, 
         usuario=request.user, 
         completado=True
@@ -356,140 +281,27 @@ def resultado_test_view(request, sesion_id):
     
     logger.info(f"RESULTADO_TEST: Mostrando resultados de sesión {sesion_id} para {request.user.email}")
     
-    # Obtener respuestas del usuario
-    respuestas = RespuestaUsuario.objects.filter(sesion=sesion).select_related(
-        'pregunta', 'opcion_seleccionada'
-    )
-    
-    # Preparar datos de respuestas
-    respuestas_detalle = []
-    for idx, respuesta in enumerate(respuestas, 1):
-        # Obtener todas las opciones de la pregunta
-        opciones_pregunta = []
-        for opcion in respuesta.pregunta.opciones.all():
-            opciones_pregunta.append({
-                'letra': chr(64 + opcion.orden + 1),  # A, B, C, D
-                'texto': opcion.texto,
-                'es_correcta': opcion.es_correcta,
-                'fue_seleccionada': opcion.id == respuesta.opcion_seleccionada.id
-            })
-        
-        respuestas_detalle.append({
-            'pregunta_numero': idx,
-            'pregunta_texto': respuesta.pregunta.pregunta,
-            'opciones': opciones_pregunta,
-            'es_correcta': respuesta.es_correcta
-        })
-    
-    # Calcular estadísticas
-    porcentaje_aciertos = round((sesion.respuestas_correctas / sesion.total_preguntas * 100), 1)
-    
-    # Evaluaciones
-    evaluaciones = _generar_evaluaciones(sesion)
+    # El resultado se calcula al finalizar la sesión; las sesiones anteriores
+    # a resultado_snapshot se calculan aquí una vez y se guardan
+    resultado = resultado_guardado(sesion)
+    if resultado is None:
+        logger.info(f"RESULTADO_TEST: Generando snapshot de resultado para sesión {sesion_id}")
+        respuestas = sesion.respuestas.values_list('pregunta_id', 'opcion_seleccionada_id', 'es_correcta')
+        resultado = guardar_snapshot(sesion, respuestas)
     
     context = {
         'sesion': sesion,
-        'respuestas_detalle': respuestas_detalle,
-        'comprension_porcentaje': porcentaje_aciertos,
-        'respuestas_correctas': sesion.respuestas_correctas,
-        'total_preguntas': sesion.total_preguntas,
-        'velocidad_lectura': sesion.velocidad_lectura,
-        'velocidad_memorizacion': sesion.velocidad_memorizacion,
-        'tiempo_lectura_formateado': _formatear_tiempo(sesion.tiempo_lectura),
-        'evaluacion_velocidad': evaluaciones['velocidad'],
-        'evaluacion_vm': evaluaciones['vm'],
-        'evaluacion_comprension': evaluaciones['comprension'],
-        'mensaje_motivacional': evaluaciones['mensaje']
+        **resultado
     }
     
     return render(request, 'test_lectura/resultado.html', context)
 
 
-def _formatear_tiempo(duracion):
-    """Formatea un timedelta a formato legible"""
-    if not duracion:
-        return "N/A"
-    total_segundos = int(duracion.total_seconds())
-    minutos = total_segundos // 60
-    segundos = total_segundos % 60
-    return f"{minutos}:{segundos:02d}"
-
-
-def _generar_evaluaciones(sesion):
-    """Genera evaluaciones personalizadas según resultados"""
-    v = sesion.velocidad_lectura
-    vm = sesion.velocidad_memorizacion
-    comprension = (sesion.respuestas_correctas / sesion.total_preguntas) * 100
-    
-    # Evaluación velocidad
-    if v < 200:
-        eval_v = {
-            'nivel': 'Lento',
-            'descripcion': 'Tu velocidad de lectura está por debajo del promedio. Con práctica constante usando los ejercicios del método Campayo, mejorarás significativamente.'
-        }
-    elif v < 400:
-        eval_v = {
-            'nivel': 'Promedio',
-            'descripcion': 'Tienes una velocidad de lectura normal. Los ejercicios de entrenamiento te ayudarán a duplicar o triplicar esta velocidad.'
-        }
-    elif v < 700:
-        eval_v = {
-            'nivel': 'Rápido',
-            'descripcion': '¡Excelente! Lees más rápido que el promedio. Continúa practicando para alcanzar la lectura fotográfica.'
-        }
-    else:
-        eval_v = {
-            'nivel': 'Avanzado',
-            'descripcion': '¡Impresionante! Estás en el camino hacia la lectura fotográfica. Sigue entrenando para perfeccionar tu técnica.'
-        }
-    
-    # Evaluación Vm
-    if vm < v * 0.5:
-        eval_vm = {
-            'nivel': 'Mejorable',
-            'descripcion': 'Tu comprensión puede mejorar. Enfócate en entender lo que lees en lugar de solo ver las palabras.'
-        }
-    elif vm < v * 0.7:
-        eval_vm = {
-            'nivel': 'Bueno',
-            'descripcion': 'Buen balance entre velocidad y comprensión. Continúa practicando para aumentar ambas.'
-        }
-    else:
-        eval_vm = {
-            'nivel': 'Excelente',
-            'descripcion': '¡Perfecto! Mantienes excelente comprensión a alta velocidad. Este es el objetivo del método Campayo.'
-        }
-    
-    # Evaluación comprensión
-    if comprension < 60:
-        eval_comp = {
-            'nivel': 'Bajo',
-            'descripcion': 'Menos del 60% de comprensión. Intenta leer más despacio y enfócate en entender el contenido.'
-        }
-    elif comprension < 75:
-        eval_comp = {
-            'nivel': 'Aceptable',
-            'descripcion': 'Comprensión aceptable. Con práctica podrás mantener esta comprensión a mayor velocidad.'
-        }
-    else:
-        eval_comp = {
-            'nivel': 'Excelente',
-            'descripcion': '¡Muy bien! Excelente nivel de comprensión. Este es el nivel que debes mantener.'
-        }
-    
-    # Mensaje motivacional
-    if v >= 700 and comprension >= 75:
-        mensaje = '¡Extraordinario! Estás dominando el método Campayo. Sigue así.'
-    elif v >= 400 and comprension >= 70:
-        mensaje = '¡Muy bien! Estás progresando excelentemente. Continúa con los ejercicios.'
-    elif v < 300 and comprension < 60:
-        mensaje = 'No te desanimes. La práctica diaria con los ejercicios te llevará al siguiente nivel.'
-    else:
-        mensaje = 'Buen trabajo. Sigue practicando los ejercicios para mejorar cada día.'
-    
-    return {
-        'velocidad': eval_v,
-        'vm': eval_vm,
-        'comprension': eval_comp,
-        'mensaje': mensaje
-    }
\ No newline at end of file
+def _respuesta_cuestionario(cuestionario):
+    """
+    Respuesta JSON con el cuerpo ya serializado del cuestionario y su ETag.
+    """
+    response = HttpResponse(cuestionario.cuerpo, content_type='application/json')
+    response['ETag'] = cuestionario.etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
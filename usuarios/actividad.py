@@ -0,0 +1,143 @@
+# usuarios/actividad.py
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Con más usuarios pendientes que esto se vuelca aunque no haya pasado el intervalo
+MAX_PENDIENTES = 1000
+
+
+class RegistroActividad:
+    """
+    Última actividad de los usuarios (Usuario.ultima_actividad) acumulada
+    en memoria del proceso y escrita en bloque. No toca last_login, que
+    firma el token de restablecer contraseña y es la fecha del último login.
+
+    Cada petición solo anota {usuario_id: momento}. Como mucho una vez por
+    intervalo (INTERVALO_ACTIVIDAD segundos en settings) se vuelcan todos
+    los pendientes con un único UPDATE, así que cada usuario se escribe a lo
+    sumo una vez por intervalo y proceso. Lo pendiente se vuelca también al
+    terminar el proceso (atexit); si el proceso muere de golpe se pierde
+    como mucho un intervalo de actividad.
+    """
+
+    def __init__(self):
+        self._pendientes = {}
+        self._lock = threading.Lock()
+        self._ultimo_volcado = time.monotonic()
+        self.registros = 0
+        self.escrituras = 0
+
+    @property
+    def intervalo(self):
+        return getattr(settings, 'INTERVALO_ACTIVIDAD', 300)
+
+    def registrar(self, usuario_id, momento=None):
+        """Anota actividad del usuario y vuelca si toca."""
+        momento = momento or timezone.now()
+        with self._lock:
+            self._pendientes[usuario_id] = momento
+            self.registros += 1
+            toca = (
+                time.monotonic() - self._ultimo_volcado >= self.intervalo
+                or len(self._pendientes) >= MAX_PENDIENTES
+            )
+        if toca:
+            self.volcar()
+
+    def volcar(self):
+        """Escribe todo lo pendiente con un solo UPDATE. Devuelve las filas enviadas."""
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+            self._ultimo_volcado = time.monotonic()
+        if not pendientes:
+            return 0
+
+        try:
+            if connection.vendor == 'postgresql':
+                self._actualizar_values(pendientes)
+            else:
+                self._actualizar_case(pendientes)
+        except Exception as e:
+            logger.error(f"ACTIVIDAD: error volcando {len(pendientes)} usuarios: {e}")
+            # Devolverlos al buffer sin pisar actividad más reciente
+            with self._lock:
+                for usuario_id, momento in pendientes.items():
+                    if self._pendientes.get(usuario_id, momento) <= momento:
+                        self._pendientes[usuario_id] = momento
+            return 0
+
+        with self._lock:
+            self.escrituras += len(pendientes)
+        return len(pendientes)
+
+    def _actualizar_values(self, pendientes):
+        """UPDATE ... FROM (VALUES ...): una sentencia para todo el bloque."""
+        with connection.cursor() as cursor:
+            cursor.execute(*sql_actualizar_values(pendientes))
+
+    def _actualizar_case(self, pendientes):
+        """Alternativa portable (SQLite): un UPDATE con CASE por usuario."""
+        from .models import Usuario
+
+        Usuario.objects.filter(pk__in=pendientes.keys()).update(ultima_actividad=Case(
+            *(
+                When(
+                    Q(pk=usuario_id) & (Q(ultima_actividad__isnull=True) | Q(ultima_actividad__lt=momento)),
+                    then=Value(momento)
+                )
+                for usuario_id, momento in pendientes.items()
+            ),
+            default=F('ultima_actividad'),
+        ))
+
+    def metricas(self):
+        """
+        {'registros', 'escrituras', 'evitadas', 'pendientes'} de este
+        proceso: evitadas son las actividades que no han costado escritura.
+        """
+        with self._lock:
+            return {
+                'registros': self.registros,
+                'escrituras': self.escrituras,
+                'evitadas': self.registros - self.escrituras - len(self._pendientes),
+                'pendientes': len(self._pendientes),
+            }
+
+
+def sql_actualizar_values(pendientes):
+    """
+    (sql, parámetros) del UPDATE ... FROM (VALUES ...) de PostgreSQL para
+    {usuario_id: momento}. Solo adelanta ultima_actividad.
+    """
+    from .models import Usuario
+
+    tabla = connection.ops.quote_name(Usuario._meta.db_table)
+    filas = ', '.join(['(%s, %s::timestamptz)'] * len(pendientes))
+    parametros = [valor for fila in pendientes.items() for valor in fila]
+    return (
+        f"UPDATE {tabla} AS u SET ultima_actividad = v.momento "
+        f"FROM (VALUES {filas}) AS v(id, momento) "
+        f"WHERE u.id = v.id AND (u.ultima_actividad IS NULL OR u.ultima_actividad < v.momento)",
+        parametros
+    )
+
+
+registro_actividad = RegistroActividad()
+atexit.register(registro_actividad.volcar)
+
+
+def registrar_actividad(usuario):
+    registro_actividad.registrar(usuario.pk)
+
+
+def metricas_actividad():
+    return registro_actividad.metricas()
@@ -1,7 +1,10 @@
 # usuarios/admin.py
 from django.contrib import admin
+from django.utils import timezone
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, ProgresoTests, EjercicioRealizado
+from .models import Usuario, ProgresoTests, EjercicioRealizado, EmailOutbox
+from .contadores import marcar_realizados, eliminar_realizados, aplicar_cambios
+from .estadisticas import invalidar_estadisticas_usuarios
 
 
 @admin.register(Usuario)
@@ -30,10 +33,11 @@ class UsuarioAdmin(UserAdmin):
             'classes': ('collapse',)
         }),
         ('Fechas Importantes', {
-            'fields': ('last_login', 'fecha_registro'),
+            'fields': ('last_login', 'ultima_actividad', 'fecha_registro'),
             'classes': ('collapse',)
         }),
     )
+    readonly_fields = ('ultima_actividad',)
     
     # Para crear usuarios
     add_fieldsets = (
@@ -48,16 +52,19 @@ class UsuarioAdmin(UserAdmin):
     
     def hacer_pro(self, request, queryset):
         queryset.update(plan='pro')
+        invalidar_estadisticas_usuarios()
         self.message_user(request, f'{queryset.count()} usuarios cambiados a Plan Pro')
     hacer_pro.short_description = "Cambiar a Plan Pro"
     
     def hacer_gratuito(self, request, queryset):
         queryset.update(plan='gratuito')
+        invalidar_estadisticas_usuarios()
         self.message_user(request, f'{queryset.count()} usuarios cambiados a Plan Gratuito')
     hacer_gratuito.short_description = "Cambiar a Plan Gratuito"
     
     def hacer_gestor(self, request, queryset):
         queryset.update(tipo_usuario='gestor')
+        invalidar_estadisticas_usuarios()
         self.message_user(request, f'{queryset.count()} usuarios cambiados a Gestor')
     hacer_gestor.short_description = "Cambiar a Gestor"
 
@@ -106,11 +113,54 @@ class EjercicioRealizadoAdmin(admin.ModelAdmin):
     actions = ['marcar_realizado', 'marcar_no_realizado']
     
     def marcar_realizado(self, request, queryset):
-        queryset.update(realizado=True)
-        self.message_user(request, f'{queryset.count()} ejercicios marcados como realizados')
+        cambiados = marcar_realizados(queryset, True)
+        self.message_user(request, f'{cambiados} ejercicios marcados como realizados')
     marcar_realizado.short_description = "Marcar como realizado"
     
     def marcar_no_realizado(self, request, queryset):
-        queryset.update(realizado=False)
-        self.message_user(request, f'{queryset.count()} ejercicios marcados como no realizados')
-    marcar_no_realizado.short_description = "Marcar como no realizado"
\ No newline at end of file
+        cambiados = marcar_realizados(queryset, False)
+        self.message_user(request, f'{cambiados} ejercicios marcados como no realizados')
+    marcar_no_realizado.short_description = "Marcar como no realizado"
+    
+    # Mantener los contadores de ProgresoCategoria al editar o borrar desde el admin
+    def save_model(self, request, obj, form, change):
+        antes = None
+        if change:
+            antes = EjercicioRealizado.objects.filter(pk=obj.pk).values_list(
+                'usuario_id', 'ejercicio_codigo', 'realizado'
+            ).first()
+        super().save_model(request, obj, form, change)
+        
+        cambios = []
+        if antes and antes[2]:
+            cambios.append((antes[0], antes[1], -1))
+        if obj.realizado:
+            cambios.append((obj.usuario_id, obj.ejercicio_codigo, 1))
+        aplicar_cambios(cambios)
+    
+    def delete_model(self, request, obj):
+        eliminar_realizados(EjercicioRealizado.objects.filter(pk=obj.pk))
+    
+    def delete_queryset(self, request, queryset):
+        eliminar_realizados(queryset)
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    """
+    Cola de emails pendientes de enviar por send_outbox.
+    """
+    list_display = ('asunto', 'estado', 'intentos', 'proximo_intento', 'fecha_creacion', 'fecha_envio')
+    list_filter = ('estado', 'fecha_creacion')
+    search_fields = ('asunto', 'destinatarios')
+    ordering = ('-fecha_creacion',)
+    readonly_fields = ('fecha_creacion', 'fecha_envio', 'intentos', 'ultimo_error')
+    
+    actions = ['reintentar']
+    
+    def reintentar(self, request, queryset):
+        actualizados = queryset.exclude(estado='enviado').update(
+            estado='pendiente', intentos=0, proximo_intento=timezone.now()
+        )
+        self.message_user(request, f'{actualizados} emails vuelven a la cola')
+    reintentar.short_description = "Reintentar envío"
@@ -9,9 +9,19 @@ class UsuariosConfig(AppConfig):
     
     def ready(self):
         """
-        Importar signals cuando la app esté lista.
+        Importar signals y registrar checks cuando la app esté lista.
         """
         try:
             import usuarios.signals
         except ImportError:
-            pass
\ No newline at end of file
+            pass
+        
+        # f_unaccent para la búsqueda de usuarios en SQLite (ver usuarios.busqueda)
+        from django.db.backends.signals import connection_created
+        from .busqueda import registrar_f_unaccent
+        connection_created.connect(registrar_f_unaccent, dispatch_uid='usuarios.f_unaccent')
+        
+        # Cada ruta con nombre debe tener su política de acceso
+        from django.core import checks
+        from .politicas import comprobar_politicas
+        checks.register(comprobar_politicas, checks.Tags.urls)
\ No newline at end of file
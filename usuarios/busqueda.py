@@ -0,0 +1,100 @@
+# usuarios/busqueda.py
+import unicodedata
+
+from django.db import connections
+from django.db.models import CharField, F, Func, Q
+
+
+# Coincidencias más recientes que se ordenan por relevancia en PostgreSQL
+MAX_CANDIDATOS_RELEVANCIA = 500
+
+
+class TextoBusqueda(Func):
+    """
+    f_unaccent(lower(nombre || ' ' || apellidos || ' ' || email)).
+
+    Es exactamente la expresión del índice GIN de trigramas creado en la
+    migración 0005_busqueda_usuarios, para que PostgreSQL pueda usarlo.
+    """
+    template = "f_unaccent(lower(%(expressions)s))"
+    arg_joiner = " || ' ' || "
+    output_field = CharField()
+
+    def __init__(self, prefijo=''):
+        super().__init__(F(f'{prefijo}nombre'), F(f'{prefijo}apellidos'), F(f'{prefijo}email'))
+
+
+def _sin_tildes(texto):
+    descompuesto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(caracter for caracter in descompuesto if not unicodedata.combining(caracter))
+
+
+def normalizar(termino):
+    """Minúsculas y sin tildes, igual que f_unaccent(lower(...)) en la base de datos."""
+    return _sin_tildes(termino.strip())
+
+
+def registrar_f_unaccent(sender, connection, **kwargs):
+    """
+    Receptor de connection_created: en SQLite define f_unaccent con la
+    misma normalización que normalizar(). El lower() de SQLite solo pasa
+    a minúsculas ASCII, así que la función también lo hace.
+    """
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'f_unaccent', 1, lambda texto: None if texto is None else _sin_tildes(texto), deterministic=True
+        )
+
+
+def _usa_indice(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def _normaliza_en_bd(queryset):
+    return connections[queryset.db].vendor in ('postgresql', 'sqlite')
+
+
+def filtrar_busqueda(queryset, termino, prefijo=''):
+    """
+    Filtra un queryset por nombre, apellidos o email que contengan el término.
+
+    En PostgreSQL y SQLite la búsqueda no distingue tildes ni mayúsculas;
+    PostgreSQL además usa el índice de trigramas, y SQLite recorre la tabla
+    con la f_unaccent de registrar_f_unaccent. En otras bases de datos se
+    mantiene el OR de icontains. `prefijo` permite buscar a través de una
+    relación, p.ej. 'usuario__' desde SolicitudCambioPlan.
+    """
+    termino = termino.strip()
+    if not termino:
+        return queryset
+    if _normaliza_en_bd(queryset):
+        return queryset.alias(
+            texto_busqueda=TextoBusqueda(prefijo)
+        ).filter(texto_busqueda__contains=normalizar(termino))
+    return queryset.filter(
+        Q(**{f'{prefijo}nombre__icontains': termino}) |
+        Q(**{f'{prefijo}apellidos__icontains': termino}) |
+        Q(**{f'{prefijo}email__icontains': termino})
+    )
+
+
+def buscar_usuarios(queryset, termino):
+    """
+    Como filtrar_busqueda, pero ordena por relevancia: en PostgreSQL por
+    similitud de trigramas con el término (word_similarity) y después por
+    fecha de registro; en el resto, solo por fecha de registro.
+
+    word_similarity se calcula fila a fila y un término corriente ('maría')
+    coincide con miles de usuarios, así que solo se puntúan los
+    MAX_CANDIDATOS_RELEVANCIA más recientes que coinciden (ver
+    benchmark_busqueda).
+    """
+    encontrados = filtrar_busqueda(queryset, termino)
+    if _usa_indice(encontrados) and termino.strip():
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        candidatos = encontrados.order_by('-fecha_registro').values('pk')[:MAX_CANDIDATOS_RELEVANCIA]
+        return queryset.filter(pk__in=candidatos).annotate(
+            relevancia=TrigramWordSimilarity(normalizar(termino), TextoBusqueda())
+        ).order_by('-relevancia', '-fecha_registro')
+    return encontrados.order_by('-fecha_registro')
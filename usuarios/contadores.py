@@ -0,0 +1,192 @@
+# usuarios/contadores.py
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+
+def claves_contador(codigos=None):
+    """
+    {codigo: (categoria_codigo, bloque)} de los ejercicios activos, solo de
+    los `codigos` indicados o de todos. Los contadores solo cuentan
+    ejercicios activos, igual que el catálogo (ver usuarios.progreso).
+
+    Se lee de la base de datos y no del catálogo del proceso, que puede
+    tardar unos segundos en ver un ejercicio recién movido o desactivado.
+    """
+    from ejercicios.models import Ejercicio
+
+    ejercicios = Ejercicio.objects.filter(activo=True)
+    if codigos is not None:
+        ejercicios = ejercicios.filter(codigo__in=codigos)
+    return {
+        codigo: (categoria_codigo, bloque)
+        for codigo, categoria_codigo, bloque in ejercicios.values_list('codigo', 'categoria__codigo', 'bloque')
+    }
+
+
+def aplicar_cambios(cambios):
+    """
+    Suma a los contadores una serie de cambios (usuario_id, ejercicio_codigo, delta).
+    Debe llamarse dentro de la misma transacción que modifica EjercicioRealizado.
+    Los códigos que no son de un ejercicio activo no cuentan.
+    """
+    cambios = list(cambios)
+    if not cambios:
+        return
+    claves = claves_contador({codigo for _, codigo, _ in cambios})
+    deltas = Counter()
+    for usuario_id, codigo, delta in cambios:
+        if codigo in claves:
+            deltas[(usuario_id,) + claves[codigo]] += delta
+    _sumar(deltas)
+
+
+def _sumar(deltas):
+    """Suma {(usuario_id, categoria_codigo, bloque): delta} a los contadores."""
+    from .models import ProgresoCategoria
+
+    for (usuario_id, categoria_codigo, bloque), delta in deltas.items():
+        if delta == 0:
+            continue
+
+        fila = ProgresoCategoria.objects.filter(
+            usuario_id=usuario_id,
+            categoria_codigo=categoria_codigo,
+            bloque=bloque
+        )
+        actualizados = fila.update(realizados=Greatest(F('realizados') + delta, 0))
+        if actualizados or delta < 0:
+            continue
+
+        # Primera vez para esta categoría y bloque
+        try:
+            with transaction.atomic():
+                ProgresoCategoria.objects.create(
+                    usuario_id=usuario_id,
+                    categoria_codigo=categoria_codigo,
+                    bloque=bloque,
+                    realizados=delta
+                )
+        except IntegrityError:
+            # Otra petición la ha creado a la vez
+            fila.update(realizados=F('realizados') + delta)
+
+
+def reubicar_ejercicio(codigo, anterior, nueva):
+    """
+    Mueve a los usuarios que han realizado `codigo` del contador `anterior`
+    al `nueva` (tuplas (categoria_codigo, bloque), o None si el ejercicio no
+    cuenta) cuando el ejercicio cambia de bloque o de categoría, se activa o
+    se desactiva, se crea o se borra.
+    """
+    from .models import EjercicioRealizado
+
+    if anterior == nueva:
+        return
+    deltas = Counter()
+    for usuario_id in EjercicioRealizado.objects.filter(
+        ejercicio_codigo=codigo, realizado=True
+    ).values_list('usuario_id', flat=True):
+        if anterior:
+            deltas[(usuario_id,) + anterior] -= 1
+        if nueva:
+            deltas[(usuario_id,) + nueva] += 1
+    _sumar(deltas)
+
+
+def registrar_realizado(usuario, ejercicio_codigo):
+    """Suma un ejercicio recién marcado como realizado."""
+    aplicar_cambios([(usuario.pk, ejercicio_codigo, 1)])
+
+
+def marcar_realizados(queryset, realizado):
+    """
+    Cambia el estado de los EjercicioRealizado del queryset y ajusta los
+    contadores en la misma transacción. Solo cuenta las filas que cambian.
+    Devuelve el número de filas modificadas.
+    """
+    from .models import EjercicioRealizado
+
+    with transaction.atomic():
+        cambiados = list(
+            queryset.exclude(realizado=realizado)
+            .select_for_update()
+            .values_list('id', 'usuario_id', 'ejercicio_codigo')
+        )
+        EjercicioRealizado.objects.filter(
+            id__in=[id_fila for id_fila, _, _ in cambiados]
+        ).update(realizado=realizado)
+
+        delta = 1 if realizado else -1
+        aplicar_cambios((usuario_id, codigo, delta) for _, usuario_id, codigo in cambiados)
+    return len(cambiados)
+
+
+def eliminar_realizados(queryset):
+    """
+    Borra los EjercicioRealizado del queryset descontando los que estaban realizados.
+    """
+    with transaction.atomic():
+        borrados = list(queryset.filter(realizado=True).values_list('usuario_id', 'ejercicio_codigo'))
+        queryset.delete()
+        aplicar_cambios((usuario_id, codigo, -1) for usuario_id, codigo in borrados)
+
+
+def resumen_usuario(usuario):
+    """
+    Lee los contadores de un usuario con una consulta:
+    {'total': n, 'por_categoria': {codigo: n}, 'por_bloque': {bloque: n}}
+    """
+    from .models import ProgresoCategoria
+
+    por_categoria = Counter()
+    por_bloque = Counter()
+    for categoria_codigo, bloque, realizados in ProgresoCategoria.objects.filter(
+        usuario=usuario
+    ).values_list('categoria_codigo', 'bloque', 'realizados'):
+        por_categoria[categoria_codigo] += realizados
+        por_bloque[bloque] += realizados
+
+    return {
+        'total': sum(por_categoria.values()),
+        'por_categoria': dict(por_categoria),
+        'por_bloque': dict(por_bloque),
+    }
+
+
+def reconstruir_contadores(usuarios=None, batch_size=1000):
+    """
+    Regenera los contadores desde EjercicioRealizado, para todos los usuarios
+    o solo para los indicados. Devuelve el número de filas creadas.
+    """
+    from .models import EjercicioRealizado, ProgresoCategoria
+
+    realizados = EjercicioRealizado.objects.filter(realizado=True)
+    existentes = ProgresoCategoria.objects.all()
+    if usuarios is not None:
+        realizados = realizados.filter(usuario__in=usuarios)
+        existentes = existentes.filter(usuario__in=usuarios)
+
+    totales = Counter()
+    with transaction.atomic():
+        claves = claves_contador()
+        for usuario_id, codigo in realizados.values_list('usuario_id', 'ejercicio_codigo').iterator():
+            if codigo in claves:
+                totales[(usuario_id,) + claves[codigo]] += 1
+
+        existentes.delete()
+        ProgresoCategoria.objects.bulk_create(
+            [
+                ProgresoCategoria(
+                    usuario_id=usuario_id,
+                    categoria_codigo=categoria_codigo,
+                    bloque=bloque,
+                    realizados=total
+                )
+                for (usuario_id, categoria_codigo, bloque), total in totales.items()
+            ],
+            batch_size=batch_size
+        )
+    return len(totales)
@@ -0,0 +1,168 @@
+# usuarios/estadisticas.py
+"""
+Estadísticas agregadas de los paneles del gestor, guardadas en la caché.
+
+Invalidar solo borra la entrada de la caché configurada. En producción es
+LocMemCache, una por proceso: el borrado llega únicamente al worker que hizo
+el cambio. Los demás siguen sirviendo su copia hasta que caduca y se
+recalcula, es decir, como mucho TTL_ESTADISTICAS + MARGEN_OBSOLETAS
+segundos (30 + 300). Son contadores orientativos y ese retraso se acepta;
+si hiciera falta verlos al momento en todos los workers habría que usar una
+caché compartida (Redis) o versionarlos en la base de datos como
+ejercicios.versionado.RegistroVersionado.
+"""
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+# Segundos durante los que se sirven las estadísticas sin recalcular
+TTL_ESTADISTICAS = 30
+
+# Tras caducar, las estadísticas se siguen sirviendo este tiempo a las
+# demás peticiones mientras una sola las recalcula
+MARGEN_OBSOLETAS = 300
+
+# Máximo que puede durar un recálculo antes de que otra petición lo reintente
+TIMEOUT_RECALCULO = 10
+
+# Espera de una petición sin datos mientras otra los calcula
+ESPERA_RECALCULO = 1.0
+INTERVALO_ESPERA = 0.05
+
+
+class Estadistica:
+    """
+    Estadísticas calculadas con una consulta y guardadas en la caché.
+
+    Se guardan junto con su hora de caducidad lógica y con un timeout físico
+    mayor: cuando caducan, la primera petición que consigue el cerrojo
+    (cache.add) las recalcula y el resto sigue recibiendo las anteriores,
+    así que no se lanzan varias consultas iguales a la vez.
+    """
+
+    def __init__(self, clave, calcular):
+        self.clave = clave
+        self.calcular = calcular
+        self.clave_cerrojo = f'{clave}:recalculando'
+
+    def obtener(self, refrescar=False):
+        """Devuelve las estadísticas vigentes. Con refrescar=True las recalcula siempre."""
+        if refrescar:
+            return self._recalcular()
+
+        entrada = cache.get(self.clave)
+        if entrada is not None:
+            datos, caduca = entrada
+            if caduca > time.time() or not self._bloquear():
+                return datos
+            return self._recalcular(bloqueado=True)
+
+        if self._bloquear():
+            return self._recalcular(bloqueado=True)
+
+        # Otra petición las está calculando: esperar un poco a su resultado
+        limite = time.monotonic() + ESPERA_RECALCULO
+        while time.monotonic() < limite:
+            time.sleep(INTERVALO_ESPERA)
+            entrada = cache.get(self.clave)
+            if entrada is not None:
+                return entrada[0]
+        return self._recalcular()
+
+    def invalidar(self):
+        """
+        Descarta las estadísticas al confirmar la transacción en curso. Con
+        una caché por proceso solo las descarta en este (ver arriba).
+        """
+        transaction.on_commit(lambda: cache.delete(self.clave))
+
+    def _bloquear(self):
+        return cache.add(self.clave_cerrojo, 1, TIMEOUT_RECALCULO)
+
+    def _recalcular(self, bloqueado=False):
+        try:
+            datos = self.calcular()
+            cache.set(self.clave, (datos, time.time() + TTL_ESTADISTICAS), TTL_ESTADISTICAS + MARGEN_OBSOLETAS)
+        finally:
+            if bloqueado:
+                cache.delete(self.clave_cerrojo)
+        return datos
+
+
+def _calcular_usuarios():
+    from .models import Usuario
+
+    hace_una_semana = timezone.now() - timedelta(days=7)
+    regulares = Q(tipo_usuario='usuario')
+    return Usuario.objects.aggregate(
+        total_usuarios=Count('id', filter=regulares),
+        usuarios_pro=Count('id', filter=regulares & Q(plan='pro')),
+        usuarios_gratuitos=Count('id', filter=regulares & Q(plan='gratuito')),
+        usuarios_esta_semana=Count('id', filter=regulares & Q(fecha_registro__gte=hace_una_semana)),
+        gestores=Count('id', filter=Q(tipo_usuario='gestor')),
+    )
+
+
+def _calcular_solicitudes():
+    from .models import SolicitudCambioPlan
+
+    inicio_hoy = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return SolicitudCambioPlan.objects.aggregate(
+        total=Count('id'),
+        pendientes=Count('id', filter=Q(estado='pendiente')),
+        procesadas=Count('id', filter=Q(estado='procesada')),
+        canceladas=Count('id', filter=Q(estado='cancelada')),
+        procesadas_hoy=Count('id', filter=Q(estado='procesada', fecha_procesada__gte=inicio_hoy)),
+    )
+
+
+def _calcular_actividad():
+    from .models import ProgresoTests, EjercicioRealizado
+
+    hace_una_semana = timezone.now() - timedelta(days=7)
+    actividad = ProgresoTests.objects.aggregate(
+        total_tests_completados=Count('id', filter=Q(completado=True)),
+        tests_esta_semana=Count('id', filter=Q(completado=True, fecha_realizacion__gte=hace_una_semana)),
+    )
+    actividad['total_ejercicios_realizados'] = EjercicioRealizado.objects.count()
+    return actividad
+
+
+_usuarios = Estadistica('estadisticas:usuarios', _calcular_usuarios)
+_solicitudes = Estadistica('estadisticas:solicitudes', _calcular_solicitudes)
+_actividad = Estadistica('estadisticas:actividad', _calcular_actividad)
+
+
+def estadisticas_usuarios(refrescar=False):
+    """
+    {'total_usuarios', 'usuarios_pro', 'usuarios_gratuitos',
+     'usuarios_esta_semana', 'gestores'}
+    """
+    return _usuarios.obtener(refrescar)
+
+
+def estadisticas_solicitudes(refrescar=False):
+    """{'total', 'pendientes', 'procesadas', 'canceladas', 'procesadas_hoy'}"""
+    return _solicitudes.obtener(refrescar)
+
+
+def estadisticas_actividad(refrescar=False):
+    """
+    {'total_tests_completados', 'tests_esta_semana', 'total_ejercicios_realizados'}.
+    No se invalida: solo caduca por tiempo.
+    """
+    return _actividad.obtener(refrescar)
+
+
+def invalidar_estadisticas_usuarios():
+    """Llamar cuando se crea o borra un usuario o cambia su plan o tipo."""
+    _usuarios.invalidar()
+
+
+def invalidar_estadisticas_solicitudes():
+    """Llamar cuando se crea, procesa o borra una solicitud de cambio de plan."""
+    _solicitudes.invalidar()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Mide la latencia de la búsqueda de usuarios con muchos usuarios.
+Ejecutar con: python manage.py benchmark_busqueda [--usuarios 100000] [--consultas 50]
+
+Crea los usuarios de prueba dentro de una transacción que se deshace al
+terminar, así que la base de datos queda como estaba.
+"""
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+NOMBRES = ['José', 'María', 'Ángel', 'Lucía', 'Iñigo', 'Begoña', 'Raúl', 'Inés', 'Martín', 'Sofía',
+           'Álvaro', 'Nuria', 'Jesús', 'Pilar', 'Andrés', 'Elena', 'Rubén', 'Marta', 'Óscar', 'Irene']
+APELLIDOS = ['García', 'Fernández', 'González', 'Rodríguez', 'López', 'Martínez', 'Sánchez', 'Pérez',
+             'Gómez', 'Núñez', 'Jiménez', 'Ruiz', 'Hernández', 'Díaz', 'Muñoz', 'Álvarez', 'Romero',
+             'Alonso', 'Gutiérrez', 'Navarro', 'Torres', 'Domínguez', 'Vázquez', 'Ramos', 'Ibáñez']
+
+
+class _Deshacer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compara la búsqueda de usuarios con icontains y con el índice de trigramas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=100000, help='Usuarios de prueba a crear')
+        parser.add_argument('--consultas', type=int, default=50, help='Búsquedas a medir por método')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._medir(options['usuarios'], options['consultas'])
+                raise _Deshacer()
+        except _Deshacer:
+            self.stdout.write("Usuarios de prueba eliminados")
+
+    def _medir(self, total, consultas):
+        from usuarios.models import Usuario
+        from usuarios.busqueda import buscar_usuarios
+
+        rng = random.Random(42)
+        self.stdout.write(f"Creando {total} usuarios de prueba...")
+        lote = []
+        for i in range(total):
+            nombre = rng.choice(NOMBRES)
+            apellidos = f"{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+            lote.append(Usuario(
+                email=f"bench{i}@ejemplo{i % 97}.com",
+                username=f"bench{i}",
+                nombre=nombre,
+                apellidos=apellidos,
+                password='!',
+            ))
+            if len(lote) == 5000:
+                Usuario.objects.bulk_create(lote)
+                lote = []
+        Usuario.objects.bulk_create(lote)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE usuarios_usuario")
+
+        # Términos como los que escribe un gestor: nombres, apellidos sin
+        # tilde, fragmentos de email
+        terminos = [
+            rng.choice([
+                rng.choice(NOMBRES).lower(),
+                rng.choice(APELLIDOS).replace('á', 'a').replace('í', 'i').replace('é', 'e'),
+                f"bench{rng.randrange(total)}",
+                rng.choice(APELLIDOS)[:4],
+            ])
+            for _ in range(consultas)
+        ]
+
+        base = Usuario.objects.filter(tipo_usuario='usuario')
+        metodos = {
+            'icontains': lambda termino: base.filter(
+                Q(nombre__icontains=termino) |
+                Q(apellidos__icontains=termino) |
+                Q(email__icontains=termino)
+            ).order_by('-fecha_registro'),
+            'busqueda': lambda termino: buscar_usuarios(base, termino),
+        }
+
+        self.stdout.write(f"Base de datos: {connection.vendor}, {consultas} búsquedas por método (20 resultados)")
+        for nombre, metodo in metodos.items():
+            tiempos = []
+            for termino in terminos:
+                inicio = time.perf_counter()
+                list(metodo(termino)[:20])
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            tiempos.sort()
+            p95 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))]
+            self.stdout.write(
+                f"  {nombre:<10} media {statistics.mean(tiempos):7.2f} ms   "
+                f"p50 {statistics.median(tiempos):7.2f} ms   p95 {p95:7.2f} ms"
+            )
+
+        if connection.vendor == 'postgresql':
+            consulta = buscar_usuarios(base, terminos[0])[:20]
+            self.stdout.write("\nPlan de la búsqueda indexada:")
+            self.stdout.write(consulta.explain(analyze=True))
+        else:
+            self.stdout.write("\nSin PostgreSQL no hay índice de trigramas: ambos métodos recorren la tabla")
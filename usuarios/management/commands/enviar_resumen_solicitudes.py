@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Envía a cada gestor un resumen de las solicitudes de cambio de plan pendientes.
+Ejecutar con: python manage.py enviar_resumen_solicitudes [--una-vez] [--minutos 60]
+
+Solo tiene sentido con NOTIFICACION_SOLICITUDES = 'resumen' en settings; en
+ese modo las solicitudes nuevas no avisan a los gestores al crearse.
+
+Sin --una-vez se queda en marcha y cada --minutos envía un resumen a cada
+gestor que tenga solicitudes posteriores a su último resumen (se guarda en
+ResumenSolicitudesGestor, así que sirve igual desde cron con --una-vez y
+no se repiten resúmenes entre ejecuciones). A un gestor que nunca ha
+recibido resumen se le incluyen las de los últimos --minutos. Los emails
+se encolan en EmailOutbox y los envía send_outbox.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Envía a los gestores el resumen periódico de solicitudes de cambio de plan"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help='Enviar un resumen y terminar')
+        parser.add_argument(
+            '--minutos',
+            type=int,
+            default=getattr(settings, 'RESUMEN_SOLICITUDES_MINUTOS', 60),
+            help='Intervalo entre resúmenes'
+        )
+
+    def handle(self, *args, **options):
+        from usuarios.notificaciones import modo_resumen_solicitudes
+
+        if not modo_resumen_solicitudes():
+            raise CommandError(
+                "NOTIFICACION_SOLICITUDES no es 'resumen': los gestores ya reciben un email por solicitud"
+            )
+        if options['minutos'] < 1:
+            raise CommandError("--minutos debe ser mayor que 0")
+
+        intervalo = timedelta(minutes=options['minutos'])
+        desde = timezone.now() - intervalo
+        try:
+            while True:
+                ahora = timezone.now()
+                self._enviar(desde)
+                if options['una_vez']:
+                    break
+                desde = ahora
+                time.sleep(intervalo.total_seconds())
+        except KeyboardInterrupt:
+            self.stdout.write("Interrumpido")
+
+    def _enviar(self, desde):
+        from usuarios.notificaciones import notificar_resumen_solicitudes
+
+        enviados = notificar_resumen_solicitudes(desde)
+        if enviados:
+            self.stdout.write(self.style.SUCCESS(f"✓ Resumen encolado para {enviados} gestor(es)"))
+        else:
+            self.stdout.write("Ningún gestor tiene solicitudes nuevas desde su último resumen")
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""
+Genera los textos de los tests de lectura como archivos estáticos con hash.
+Ejecutar después de collectstatic: python manage.py generar_textos
+
+Tiene que correr en el build (ver build.sh) y no con el servidor en marcha:
+WhiteNoise solo indexa los archivos presentes en STATIC_ROOT al arrancar y
+los generados después darían 404.
+"""
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Escribe el texto de cada test de lectura en STATIC_ROOT/textos con hash y comprimido"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sin-comprimir',
+            action='store_true',
+            help='No generar las versiones .gz y .br'
+        )
+
+    def handle(self, *args, **options):
+        from test_lectura.models import TestLectura
+        from test_lectura.textos_estaticos import generar_textos
+
+        tests = TestLectura.objects.filter(activo=True).only('id', 'texto_contenido').order_by('id')
+        manifiesto = generar_textos(tests, comprimir=not options['sin_comprimir'])
+        for test_id, entrada in manifiesto['textos'].items():
+            self.stdout.write(f"  {entrada['archivo']}")
+        self.stdout.write(self.style.SUCCESS(f"✓ {len(manifiesto['textos'])} textos generados"))
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+"""
+Da de alta en bloque los usuarios de un CSV (p.ej. una clase entera).
+Ejecutar con: python manage.py importar_usuarios alumnos.csv [--lote 500] [--procesos 4] [--dry-run]
+
+Columnas: email, nombre, apellidos y, opcionales, password y plan. Sin
+password el usuario entra con "recuperar contraseña".
+
+Cada lote se guarda en su propia transacción y los emails que ya existen
+se saltan, así que si se interrumpe basta con volver a lanzarlo (o con
+--desde N para no releer las N primeras filas). Los emails de bienvenida
+se encolan en EmailOutbox con cada lote y los envía send_outbox.
+"""
+
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+COLUMNAS_OBLIGATORIAS = ('email', 'nombre', 'apellidos')
+
+
+def _inicializar_proceso():
+    """Con el arranque 'spawn' los procesos hijos no heredan Django configurado."""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _hashear(password):
+    from django.contrib.auth.hashers import make_password
+
+    return make_password(password)
+
+
+class Command(BaseCommand):
+    help = "Importa usuarios desde un CSV hasheando las contraseñas en paralelo"
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='CSV con cabecera: email,nombre,apellidos[,password][,plan]')
+        parser.add_argument('--lote', type=int, default=500, help='Usuarios por bulk_create')
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Procesos para hashear contraseñas (1 = sin pool)'
+        )
+        parser.add_argument('--desde', type=int, default=0, help='Saltar las N primeras filas de datos')
+        parser.add_argument('--dry-run', action='store_true', help='Validar sin guardar nada')
+        parser.add_argument('--sin-emails', action='store_true', help='No encolar el email de bienvenida')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or options['procesos'] < 1:
+            raise CommandError("--lote y --procesos deben ser mayores que 0")
+
+        try:
+            archivo = open(options['archivo'], newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f"No se puede abrir {options['archivo']}: {e}")
+
+        pool = None
+        if options['procesos'] > 1 and not options['dry_run']:
+            pool = ProcessPoolExecutor(max_workers=options['procesos'], initializer=_inicializar_proceso)
+
+        try:
+            with archivo:
+                lector = csv.DictReader(archivo)
+                faltan = [columna for columna in COLUMNAS_OBLIGATORIAS if columna not in (lector.fieldnames or [])]
+                if faltan:
+                    raise CommandError(f"Faltan columnas en el CSV: {', '.join(faltan)}")
+                self._importar(lector, pool, options)
+        finally:
+            if pool:
+                pool.shutdown()
+
+    def _importar(self, lector, pool, options):
+        from usuarios.models import Usuario
+
+        lote = options['lote']
+        fila = options['desde']
+        filas = islice(lector, options['desde'], None)
+        planes = {valor for valor, _ in Usuario.PLAN}
+        vistos = set()
+        totales = {'creados': 0, 'existentes': 0, 'errores': 0}
+        inicio = time.perf_counter()
+        tiempo_hash = 0.0
+
+        while True:
+            bloque = list(islice(filas, lote))
+            if not bloque:
+                break
+
+            # Validar y quitar duplicados dentro del propio archivo
+            validos = []
+            for datos in bloque:
+                fila += 1
+                error = self._validar(datos, planes)
+                if error:
+                    totales['errores'] += 1
+                    self.stderr.write(f"  Fila {fila}: {error}")
+                    continue
+                email = Usuario.objects.normalize_email(datos['email'].strip())
+                if email in vistos:
+                    totales['errores'] += 1
+                    self.stderr.write(f"  Fila {fila}: {email} repetido en el archivo")
+                    continue
+                vistos.add(email)
+                validos.append((email, datos))
+
+            existentes = set(Usuario.objects.filter(
+                email__in=[email for email, _ in validos]
+            ).values_list('email', flat=True))
+            nuevos = [(email, datos) for email, datos in validos if email not in existentes]
+            totales['existentes'] += len(validos) - len(nuevos)
+
+            if options['dry_run']:
+                totales['creados'] += len(nuevos)
+            elif nuevos:
+                inicio_hash = time.perf_counter()
+                passwords = [(datos.get('password') or '').strip() or None for _, datos in nuevos]
+                if pool:
+                    hashes = list(pool.map(_hashear, passwords, chunksize=max(1, len(passwords) // (options['procesos'] * 4))))
+                else:
+                    hashes = [_hashear(password) for password in passwords]
+                tiempo_hash += time.perf_counter() - inicio_hash
+
+                usuarios = [
+                    Usuario(
+                        email=email,
+                        nombre=datos['nombre'].strip(),
+                        apellidos=datos['apellidos'].strip(),
+                        plan=(datos.get('plan') or '').strip() or 'gratuito',
+                        password=password_hash,
+                    )
+                    for (email, datos), password_hash in zip(nuevos, hashes)
+                ]
+                guardados = self._guardar(usuarios, emails=not options['sin_emails'])
+                totales['creados'] += len(guardados)
+                totales['existentes'] += len(usuarios) - len(guardados)
+
+            transcurrido = time.perf_counter() - inicio
+            self.stdout.write(
+                f"Fila {fila}: {totales['creados']} creados, {totales['existentes']} ya existían, "
+                f"{totales['errores']} con errores ({totales['creados'] / transcurrido:.0f} usuarios/s)"
+            )
+
+        transcurrido = time.perf_counter() - inicio
+        prefijo = "[dry-run] Se crearían" if options['dry_run'] else "✓ Creados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo} {totales['creados']} usuarios en {transcurrido:.1f} s "
+            f"({totales['creados'] / transcurrido:.0f} usuarios/s)"
+        ))
+        if tiempo_hash:
+            self.stdout.write(f"  Hash de contraseñas: {tiempo_hash:.1f} s con {options['procesos']} proceso(s)")
+        self.stdout.write(f"  Ya existían: {totales['existentes']}   Con errores: {totales['errores']}")
+
+    def _validar(self, datos, planes):
+        from django.core.exceptions import ValidationError
+        from django.core.validators import validate_email
+
+        for columna in COLUMNAS_OBLIGATORIAS:
+            if not (datos.get(columna) or '').strip():
+                return f"falta {columna}"
+        try:
+            validate_email(datos['email'].strip())
+        except ValidationError:
+            return f"email no válido: {datos['email']}"
+        plan = (datos.get('plan') or '').strip()
+        if plan and plan not in planes:
+            return f"plan no válido: {plan}"
+        return None
+
+    def _guardar(self, usuarios, emails=True):
+        """
+        Inserta el lote con usernames libres y devuelve los usuarios
+        guardados. Si otra alta simultánea se queda con un username o un
+        email entre la asignación y el insert, se quitan los emails que ya
+        existen, se vuelven a asignar los usernames y se reintenta. Los
+        emails de bienvenida se encolan en la misma transacción.
+        """
+        from django.db import IntegrityError, transaction
+        from usuarios.estadisticas import invalidar_estadisticas_usuarios
+        from usuarios.managers import REINTENTOS_USERNAME, DISPERSION_REINTENTO
+        from usuarios.models import Usuario
+        from usuarios.notificaciones import notificar_bienvenidas
+
+        for intento in range(REINTENTOS_USERNAME):
+            usernames = Usuario.objects.usernames_para_emails(
+                [usuario.email for usuario in usuarios], dispersion=intento * DISPERSION_REINTENTO
+            )
+            for usuario, username in zip(usuarios, usernames):
+                usuario.username = username
+            try:
+                with transaction.atomic():
+                    Usuario.objects.bulk_create(usuarios)
+                    # bulk_create no emite post_save
+                    invalidar_estadisticas_usuarios()
+                    if emails:
+                        notificar_bienvenidas(usuarios)
+                return usuarios
+            except IntegrityError:
+                if intento == REINTENTOS_USERNAME - 1:
+                    raise
+                existentes = set(Usuario.objects.filter(
+                    email__in=[usuario.email for usuario in usuarios]
+                ).values_list('email', flat=True))
+                usuarios = [usuario for usuario in usuarios if usuario.email not in existentes]
+                if not usuarios:
+                    return usuarios
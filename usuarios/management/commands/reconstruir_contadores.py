@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+"""
+Regenera los contadores de ProgresoCategoria a partir de EjercicioRealizado.
+Ejecutar con: python manage.py reconstruir_contadores [--email usuario@ejemplo.com]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Regenera los contadores de ejercicios realizados por categoría y bloque"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            action='append',
+            dest='emails',
+            help='Reconstruir solo los contadores de este usuario (se puede repetir)'
+        )
+
+    def handle(self, *args, **options):
+        from usuarios.models import Usuario
+        from usuarios.contadores import reconstruir_contadores
+
+        usuarios = None
+        if options['emails']:
+            usuarios = list(Usuario.objects.filter(email__in=options['emails']))
+            encontrados = {usuario.email for usuario in usuarios}
+            faltan = [email for email in options['emails'] if email not in encontrados]
+            if faltan:
+                raise CommandError(f"Usuarios no encontrados: {', '.join(faltan)}")
+
+        filas = reconstruir_contadores(usuarios)
+        alcance = 'todos los usuarios' if usuarios is None else f'{len(usuarios)} usuario(s)'
+        self.stdout.write(self.style.SUCCESS(f"✓ {filas} contadores regenerados para {alcance}"))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Envía los emails encolados en EmailOutbox.
+Ejecutar con: python manage.py send_outbox [--una-vez] [--lote 50] [--intervalo 5] [--metricas]
+
+Sin --una-vez se queda en marcha como worker: envía lotes mientras haya
+pendientes y, si no, espera --intervalo segundos. Se pueden lanzar varios
+a la vez (en PostgreSQL cada uno reclama filas distintas). En producción
+corre como worker de Render (ver render.yaml); con --una-vez sirve desde cron.
+
+Entrega "al menos una vez": si el worker se corta a mitad de lote, los
+emails de ese lote ya enviados se reenvían cuando caduca su reserva.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Envía por lotes los emails pendientes de la cola EmailOutbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help='Vaciar la cola y terminar')
+        parser.add_argument('--lote', type=int, default=50, help='Emails por lote y conexión')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos de espera con la cola vacía')
+        parser.add_argument('--metricas', action='store_true', help='Mostrar el estado de la cola y terminar')
+
+    def handle(self, *args, **options):
+        from usuarios.outbox import enviar_lote
+
+        if options['metricas']:
+            self._mostrar_metricas()
+            return
+        if options['lote'] < 1:
+            raise CommandError("--lote debe ser mayor que 0")
+
+        totales = {'enviados': 0, 'reintentos': 0, 'fallidos': 0, 'liberados': 0, 'segundos': 0.0}
+        try:
+            while True:
+                resultado = enviar_lote(options['lote'])
+                for clave in totales:
+                    totales[clave] += resultado[clave]
+
+                procesados = resultado['enviados'] + resultado['reintentos'] + resultado['fallidos']
+                if procesados:
+                    self.stdout.write(
+                        f"Lote: {resultado['enviados']} enviados, {resultado['reintentos']} a reintentar, "
+                        f"{resultado['fallidos']} fallidos en {resultado['segundos']:.2f} s"
+                    )
+                    continue
+                if resultado['liberados']:
+                    self.stdout.write(self.style.WARNING(
+                        f"Sin conexión con el servidor de correo: {resultado['liberados']} emails vuelven a la cola"
+                    ))
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write("Interrumpido")
+
+        ritmo = totales['enviados'] / totales['segundos'] if totales['segundos'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {totales['enviados']} enviados ({ritmo:.1f} emails/s), "
+            f"{totales['reintentos']} a reintentar, {totales['fallidos']} fallidos"
+        ))
+
+    def _mostrar_metricas(self):
+        from usuarios.notificaciones import metricas_notificaciones
+        from usuarios.outbox import metricas
+
+        datos = metricas()
+        notificaciones = metricas_notificaciones()
+        self.stdout.write(f"Pendientes:   {datos['pendientes']} ({datos['reintentando']} reintentando)")
+        self.stdout.write(f"Enviados:     {datos['enviados']}")
+        self.stdout.write(f"Fallidos:     {datos['fallidos']}")
+        self.stdout.write(f"Más antiguo:  {datos['antiguedad_pendientes']:.0f} s en cola")
+        # Contadores de NotificacionEnviada, comunes a todos los procesos
+        self.stdout.write(
+            f"Notificaciones: {notificaciones['encoladas']} encoladas, "
+            f"{notificaciones['suprimidas']} suprimidas por duplicadas"
+        )
@@ -22,6 +22,7 @@ class Command(BaseCommand):
         # Importar modelos
         try:
             from usuarios.models import Usuario, SolicitudCambioPlan
+            from usuarios.estadisticas import estadisticas_usuarios, estadisticas_solicitudes
             self.stdout.write(self.style.SUCCESS("✓ Modelos importados correctamente"))
         except ImportError as e:
             self.stdout.write(self.style.ERROR(f"✗ Error importando modelos: {e}"))
@@ -58,9 +59,13 @@ class Command(BaseCommand):
         self.stdout.write("VERIFICACIÓN DE USUARIOS GESTORES")
         self.stdout.write("=" * 80)
 
+        # Siempre recalculadas: el comando tiene que ver el estado real
+        stats_usuarios = estadisticas_usuarios(refrescar=True)
+        stats_solicitudes = estadisticas_solicitudes(refrescar=True)
+
         gestores = Usuario.objects.filter(tipo_usuario='gestor')
-        if gestores.exists():
-            self.stdout.write(self.style.SUCCESS(f"✓ Encontrados {gestores.count()} usuarios gestores:"))
+        if stats_usuarios['gestores']:
+            self.stdout.write(self.style.SUCCESS(f"✓ Encontrados {stats_usuarios['gestores']} usuarios gestores:"))
             for gestor in gestores:
                 self.stdout.write(f"  - {gestor.email} ({gestor.nombre_completo})")
         else:
@@ -75,9 +80,9 @@ class Command(BaseCommand):
         self.stdout.write("VERIFICACIÓN DE USUARIOS REGULARES")
         self.stdout.write("=" * 80)
 
-        usuarios_total = Usuario.objects.filter(tipo_usuario='usuario').count()
-        usuarios_pro = Usuario.objects.filter(tipo_usuario='usuario', plan='pro').count()
-        usuarios_gratuitos = Usuario.objects.filter(tipo_usuario='usuario', plan='gratuito').count()
+        usuarios_total = stats_usuarios['total_usuarios']
+        usuarios_pro = stats_usuarios['usuarios_pro']
+        usuarios_gratuitos = stats_usuarios['usuarios_gratuitos']
 
         self.stdout.write(f"Total de usuarios: {usuarios_total}")
         self.stdout.write(f"  - Plan Pro: {usuarios_pro}")
@@ -94,9 +99,9 @@ class Command(BaseCommand):
         self.stdout.write("VERIFICACIÓN DE SOLICITUDES DE CAMBIO DE PLAN")
         self.stdout.write("=" * 80)
 
-        solicitudes_pendientes = SolicitudCambioPlan.objects.filter(estado='pendiente').count()
-        solicitudes_procesadas = SolicitudCambioPlan.objects.filter(estado='procesada').count()
-        solicitudes_canceladas = SolicitudCambioPlan.objects.filter(estado='cancelada').count()
+        solicitudes_pendientes = stats_solicitudes['pendientes']
+        solicitudes_procesadas = stats_solicitudes['procesadas']
+        solicitudes_canceladas = stats_solicitudes['canceladas']
 
         self.stdout.write(f"Solicitudes pendientes: {solicitudes_pendientes}")
         self.stdout.write(f"Solicitudes procesadas: {solicitudes_procesadas}")
@@ -161,7 +166,7 @@ class Command(BaseCommand):
 
         problemas = []
 
-        if gestores.count() == 0:
+        if stats_usuarios['gestores'] == 0:
             problemas.append("No hay usuarios gestores configurados")
 
         if usuarios_total == 0:
@@ -1,6 +1,14 @@
 # usuarios/managers.py
 from django.contrib.auth.models import BaseUserManager
-from django.db import models
+from django.db import IntegrityError, models, transaction
+
+from .nombres_usuario import asignar_usernames, base_username
+
+# Veces que se vuelve a pedir un username si otra alta simultánea se queda con él
+REINTENTOS_USERNAME = 5
+
+# Sufijos entre los que se elige al azar en cada reintento (ver asignar_usernames)
+DISPERSION_REINTENTO = 10
 
 
 class UsuarioManager(BaseUserManager):
@@ -21,26 +29,36 @@ class UsuarioManager(BaseUserManager):
         
         email = self.normalize_email(email)
         
-        # Generar username único basado en el email
-        base_username = email.split('@')[0]
-        username = base_username
-        counter = 1
-        
-        while self.model.objects.filter(username=username).exists():
-            username = f"{base_username}{counter}"
-            counter += 1
-        
         user = self.model(
             email=email,
-            username=username,
             nombre=nombre,
             apellidos=apellidos,
             **extra_fields
         )
-        
         user.set_password(password)
-        user.save(using=self._db)
-        return user
+        
+        # Username único basado en el email (ver usuarios.nombres_usuario)
+        for intento in range(REINTENTOS_USERNAME):
+            user.username = self.usernames_para_emails([email], dispersion=intento * DISPERSION_REINTENTO)[0]
+            try:
+                with transaction.atomic(using=self._db):
+                    user.save(using=self._db)
+                return user
+            except IntegrityError:
+                # Reintentar solo si el conflicto es el username (no el email)
+                ocupado = self.filter(username=user.username).exists()
+                if not ocupado or intento == REINTENTOS_USERNAME - 1:
+                    raise
+    
+    def usernames_para_emails(self, emails, dispersion=0):
+        """
+        Usernames libres para una lista de emails, en el mismo orden.
+        Una consulta por cada BASES_POR_CONSULTA partes locales distintas, así que sirve
+        para preparar altas en bloque con bulk_create.
+        """
+        return asignar_usernames(
+            self.model, [base_username(email) for email in emails], using=self._db, dispersion=dispersion
+        )
     
     def create_superuser(self, email, nombre, apellidos, password=None, **extra_fields):
         """
@@ -95,15 +113,12 @@ class UsuarioManager(BaseUserManager):
     
     def buscar(self, termino):
         """
-        Busca usuarios por nombre, apellidos o email.
+        Busca usuarios por nombre, apellidos o email, de más a menos
+        relevante (ver usuarios.busqueda).
         """
-        from django.db.models import Q
+        from .busqueda import buscar_usuarios
         
-        return self.filter(
-            Q(nombre__icontains=termino) |
-            Q(apellidos__icontains=termino) |
-            Q(email__icontains=termino)
-        )
+        return buscar_usuarios(self.all(), termino)
     
     def registrados_en_periodo(self, fecha_inicio, fecha_fin):
         """
@@ -199,19 +214,18 @@ class EjercicioRealizadoManager(models.Manager):
     def estadisticas_usuario(self, usuario):
         """
         Retorna estadísticas de ejercicios de un usuario.
+        Los recuentos salen de los contadores de ProgresoCategoria.
         """
-        ejercicios = self.por_usuario(usuario)
+        from .contadores import resumen_usuario
+        resumen = resumen_usuario(usuario)
         
         return {
-            'total_ejercicios': ejercicios.count(),
+            'total_ejercicios': resumen['total'],
             'ejercicios_por_categoria': {
-                'EL': ejercicios.filter(ejercicio_codigo__startswith='EL').count(),
-                'EO': ejercicios.filter(ejercicio_codigo__startswith='EO').count(),
-                'EPM': ejercicios.filter(ejercicio_codigo__startswith='EPM').count(),
-                'EVM': ejercicios.filter(ejercicio_codigo__startswith='EVM').count(),
-                'EMD': ejercicios.filter(ejercicio_codigo__startswith='EMD').count(),
+                codigo: resumen['por_categoria'].get(codigo, 0)
+                for codigo in ('EL', 'EO', 'EPM', 'EVM', 'EMD')
             },
-            'ultimo_ejercicio': ejercicios.order_by('-fecha_realizacion').first()
+            'ultimo_ejercicio': self.por_usuario(usuario).order_by('-fecha_realizacion').first()
         }
     
     def usuarios_mas_activos(self, limite=10):
@@ -1,6 +1,7 @@
 # usuarios/middleware.py
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.http import JsonResponse
 from django.urls import reverse
 from django.utils.deprecation import MiddlewareMixin
 import logging
@@ -11,64 +12,61 @@ logger = logging.getLogger(__name__)
 class PlanAccessMiddleware:
     """
     Middleware que verifica el acceso basado en planes de usuario.
+    Las reglas de cada ruta están en usuarios.politicas, por nombre de URL;
+    se compilan una vez al arrancar y cada petición las busca por
+    request.resolver_match.view_name.
     """
     
     def __init__(self, get_response):
-        self.get_response = get_response
+        from .politicas import compilar_politicas
         
-        # URLs que requieren plan Pro
-        self.pro_required_urls = [
-            '/ejercicios/nivel/4/',
-            '/ejercicios/nivel/5/',
-            '/ejercicios/nivel/6/',
-            '/ejercicios/nivel/7/',
-            '/ejercicios/nivel/8/',
-            '/ejercicios/nivel/9/',
-        ]
-        
-        # URLs que solo pueden acceder gestores
-        self.gestor_only_urls = [
-            '/usuarios/gestionar/',
-            '/usuarios/buscar/',
-            '/usuarios/cambiar-plan/',
-        ]
+        self.get_response = get_response
+        self.politicas = compilar_politicas()
     
     def __call__(self, request):
-        # Verificar acceso antes de procesar la vista
-        response = self.process_request(request)
-        if response:
-            return response
-        
-        response = self.get_response(request)
-        return response
+        return self.get_response(request)
     
-    def process_request(self, request):
+    def process_view(self, request, view_func, view_args, view_kwargs):
         """
-        Procesa la petición antes de que llegue a la vista.
+        Comprueba la política de la ruta antes de llamar a la vista.
         """
         if not request.user.is_authenticated:
             return None
         
-        path = request.path
+        politica = self.politicas.get(request.resolver_match.view_name)
+        if politica is None or request.user.es_gestor():
+            return None
         
-        # Verificar URLs que requieren plan Pro
-        if any(path.startswith(url) for url in self.pro_required_urls):
-            if not request.user.es_pro() and not request.user.es_gestor():
-                messages.warning(request, 'Esta funcionalidad requiere un plan Pro.')
-                return redirect('usuarios:dashboard')
+        # Verificar rutas solo para gestores
+        if politica.rol == 'gestor':
+            return self.denegar(request, politica, 'No tienes permisos para acceder a esta página.', messages.ERROR)
         
-        # Verificar URLs solo para gestores
-        if any(path.startswith(url) for url in self.gestor_only_urls):
-            if not request.user.es_gestor():
-                messages.error(request, 'No tienes permisos para acceder a esta página.')
-                return redirect('usuarios:dashboard')
+        # Verificar rutas que requieren plan Pro, directamente o por el ejercicio
+        requiere_pro = politica.plan == 'pro'
+        if politica.ejercicio and not requiere_pro:
+            from ejercicios.catalogo import obtener_catalogo
+            ejercicio = obtener_catalogo().ejercicio(view_kwargs.get(politica.ejercicio))
+            requiere_pro = ejercicio is not None and ejercicio.requiere_pro
+        if requiere_pro and not request.user.es_pro():
+            return self.denegar(request, politica, 'Esta funcionalidad requiere un plan Pro.', messages.WARNING)
         
         return None
+    
+    def denegar(self, request, politica, mensaje, nivel):
+        """
+        JSON 403 para rutas AJAX; para el resto, mensaje y vuelta al dashboard.
+        """
+        if politica.ajax:
+            return JsonResponse({'error': mensaje}, status=403)
+        messages.add_message(request, nivel, mensaje)
+        return redirect('usuarios:dashboard')
 
 
 class UserActivityMiddleware:
     """
     Middleware para trackear actividad del usuario.
+    La actividad se acumula en memoria y se escribe en bloque como mucho
+    una vez por INTERVALO_ACTIVIDAD (ver usuarios.actividad).
     """
     
     def __init__(self, get_response):
@@ -78,19 +76,18 @@ class UserActivityMiddleware:
         response = self.get_response(request)
         
         # Registrar actividad después de procesar la vista
-        if request.user.is_authenticated and hasattr(request.user, 'ultima_actividad'):
+        if request.user.is_authenticated:
             self.update_last_activity(request.user)
         
         return response
     
     def update_last_activity(self, user):
         """
-        Actualiza la última actividad del usuario.
+        Anota la última actividad del usuario (Usuario.ultima_actividad).
         """
         try:
-            from django.utils import timezone
-            user.last_login = timezone.now()
-            user.save(update_fields=['last_login'])
+            from .actividad import registrar_actividad
+            registrar_actividad(user)
         except Exception as e:
             logger.error(f"Error actualizando última actividad para {user.email}: {e}")
 
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.3 on 2025-11-03 10:40
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def rellenar_contadores(apps, schema_editor):
+    """
+    Calcula los contadores iniciales a partir de EjercicioRealizado
+    (misma regla que usuarios.contadores.clave_contador).
+    """
+    Ejercicio = apps.get_model('ejercicios', 'Ejercicio')
+    EjercicioRealizado = apps.get_model('usuarios', 'EjercicioRealizado')
+    ProgresoCategoria = apps.get_model('usuarios', 'ProgresoCategoria')
+
+    claves = {
+        codigo: (categoria_codigo, bloque)
+        for codigo, categoria_codigo, bloque in Ejercicio.objects.values_list(
+            'codigo', 'categoria__codigo', 'bloque'
+        )
+    }
+
+    totales = Counter()
+    for usuario_id, codigo in EjercicioRealizado.objects.filter(
+        realizado=True
+    ).values_list('usuario_id', 'ejercicio_codigo').iterator():
+        clave = claves.get(codigo)
+        if clave is None:
+            coincidencia = re.match(r'^[A-Za-z]+', codigo or '')
+            clave = ((coincidencia.group(0).upper() if coincidencia else ''), 0)
+        totales[(usuario_id,) + clave] += 1
+
+    ProgresoCategoria.objects.bulk_create(
+        [
+            ProgresoCategoria(
+                usuario_id=usuario_id,
+                categoria_codigo=categoria_codigo,
+                bloque=bloque,
+                realizados=total
+            )
+            for (usuario_id, categoria_codigo, bloque), total in totales.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ejercicios', '0001_initial'),
+        ('usuarios', '0003_alter_solicitudcambioplan_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgresoCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria_codigo', models.CharField(max_length=10)),
+                ('bloque', models.PositiveSmallIntegerField()),
+                ('realizados', models.PositiveIntegerField(default=0)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progreso_categorias', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Progreso por Categoría',
+                'verbose_name_plural': 'Progresos por Categoría',
+                'unique_together': {('usuario', 'categoria_codigo', 'bloque')},
+            },
+        ),
+        migrations.RunPython(rellenar_contadores, migrations.RunPython.noop),
+    ]
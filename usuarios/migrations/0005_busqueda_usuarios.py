@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2025-11-05 09:20
+
+from django.db import migrations
+
+# Solo PostgreSQL: en SQLite f_unaccent se define al conectar y no hay índice
+# (ver usuarios.busqueda)
+SQL_CREAR = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() no es IMMUTABLE y no puede usarse en un índice; este envoltorio
+    # fija el diccionario para que el resultado dependa solo del argumento
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS $$
+        SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    # Misma expresión que usuarios.busqueda.TextoBusqueda
+    """
+    CREATE INDEX IF NOT EXISTS usuarios_usuario_busqueda_trgm ON usuarios_usuario
+    USING gin (f_unaccent(lower(nombre || ' ' || apellidos || ' ' || email)) gin_trgm_ops)
+    """,
+]
+
+SQL_BORRAR = [
+    "DROP INDEX IF EXISTS usuarios_usuario_busqueda_trgm",
+    "DROP FUNCTION IF EXISTS f_unaccent(text)",
+]
+
+
+def _ejecutar(sentencias):
+    def ejecutar(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sentencia in sentencias:
+            schema_editor.execute(sentencia)
+    return ejecutar
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0004_progresocategoria'),
+    ]
+
+    operations = [
+        migrations.RunPython(_ejecutar(SQL_CREAR), _ejecutar(SQL_BORRAR)),
+    ]
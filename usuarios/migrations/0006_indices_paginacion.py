@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2025-11-06 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0005_busqueda_usuarios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='solicitudcambioplan',
+            index=models.Index(fields=['fecha_solicitud', 'id'], name='usuarios_so_fecha_s_99d6e2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['tipo_usuario', 'fecha_registro', 'id'], name='usuarios_us_tipo_us_4360e7_idx'),
+        ),
+    ]
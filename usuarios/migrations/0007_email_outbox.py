@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2025-11-08 10:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0006_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('remitente', models.CharField(max_length=254)),
+                ('destinatarios', models.JSONField()),
+                ('asunto', models.CharField(max_length=255)),
+                ('cuerpo_texto', models.TextField()),
+                ('cuerpo_html', models.TextField(blank=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Email en cola',
+                'verbose_name_plural': 'Emails en cola',
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='usuarios_em_estado_c3a188_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2025-11-09 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0007_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='ultima_actividad',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
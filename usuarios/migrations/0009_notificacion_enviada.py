@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2025-11-09 18:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0008_usuario_ultima_actividad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionEnviada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=150, unique=True)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('envios', models.PositiveIntegerField(default=1)),
+                ('suprimidas', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Notificación enviada',
+                'verbose_name_plural': 'Notificaciones enviadas',
+            },
+        ),
+    ]
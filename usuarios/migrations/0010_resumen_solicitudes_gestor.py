@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2025-11-09 19:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0009_notificacion_enviada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenSolicitudesGestor',
+            fields=[
+                ('gestor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_solicitudes', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('ultima_solicitud', models.PositiveBigIntegerField(default=0)),
+                ('fecha_envio', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Resumen de solicitudes de gestor',
+                'verbose_name_plural': 'Resúmenes de solicitudes de gestores',
+            },
+        ),
+    ]
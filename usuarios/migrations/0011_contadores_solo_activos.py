@@ -0,0 +1,56 @@
+# Generated by Django 5.2.3 on 2025-11-12 11:20
+
+from collections import Counter
+
+from django.db import migrations
+
+
+def recalcular_contadores(apps, schema_editor):
+    """
+    Recalcula ProgresoCategoria contando solo ejercicios activos
+    (misma regla que usuarios.contadores.claves_contador). Hasta ahora
+    contaban también los desactivados y los códigos sin ejercicio (bloque 0).
+    """
+    Ejercicio = apps.get_model('ejercicios', 'Ejercicio')
+    EjercicioRealizado = apps.get_model('usuarios', 'EjercicioRealizado')
+    ProgresoCategoria = apps.get_model('usuarios', 'ProgresoCategoria')
+
+    claves = {
+        codigo: (categoria_codigo, bloque)
+        for codigo, categoria_codigo, bloque in Ejercicio.objects.filter(activo=True).values_list(
+            'codigo', 'categoria__codigo', 'bloque'
+        )
+    }
+
+    totales = Counter()
+    for usuario_id, codigo in EjercicioRealizado.objects.filter(
+        realizado=True
+    ).values_list('usuario_id', 'ejercicio_codigo').iterator():
+        if codigo in claves:
+            totales[(usuario_id,) + claves[codigo]] += 1
+
+    ProgresoCategoria.objects.all().delete()
+    ProgresoCategoria.objects.bulk_create(
+        [
+            ProgresoCategoria(
+                usuario_id=usuario_id,
+                categoria_codigo=categoria_codigo,
+                bloque=bloque,
+                realizados=total
+            )
+            for (usuario_id, categoria_codigo, bloque), total in totales.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ejercicios', '0002_version_datos'),
+        ('usuarios', '0010_resumen_solicitudes_gestor'),
+    ]
+
+    operations = [
+        migrations.RunPython(recalcular_contadores, migrations.RunPython.noop),
+    ]
@@ -39,6 +39,9 @@ class Usuario(AbstractUser):
     
     # Fechas
     fecha_registro = models.DateTimeField(default=timezone.now)
+    # Última petición del usuario, escrita en bloque (ver usuarios.actividad).
+    # No se usa last_login: lo firma el token de restablecer contraseña.
+    ultima_actividad = models.DateTimeField(null=True, blank=True, editable=False)
     
     # Configuración de autenticación
     USERNAME_FIELD = 'email'
@@ -50,6 +53,10 @@ class Usuario(AbstractUser):
     class Meta:
         verbose_name = 'Usuario'
         verbose_name_plural = 'Usuarios'
+        indexes = [
+            # Paginación por cursor de la gestión de usuarios (ver usuarios.paginacion)
+            models.Index(fields=['tipo_usuario', 'fecha_registro', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.nombre} {self.apellidos} ({self.email})"
@@ -83,24 +90,10 @@ class Usuario(AbstractUser):
     def bloque_completado(self, bloque_numero):
         """
         Verifica si el usuario ha completado todos los ejercicios de un bloque.
+        Usa la foto de progreso memorizada para la petición (ver usuarios.progreso).
         """
-        from ejercicios.models import Ejercicio
-        
-        # Obtener todos los ejercicios activos del bloque
-        ejercicios_bloque = Ejercicio.objects.filter(bloque=bloque_numero, activo=True)
-        total_ejercicios = ejercicios_bloque.count()
-        
-        if total_ejercicios == 0:
-            return True  # Si no hay ejercicios, consideramos el bloque completado
-        
-        # Contar ejercicios realizados por el usuario
-        ejercicios_realizados = EjercicioRealizado.objects.filter(
-            usuario=self,
-            ejercicio_codigo__in=[e.codigo for e in ejercicios_bloque],
-            realizado=True
-        ).count()
-        
-        return ejercicios_realizados >= total_ejercicios
+        from .progreso import obtener_progreso
+        return obtener_progreso(self).bloque_completado(bloque_numero)
     
     def save(self, *args, **kwargs):
         # Guardar plan anterior para detectar cambios
@@ -108,8 +101,10 @@ class Usuario(AbstractUser):
             try:
                 original = Usuario.objects.get(pk=self.pk)
                 self._plan_anterior = original.plan
+                self._tipo_anterior = original.tipo_usuario
             except Usuario.DoesNotExist:
                 self._plan_anterior = None
+                self._tipo_anterior = None
         
         super().save(*args, **kwargs)
 
@@ -182,6 +177,30 @@ class EjercicioRealizado(models.Model):
     def __str__(self):
         return f"{self.usuario.nombre_completo} - {self.ejercicio_codigo}"
 
+
+class ProgresoCategoria(models.Model):
+    """
+    Contadores desnormalizados de ejercicios realizados por usuario,
+    categoría y bloque. Solo cuentan ejercicios activos, en la categoría y
+    el bloque en que están ahora: se mantienen al marcar ejercicios y al
+    mover, activar o desactivar un ejercicio (ver usuarios.contadores y
+    usuarios.signals). Los cambios con queryset.update() no emiten señales;
+    tras ellos hay que ejecutar el comando reconstruir_contadores.
+    """
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='progreso_categorias')
+    categoria_codigo = models.CharField(max_length=10)  # EL, EO, EPM, EVM, EMD
+    bloque = models.PositiveSmallIntegerField()
+    realizados = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Progreso por Categoría'
+        verbose_name_plural = 'Progresos por Categoría'
+        unique_together = ['usuario', 'categoria_codigo', 'bloque']
+
+    def __str__(self):
+        return f"{self.usuario.nombre_completo} - {self.categoria_codigo} bloque {self.bloque}: {self.realizados}"
+
+
 class SolicitudCambioPlan(models.Model):
     """
     Modelo para trackear solicitudes de cambio de plan de usuarios.
@@ -220,6 +239,8 @@ class SolicitudCambioPlan(models.Model):
             models.Index(fields=['estado', 'fecha_solicitud']),
             models.Index(fields=['tipo_solicitud', 'estado']),
             models.Index(fields=['usuario', 'estado']),
+            # Paginación por cursor sin filtro de estado
+            models.Index(fields=['fecha_solicitud', 'id']),
         ]
     
     def __str__(self):
@@ -245,3 +266,83 @@ class SolicitudCambioPlan(models.Model):
             usuario=usuario, 
             estado='pendiente'
         ).exists()
+
+
+class EmailOutbox(models.Model):
+    """
+    Cola persistente de emails. Las vistas y signals guardan aquí el
+    mensaje ya renderizado y el comando send_outbox los envía por lotes
+    (ver usuarios.outbox), así un servidor SMTP lento no retrasa la
+    petición.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    remitente = models.CharField(max_length=254)
+    destinatarios = models.JSONField()
+    asunto = models.CharField(max_length=255)
+    cuerpo_texto = models.TextField()
+    cuerpo_html = models.TextField(blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(default=timezone.now)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Email en cola'
+        verbose_name_plural = 'Emails en cola'
+        indexes = [
+            # Reclamar los pendientes cuyo turno ha llegado
+            models.Index(fields=['estado', 'proximo_intento']),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} → {', '.join(self.destinatarios)} ({self.estado})"
+
+
+class NotificacionEnviada(models.Model):
+    """
+    Registro de idempotencia de las notificaciones (ver
+    usuarios.notificaciones.despachar). La clave única hace que, entre
+    procesos, solo una signal o vista encole cada evento; se guarda en la
+    misma transacción que el email del outbox. También lleva los contadores
+    de envíos y de duplicados suprimidos.
+    """
+    clave = models.CharField(max_length=150, unique=True)  # evento:usuario:versión
+    fecha = models.DateTimeField(default=timezone.now)  # último envío
+    envios = models.PositiveIntegerField(default=1)
+    suprimidas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Notificación enviada'
+        verbose_name_plural = 'Notificaciones enviadas'
+
+    def __str__(self):
+        return f"{self.clave} ({self.envios} envíos, {self.suprimidas} suprimidas)"
+
+
+class ResumenSolicitudesGestor(models.Model):
+    """
+    Última solicitud de cambio de plan incluida en el resumen enviado a
+    cada gestor (ver usuarios.notificaciones.notificar_resumen_solicitudes).
+    Es la marca de agua del resumen: solo se envía si hay solicitudes
+    posteriores, y la marca se adelanta en la misma transacción que encola
+    el email, así que dos ejecuciones solapadas no envían el mismo resumen.
+    """
+    gestor = models.OneToOneField(
+        Usuario, on_delete=models.CASCADE, primary_key=True, related_name='resumen_solicitudes'
+    )
+    ultima_solicitud = models.PositiveBigIntegerField(default=0)  # id de SolicitudCambioPlan
+    fecha_envio = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Resumen de solicitudes de gestor'
+        verbose_name_plural = 'Resúmenes de solicitudes de gestores'
+
+    def __str__(self):
+        return f"{self.gestor.email}: hasta la solicitud {self.ultima_solicitud}"
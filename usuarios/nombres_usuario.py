@@ -0,0 +1,80 @@
+# usuarios/nombres_usuario.py
+import random
+import re
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+# Bases distintas que se buscan en una misma consulta al asignar en bloque
+BASES_POR_CONSULTA = 200
+
+# Cifras reservadas para el sufijo numérico al recortar una base larga
+CIFRAS_SUFIJO = 10
+
+_SUFIJO = re.compile(r'\d*')
+
+
+def base_username(email):
+    """Parte local del email: de ahí sale el username (info@x.com -> 'info')."""
+    return email.split('@')[0]
+
+
+def _usernames_ocupados(modelo, bases, using=None):
+    """
+    Devuelve (ocupados, mayores): los usernames existentes que son una de
+    las bases seguida o no de cifras, y {base: mayor sufijo numérico en uso}.
+    Una consulta por prefijo para cada BASES_POR_CONSULTA bases; como 'info'
+    también encuentra 'informatica', el resto se descarta.
+    """
+    ocupados = set()
+    mayores = {}
+    manager = modelo._default_manager.db_manager(using)
+    for inicio in range(0, len(bases), BASES_POR_CONSULTA):
+        lote = set(bases[inicio:inicio + BASES_POR_CONSULTA])
+        filtro = reduce(or_, (Q(username__startswith=base) for base in lote))
+        for username in manager.filter(filtro).values_list('username', flat=True).iterator():
+            # Un username puede ser base + cifras de varias bases del lote
+            # ('info12' es 'info' + 12 y 'info1' + 2)
+            for longitud in range(len(username), 0, -1):
+                base = username[:longitud]
+                if base in lote and _SUFIJO.fullmatch(username, longitud):
+                    ocupados.add(username)
+                    sufijo = int(username[longitud:] or 0)
+                    mayores[base] = max(mayores.get(base, 0), sufijo)
+    return ocupados, mayores
+
+
+def asignar_usernames(modelo, bases, using=None, dispersion=0):
+    """
+    Devuelve un username libre para cada base, en el mismo orden: la base
+    tal cual si está libre y, si no, la base seguida del siguiente sufijo
+    al mayor ya usado (info, info1, info2...). Las bases repetidas reciben
+    sufijos distintos, así que sirve para altas en bloque.
+
+    Como no bloquea nada, otra alta simultánea puede quedarse antes con el
+    mismo username: quien guarde debe reintentar si hay IntegrityError,
+    pasando una `dispersion` creciente para que los reintentos simultáneos
+    no vuelvan a pedir todos el mismo sufijo.
+    """
+    longitud_maxima = modelo._meta.get_field('username').max_length - CIFRAS_SUFIJO
+    bases = [base[:longitud_maxima] for base in bases]
+    if not bases:
+        return []
+
+    ocupados, mayores = _usernames_ocupados(modelo, list(dict.fromkeys(bases)), using)
+    usernames = []
+    for base in bases:
+        username = base
+        if username in ocupados:
+            # Los sufijos por encima del mayor en uso están libres en la base
+            # de datos, pero otra base del bloque puede haber generado ya el
+            # mismo nombre ('user' + 1 y 'user1')
+            sufijo = mayores.get(base, 0) + (random.randrange(dispersion) if dispersion else 0)
+            while username in ocupados:
+                sufijo += 1
+                username = f"{base}{sufijo}"
+            mayores[base] = sufijo
+        ocupados.add(username)
+        usernames.append(username)
+    return usernames
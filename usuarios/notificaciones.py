@@ -0,0 +1,356 @@
+# usuarios/notificaciones.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from .outbox import encolar_mensaje, encolar_mensajes
+
+logger = logging.getLogger(__name__)
+
+# Segundos durante los que el mismo evento no se vuelve a notificar
+VENTANA_DEDUPLICACION = 600
+
+# Solicitudes pendientes que se listan como máximo en un resumen a gestores
+MAX_SOLICITUDES_RESUMEN = 50
+
+
+def clave_idempotencia(evento, usuario_id, version=''):
+    """Clave de un evento: tipo + usuario + versión (p.ej. 'gratuito>pro')."""
+    return f'notificacion:{evento}:{usuario_id}:{version}'
+
+
+def _reservar(evento, usuario_id, version):
+    """
+    True si el evento no se ha notificado dentro de la ventana. La clave es
+    única en NotificacionEnviada, así que de una signal y una vista que
+    notifican lo mismo, aunque sea desde procesos distintos, solo gana la
+    primera. Debe llamarse dentro de la transacción que encola el email.
+    """
+    from .models import NotificacionEnviada
+
+    clave = clave_idempotencia(evento, usuario_id, version)
+    ahora = timezone.now()
+    try:
+        with transaction.atomic():
+            NotificacionEnviada.objects.create(clave=clave, fecha=ahora)
+        return True
+    except IntegrityError:
+        pass
+
+    notificaciones = NotificacionEnviada.objects.filter(clave=clave)
+    caducada = ahora - timedelta(seconds=VENTANA_DEDUPLICACION)
+    if notificaciones.filter(fecha__lt=caducada).update(fecha=ahora, envios=F('envios') + 1):
+        return True
+    notificaciones.update(suprimidas=F('suprimidas') + 1)
+    logger.info(f"NOTIFICACIONES: '{evento}' para el usuario {usuario_id} ({version}) ya notificado, se omite")
+    return False
+
+
+def despachar(evento, usuario_id, version, construir):
+    """
+    Encola la notificación salvo que ya se haya despachado con la misma
+    clave dentro de VENTANA_DEDUPLICACION. `construir` devuelve el
+    EmailMultiAlternatives y solo se llama si no se suprime, así que las
+    plantillas se renderizan una vez por evento. Devuelve True si se encola.
+
+    Nunca lanza excepciones: un fallo al notificar no debe romper la
+    operación que lo provoca. La clave y el email se guardan juntos en la
+    transacción en curso: si esta se deshace, el evento puede volver a
+    notificarse.
+    """
+    try:
+        with transaction.atomic():
+            if not _reservar(evento, usuario_id, version):
+                return False
+            encolar_mensaje(construir())
+    except Exception as e:
+        logger.error(f"NOTIFICACIONES: error encolando '{evento}' para el usuario {usuario_id}: {e}")
+        return False
+    return True
+
+
+def metricas_notificaciones():
+    """
+    {'encoladas': n, 'suprimidas': n} de todos los procesos, sumados en
+    NotificacionEnviada con una consulta.
+    """
+    from .models import NotificacionEnviada
+
+    totales = NotificacionEnviada.objects.aggregate(encoladas=Sum('envios'), suprimidas=Sum('suprimidas'))
+    return {metrica: total or 0 for metrica, total in totales.items()}
+
+
+# ============================================================================
+# MENSAJES
+# ============================================================================
+
+def _url(nombre):
+    return getattr(settings, 'SITE_URL', 'http://localhost:8000') + reverse(nombre)
+
+
+def _mensaje(asunto, plantilla, contexto, destinatarios):
+    """Renderiza usuarios/emails/<plantilla>.txt y .html y construye el email."""
+    mensaje = EmailMultiAlternatives(
+        asunto,
+        render_to_string(f'usuarios/emails/{plantilla}.txt', contexto),
+        getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@campayo.com'),
+        destinatarios,
+    )
+    mensaje.attach_alternative(render_to_string(f'usuarios/emails/{plantilla}.html', contexto), 'text/html')
+    return mensaje
+
+
+def mensaje_bienvenida(usuario):
+    return _mensaje(
+        '¡Bienvenido a Turbo Speed Reader - Lectura Rápida!',
+        'bienvenida',
+        {
+            'usuario': usuario,
+            'site_name': 'Campayo',
+            'login_url': _url('usuarios:login'),
+            'dashboard_url': _url('usuarios:dashboard'),
+        },
+        [usuario.email],
+    )
+
+
+def mensaje_cambio_plan(usuario, plan_anterior, plan_nuevo):
+    return _mensaje(
+        f'Tu plan en Campayo ha sido actualizado a {plan_nuevo.title()}',
+        'cambio_plan',
+        {
+            'usuario': usuario,
+            'plan_anterior': plan_anterior,
+            'plan_nuevo': plan_nuevo,
+            'site_name': 'Campayo',
+            'dashboard_url': _url('usuarios:dashboard'),
+            'es_upgrade': plan_nuevo == 'pro',
+            'es_downgrade': plan_nuevo == 'gratuito',
+        },
+        [usuario.email],
+    )
+
+
+def mensaje_nueva_solicitud(solicitud, emails_gestores):
+    return _mensaje(
+        f'Nueva solicitud de {solicitud.get_tipo_solicitud_display().lower()} - {solicitud.usuario.nombre_completo}',
+        'nueva_solicitud_gestor',
+        {
+            'solicitud': solicitud,
+            'gestionar_url': _url('usuarios:gestionar_solicitudes'),
+        },
+        emails_gestores,
+    )
+
+
+def mensaje_resumen_solicitudes(gestor, nuevas, pendientes, total_pendientes, desde):
+    return _mensaje(
+        f'{len(nuevas)} nueva(s) solicitud(es) de cambio de plan - Campayo',
+        'resumen_solicitudes_gestor',
+        {
+            'gestor': gestor,
+            'nuevas': nuevas,
+            'pendientes': pendientes,
+            'total_pendientes': total_pendientes,
+            'sin_mostrar': total_pendientes - len(pendientes),
+            'desde': desde,
+            'gestionar_url': _url('usuarios:gestionar_solicitudes'),
+        },
+        [gestor.email],
+    )
+
+
+def mensaje_resultado_solicitud(solicitud, aprobada):
+    usuario = solicitud.usuario
+    if aprobada:
+        asunto = f'¡Tu plan ha sido actualizado a {usuario.get_plan_display()}! - Campayo'
+    else:
+        asunto = 'Solicitud de cambio de plan procesada - Campayo'
+    return _mensaje(
+        asunto,
+        'resultado_solicitud_usuario',
+        {
+            'usuario': usuario,
+            'solicitud': solicitud,
+            'aprobada': aprobada,
+            'dashboard_url': _url('usuarios:dashboard'),
+        },
+        [usuario.email],
+    )
+
+
+# ============================================================================
+# EVENTOS
+# ============================================================================
+
+def notificar_bienvenida(usuario):
+    """Email de bienvenida: una vez por usuario."""
+    return despachar('bienvenida', usuario.pk, '', lambda: mensaje_bienvenida(usuario))
+
+
+def notificar_bienvenidas(usuarios):
+    """
+    Bienvenida para un bloque de usuarios recién creados (importar_usuarios),
+    con un INSERT para las claves y otro para los emails. A diferencia de
+    despachar, los errores se propagan para que se deshaga el lote.
+    Devuelve cuántas se encolan.
+    """
+    from .models import NotificacionEnviada
+
+    claves = {usuario.pk: clave_idempotencia('bienvenida', usuario.pk) for usuario in usuarios}
+    with transaction.atomic():
+        notificados = NotificacionEnviada.objects.filter(clave__in=claves.values())
+        existentes = set(notificados.values_list('clave', flat=True))
+        if existentes:
+            notificados.update(suprimidas=F('suprimidas') + 1)
+        pendientes = [usuario for usuario in usuarios if claves[usuario.pk] not in existentes]
+        if pendientes:
+            NotificacionEnviada.objects.bulk_create(
+                [NotificacionEnviada(clave=claves[usuario.pk]) for usuario in pendientes]
+            )
+            encolar_mensajes([mensaje_bienvenida(usuario) for usuario in pendientes])
+    return len(pendientes)
+
+
+def notificar_cambio_plan(usuario, plan_anterior, plan_nuevo):
+    """Cambio de plan: una vez por transición dentro de la ventana."""
+    return despachar(
+        'cambio_plan', usuario.pk, f'{plan_anterior}>{plan_nuevo}',
+        lambda: mensaje_cambio_plan(usuario, plan_anterior, plan_nuevo)
+    )
+
+
+def modo_resumen_solicitudes():
+    """True si los gestores reciben un resumen periódico en vez de un email por solicitud."""
+    return getattr(settings, 'NOTIFICACION_SOLICITUDES', 'inmediato') == 'resumen'
+
+
+def notificar_nueva_solicitud(solicitud):
+    """
+    Aviso a los gestores activos de una solicitud nueva. En modo resumen no
+    se envía nada: la solicitud pendiente ya es el evento y la recoge
+    enviar_resumen_solicitudes.
+    """
+    from .models import Usuario
+
+    if modo_resumen_solicitudes():
+        return False
+    emails_gestores = list(
+        Usuario.objects.filter(tipo_usuario='gestor', is_active=True).values_list('email', flat=True)
+    )
+    if not emails_gestores:
+        logger.warning("No hay gestores activos para notificar la nueva solicitud")
+        return False
+    return despachar(
+        'nueva_solicitud', solicitud.usuario_id, solicitud.pk,
+        lambda: mensaje_nueva_solicitud(solicitud, emails_gestores)
+    )
+
+
+def notificar_resultado_solicitud(solicitud, aprobada):
+    """
+    Resultado de una solicitud de cambio de plan para su usuario. Si se
+    aprueba, el email ya anuncia el nuevo plan, así que ocupa la clave del
+    cambio de plan: llamándolo antes de guardar al usuario, la signal de
+    cambio de plan se suprime.
+    """
+    if aprobada:
+        if solicitud.tipo_solicitud == 'solicitar_pro':
+            evento, version = 'cambio_plan', 'gratuito>pro'
+        else:
+            evento, version = 'cambio_plan', 'pro>gratuito'
+    else:
+        evento, version = 'resultado_solicitud', f'{solicitud.pk}:{solicitud.estado}'
+    return despachar(
+        evento, solicitud.usuario_id, version,
+        lambda: mensaje_resultado_solicitud(solicitud, aprobada)
+    )
+
+
+def _adelantar_marca(gestor, ultima):
+    """
+    Adelanta la marca del resumen del gestor hasta la solicitud `ultima`.
+    False si otra ejecución ya la ha llevado ahí (o más allá).
+    """
+    from .models import ResumenSolicitudesGestor
+
+    ahora = timezone.now()
+    if ResumenSolicitudesGestor.objects.filter(gestor=gestor, ultima_solicitud__lt=ultima).update(
+        ultima_solicitud=ultima, fecha_envio=ahora
+    ):
+        return True
+    try:
+        with transaction.atomic():
+            ResumenSolicitudesGestor.objects.create(gestor=gestor, ultima_solicitud=ultima, fecha_envio=ahora)
+        return True
+    except IntegrityError:
+        # Ya tenía marca, igual o posterior
+        return False
+
+
+def notificar_resumen_solicitudes(desde, maximo=MAX_SOLICITUDES_RESUMEN):
+    """
+    Envía a cada gestor activo un resumen de las solicitudes pendientes si
+    ha llegado alguna desde su último resumen (ResumenSolicitudesGestor);
+    para un gestor que nunca ha recibido uno, desde `desde`. Las
+    solicitudes salen de una sola consulta por el índice (estado,
+    fecha_solicitud), limitada a las `maximo` más recientes. Devuelve
+    cuántos resúmenes se encolan.
+
+    La marca de cada gestor se adelanta en la misma transacción que encola
+    su email y solo si sigue por detrás, así que dos ejecuciones solapadas,
+    aunque sea en procesos distintos, no mandan el mismo resumen dos veces.
+    """
+    from .estadisticas import estadisticas_solicitudes
+    from .models import ResumenSolicitudesGestor, SolicitudCambioPlan, Usuario
+
+    pendientes = list(
+        SolicitudCambioPlan.objects.filter(estado='pendiente')
+        .select_related('usuario')
+        .order_by('-fecha_solicitud', '-id')[:maximo]
+    )
+    if not pendientes:
+        return 0
+
+    gestores = list(Usuario.objects.filter(tipo_usuario='gestor', is_active=True))
+    if not gestores:
+        logger.warning("No hay gestores activos para enviar el resumen de solicitudes")
+        return 0
+
+    marcas = {
+        gestor_id: (ultima_solicitud, fecha_envio)
+        for gestor_id, ultima_solicitud, fecha_envio in ResumenSolicitudesGestor.objects.filter(
+            gestor__in=gestores
+        ).values_list('gestor_id', 'ultima_solicitud', 'fecha_envio')
+    }
+    total_pendientes = max(estadisticas_solicitudes()['pendientes'], len(pendientes))
+    enviados = 0
+    for gestor in gestores:
+        if gestor.pk in marcas:
+            marca, desde_gestor = marcas[gestor.pk]
+            nuevas = [solicitud for solicitud in pendientes if solicitud.pk > marca]
+        else:
+            desde_gestor = desde
+            nuevas = [solicitud for solicitud in pendientes if solicitud.fecha_solicitud >= desde]
+        if not nuevas:
+            continue
+
+        ultima = max(solicitud.pk for solicitud in nuevas)
+        try:
+            with transaction.atomic():
+                if not _adelantar_marca(gestor, ultima):
+                    logger.info(f"NOTIFICACIONES: resumen hasta la solicitud {ultima} ya enviado a {gestor.email}")
+                    continue
+                encolar_mensaje(mensaje_resumen_solicitudes(gestor, nuevas, pendientes, total_pendientes, desde_gestor))
+        except Exception as e:
+            logger.error(f"NOTIFICACIONES: error encolando el resumen para {gestor.email}: {e}")
+            continue
+        enviados += 1
+    return enviados
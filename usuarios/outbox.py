@@ -0,0 +1,231 @@
+# usuarios/outbox.py
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Emails que reclama cada lote del worker
+TAMANO_LOTE = 50
+
+# Tiempo que un lote reclamado queda reservado para su worker. Si el
+# worker muere a mitad de envío, otro los recoge pasado este tiempo.
+RESERVA_LOTE = timedelta(minutes=5)
+
+# Reintentos con espera exponencial: 1, 2, 4, 8, 16 minutos... hasta 1 hora
+ESPERA_BASE = timedelta(minutes=1)
+ESPERA_MAXIMA = timedelta(hours=1)
+MAX_INTENTOS = 8
+
+
+def _remitente_por_defecto():
+    return getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@campayo.com')
+
+
+def encolar_email(asunto, texto, destinatarios, html='', remitente=None):
+    """
+    Guarda un email en EmailOutbox para que lo envíe send_outbox.
+    Si hay una transacción en curso se guarda con ella, así que no se
+    envía nada de una operación que acaba deshaciéndose.
+    """
+    from .models import EmailOutbox
+
+    return EmailOutbox.objects.create(
+        remitente=remitente or _remitente_por_defecto(),
+        destinatarios=list(destinatarios),
+        asunto=asunto,
+        cuerpo_texto=texto,
+        cuerpo_html=html or '',
+    )
+
+
+def _fila_desde_mensaje(mensaje):
+    from .models import EmailOutbox
+
+    html = next(
+        (contenido for contenido, tipo in getattr(mensaje, 'alternatives', []) if tipo == 'text/html'),
+        ''
+    )
+    return EmailOutbox(
+        remitente=mensaje.from_email or _remitente_por_defecto(),
+        destinatarios=list(mensaje.to),
+        asunto=mensaje.subject,
+        cuerpo_texto=mensaje.body,
+        cuerpo_html=html,
+    )
+
+
+def encolar_mensajes(mensajes):
+    """Encola varios EmailMessage/EmailMultiAlternatives con un solo INSERT."""
+    from .models import EmailOutbox
+
+    return EmailOutbox.objects.bulk_create([_fila_desde_mensaje(mensaje) for mensaje in mensajes])
+
+
+def encolar_mensaje(mensaje):
+    """Encola un EmailMessage/EmailMultiAlternatives ya construido."""
+    fila = _fila_desde_mensaje(mensaje)
+    fila.save()
+    return fila
+
+
+def espera_reintento(intentos):
+    """Espera antes del siguiente intento tras `intentos` fallidos."""
+    return min(ESPERA_BASE * 2 ** (intentos - 1), ESPERA_MAXIMA)
+
+
+def reclamar_lote(tamano=TAMANO_LOTE):
+    """
+    Reserva hasta `tamano` emails pendientes cuyo turno ha llegado.
+
+    Con SELECT ... FOR UPDATE SKIP LOCKED varios workers pueden reclamar a
+    la vez sin esperarse ni repetir filas. La reserva se confirma en una
+    transacción corta (proximo_intento pasa a ahora + RESERVA_LOTE), así
+    que el envío por SMTP ocurre fuera de la transacción.
+    """
+    from .models import EmailOutbox
+
+    ahora = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(estado='pendiente', proximo_intento__lte=ahora)
+            .order_by('proximo_intento', 'id')
+            .values_list('id', flat=True)[:tamano]
+        )
+        if not ids:
+            return []
+        EmailOutbox.objects.filter(id__in=ids).update(
+            intentos=F('intentos') + 1,
+            proximo_intento=ahora + RESERVA_LOTE,
+        )
+    return list(EmailOutbox.objects.filter(id__in=ids).order_by('proximo_intento', 'id'))
+
+
+def _como_mensaje(fila, conexion):
+    mensaje = EmailMultiAlternatives(
+        fila.asunto,
+        fila.cuerpo_texto,
+        fila.remitente,
+        fila.destinatarios,
+        connection=conexion,
+    )
+    if fila.cuerpo_html:
+        mensaje.attach_alternative(fila.cuerpo_html, 'text/html')
+    return mensaje
+
+
+def _registrar_fallo(fila, error):
+    fila.ultimo_error = f"{type(error).__name__}: {error}"[:2000]
+    if fila.intentos >= MAX_INTENTOS:
+        fila.estado = 'fallido'
+        logger.error(f"OUTBOX: email {fila.pk} descartado tras {fila.intentos} intentos: {fila.ultimo_error}")
+    else:
+        fila.proximo_intento = timezone.now() + espera_reintento(fila.intentos)
+        logger.warning(f"OUTBOX: email {fila.pk} falló (intento {fila.intentos}), se reintenta: {fila.ultimo_error}")
+    fila.save(update_fields=['estado', 'proximo_intento', 'ultimo_error'])
+
+
+def _liberar(filas, error):
+    """
+    Devuelve a la cola un lote que no se ha llegado a intentar (p.ej. el
+    servidor SMTP no responde): deshace el intento que sumó reclamar_lote
+    y lo deja para dentro de ESPERA_BASE. Una caída del servidor no debe
+    llevar emails a 'fallido'.
+    """
+    from .models import EmailOutbox
+
+    EmailOutbox.objects.filter(id__in=[fila.pk for fila in filas], estado='pendiente').update(
+        intentos=Greatest(F('intentos') - 1, 0),
+        proximo_intento=timezone.now() + ESPERA_BASE,
+        ultimo_error=f"{type(error).__name__}: {error}"[:2000],
+    )
+
+
+def enviar_lote(tamano=TAMANO_LOTE, conexion=None):
+    """
+    Reclama un lote y lo envía por una sola conexión. Los fallos se
+    reprograman con espera exponencial y, tras MAX_INTENTOS, quedan como
+    'fallido'; si ni siquiera se puede abrir la conexión, el lote se
+    libera sin gastar intentos. Devuelve {'enviados', 'reintentos',
+    'fallidos', 'liberados', 'segundos'}.
+
+    La entrega es "al menos una vez": los enviados se marcan al terminar el
+    lote, así que si el proceso muere antes, otro worker los vuelve a
+    enviar pasado RESERVA_LOTE. Un email puede llegar repetido, nunca perderse.
+    """
+    from .models import EmailOutbox
+
+    resultado = {'enviados': 0, 'reintentos': 0, 'fallidos': 0, 'liberados': 0, 'segundos': 0.0}
+    filas = reclamar_lote(tamano)
+    if not filas:
+        return resultado
+
+    inicio = time.perf_counter()
+    conexion = conexion or get_connection(fail_silently=False)
+    try:
+        conexion.open()
+    except Exception as e:
+        logger.error(f"OUTBOX: no se puede abrir la conexión, se liberan {len(filas)} emails: {e}")
+        _liberar(filas, e)
+        resultado['liberados'] = len(filas)
+        resultado['segundos'] = time.perf_counter() - inicio
+        return resultado
+
+    enviados = []
+    try:
+        for fila in filas:
+            try:
+                conexion.send_messages([_como_mensaje(fila, conexion)])
+                enviados.append(fila.pk)
+            except Exception as e:
+                _registrar_fallo(fila, e)
+                resultado['fallidos' if fila.estado == 'fallido' else 'reintentos'] += 1
+                # La conexión puede haber quedado inservible: abrir otra
+                try:
+                    conexion.close()
+                    conexion.open()
+                except Exception as error:
+                    logger.error(f"OUTBOX: no se puede reabrir la conexión: {error}")
+    finally:
+        try:
+            conexion.close()
+        except Exception:
+            pass
+        if enviados:
+            EmailOutbox.objects.filter(id__in=enviados).update(
+                estado='enviado',
+                fecha_envio=timezone.now(),
+                ultimo_error='',
+            )
+
+    resultado['enviados'] = len(enviados)
+    resultado['segundos'] = time.perf_counter() - inicio
+    return resultado
+
+
+def metricas():
+    """
+    Estado de la cola en una consulta: pendientes (y cuántos de ellos son
+    reintentos), enviados, fallidos y antigüedad en segundos del pendiente
+    más antiguo.
+    """
+    from .models import EmailOutbox
+
+    datos = EmailOutbox.objects.aggregate(
+        pendientes=Count('id', filter=Q(estado='pendiente')),
+        reintentando=Count('id', filter=Q(estado='pendiente', intentos__gt=0)),
+        enviados=Count('id', filter=Q(estado='enviado')),
+        fallidos=Count('id', filter=Q(estado='fallido')),
+        pendiente_mas_antiguo=Min('fecha_creacion', filter=Q(estado='pendiente')),
+    )
+    mas_antiguo = datos.pop('pendiente_mas_antiguo')
+    datos['antiguedad_pendientes'] = (timezone.now() - mas_antiguo).total_seconds() if mas_antiguo else 0
+    return datos
@@ -0,0 +1,83 @@
+# usuarios/paginacion.py
+import hashlib
+from datetime import datetime
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Q
+
+SALT_CURSOR = 'usuarios.paginacion'
+
+# Segundos que se reutiliza el total de un listado
+TIMEOUT_CONTEOS = 60
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no es válido o ha sido manipulado."""
+
+
+def codificar_cursor(fecha, pk):
+    """Token opaco y firmado con la posición (fecha, id) del último elemento."""
+    return signing.dumps([fecha.isoformat(), pk], salt=SALT_CURSOR)
+
+
+def decodificar_cursor(token):
+    """Devuelve (fecha, id) de un cursor. Lanza CursorInvalido si no es válido."""
+    try:
+        fecha, pk = signing.loads(token, salt=SALT_CURSOR)
+        return datetime.fromisoformat(fecha), int(pk)
+    except (signing.BadSignature, TypeError, ValueError) as e:
+        raise CursorInvalido(str(e))
+
+
+class PaginaKeyset:
+    """
+    Página de un listado ordenado por (campo de fecha, id) descendente.
+
+    - object_list: elementos de la página
+    - siguiente_cursor: token para pedir la página siguiente, o None si es la última
+    """
+
+    def __init__(self, object_list, siguiente_cursor):
+        self.object_list = object_list
+        self.siguiente_cursor = siguiente_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.siguiente_cursor is not None
+
+
+def paginar_keyset(queryset, campo, cursor=None, por_pagina=20):
+    """
+    Devuelve la página que sigue a `cursor` ordenando por (campo, id)
+    descendente. A diferencia de Paginator no hace COUNT(*) ni OFFSET: cada
+    página es un rango del índice (campo, id) y cuesta lo mismo sea cual sea
+    su posición. Lanza CursorInvalido si el cursor no es válido.
+    """
+    queryset = queryset.order_by(f'-{campo}', '-id')
+    if cursor:
+        fecha, pk = decodificar_cursor(cursor)
+        queryset = queryset.filter(Q(**{f'{campo}__lt': fecha}) | Q(**{campo: fecha, 'id__lt': pk}))
+
+    elementos = list(queryset[:por_pagina + 1])
+    siguiente = None
+    if len(elementos) > por_pagina:
+        elementos = elementos[:por_pagina]
+        ultimo = elementos[-1]
+        siguiente = codificar_cursor(getattr(ultimo, campo), ultimo.pk)
+    return PaginaKeyset(elementos, siguiente)
+
+
+def contar_cacheado(queryset, clave):
+    """
+    Total aproximado de un listado: se cuenta una vez y se reutiliza durante
+    TIMEOUT_CONTEOS segundos, así que no se recuenta en cada página.
+    """
+    clave = hashlib.md5(clave.encode('utf-8')).hexdigest()
+    return cache.get_or_set(f'conteo:{clave}', queryset.count, TIMEOUT_CONTEOS)
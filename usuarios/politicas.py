@@ -0,0 +1,148 @@
+# usuarios/politicas.py
+from django.urls import get_resolver
+
+
+class Politica:
+    """
+    Requisitos de acceso de una ruta para usuarios autenticados.
+
+    rol: 'gestor' si solo pueden entrar gestores.
+    plan: 'pro' si requiere plan Pro (los gestores siempre pasan).
+    ejercicio: nombre del kwarg de la URL con el id de un ejercicio; si el
+        ejercicio del catálogo requiere Pro, se exige plan Pro.
+    ajax: la ruta responde JSON, así que se deniega con JSON y no con redirect.
+    publica: no requiere sesión (solo documenta; no se comprueba nada).
+
+    El login lo siguen exigiendo los decoradores de cada vista.
+    """
+    __slots__ = ('rol', 'plan', 'ejercicio', 'ajax', 'publica')
+
+    def __init__(self, rol=None, plan=None, ejercicio=None, ajax=False, publica=False):
+        self.rol = rol
+        self.plan = plan
+        self.ejercicio = ejercicio
+        self.ajax = ajax
+        self.publica = publica
+
+    @property
+    def restringida(self):
+        return bool(self.rol or self.plan or self.ejercicio)
+
+    def __repr__(self):
+        campos = ', '.join(f'{campo}={getattr(self, campo)!r}' for campo in self.__slots__ if getattr(self, campo))
+        return f'Politica({campos})'
+
+
+PUBLICA = Politica(publica=True)
+USUARIO = Politica()
+USUARIO_AJAX = Politica(ajax=True)
+GESTOR = Politica(rol='gestor')
+GESTOR_AJAX = Politica(rol='gestor', ajax=True)
+
+# Política de cada ruta con nombre del proyecto, por 'app:nombre'. Los checks
+# usuarios.E001-E003 avisan de rutas sin política y de políticas sin ruta.
+POLITICAS = {
+    'home': PUBLICA,
+
+    # usuarios
+    'usuarios:registro': PUBLICA,
+    'usuarios:login': PUBLICA,
+    'usuarios:logout': PUBLICA,
+    'usuarios:password_reset': PUBLICA,
+    'usuarios:password_reset_done': PUBLICA,
+    'usuarios:password_reset_confirm': PUBLICA,
+    'usuarios:password_reset_complete': PUBLICA,
+    'usuarios:dashboard': USUARIO,
+    'usuarios:editar_perfil': USUARIO,
+    'usuarios:cambiar_password': USUARIO,
+    'usuarios:solicitar_cambio_plan': USUARIO_AJAX,
+    'usuarios:cancelar_solicitud_plan': USUARIO_AJAX,
+    'usuarios:procesar_solicitud_plan': GESTOR_AJAX,
+    'usuarios:gestionar_solicitudes': GESTOR,
+    'usuarios:gestionar_usuarios': GESTOR,
+    'usuarios:buscar_usuarios': GESTOR_AJAX,
+    'usuarios:cambiar_plan_usuario': GESTOR_AJAX,
+
+    # ejercicios
+    'ejercicios:lista': USUARIO,
+    'ejercicios:detalle': Politica(ejercicio='ejercicio_id'),
+    'ejercicios:fragmento_texto': USUARIO_AJAX,
+    'ejercicios:completar': USUARIO_AJAX,
+    'ejercicios:mi_progreso': USUARIO,
+
+    # test_lectura
+    'test_lectura:lista_tests': USUARIO,
+    'test_lectura:iniciar': USUARIO,
+    'test_lectura:finalizar_lectura': USUARIO_AJAX,
+    'test_lectura:preguntas': USUARIO_AJAX,
+    'test_lectura:finalizar_test': USUARIO_AJAX,
+    'test_lectura:resultado': USUARIO,
+}
+
+# Espacios de nombres que no son de la aplicación
+ESPACIOS_EXCLUIDOS = ('admin',)
+
+
+def rutas_con_nombre(resolver=None, espacio=''):
+    """
+    {'app:nombre': parámetros de la URL} de todas las rutas con nombre de
+    la URLconf, salvo las de ESPACIOS_EXCLUIDOS.
+    """
+    from django.urls import URLPattern
+
+    resolver = resolver or get_resolver()
+    rutas = {}
+    for patron in resolver.url_patterns:
+        if isinstance(patron, URLPattern):
+            if patron.name:
+                rutas[f'{espacio}{patron.name}'] = set(getattr(patron.pattern, 'converters', {}))
+        elif patron.namespace not in ESPACIOS_EXCLUIDOS:
+            prefijo = f'{espacio}{patron.namespace}:' if patron.namespace else espacio
+            rutas.update(rutas_con_nombre(patron, prefijo))
+    return rutas
+
+
+def compilar_politicas():
+    """
+    Devuelve {view_name: Politica} solo con las rutas que restringen algo,
+    para que el middleware resuelva cada petición con un acceso al dict.
+    """
+    return {nombre: politica for nombre, politica in POLITICAS.items() if politica.restringida}
+
+
+def comprobar_politicas(app_configs=None, **kwargs):
+    """
+    Check de sistema: cada ruta con nombre tiene política, cada política
+    corresponde a una ruta y el parámetro de ejercicio existe en su URL.
+    """
+    from django.core.checks import Error
+
+    rutas = rutas_con_nombre()
+    errores = [
+        Error(
+            f"La ruta '{nombre}' no tiene política de acceso.",
+            hint="Añádela a POLITICAS en usuarios/politicas.py.",
+            obj='usuarios.politicas',
+            id='usuarios.E001',
+        )
+        for nombre in sorted(rutas.keys() - POLITICAS.keys())
+    ]
+    errores += [
+        Error(
+            f"La política '{nombre}' no corresponde a ninguna ruta.",
+            hint="Quítala de POLITICAS o corrige el nombre.",
+            obj='usuarios.politicas',
+            id='usuarios.E002',
+        )
+        for nombre in sorted(POLITICAS.keys() - rutas.keys())
+    ]
+    errores += [
+        Error(
+            f"La ruta '{nombre}' no tiene el parámetro '{politica.ejercicio}' de su política.",
+            obj='usuarios.politicas',
+            id='usuarios.E003',
+        )
+        for nombre, politica in sorted(POLITICAS.items())
+        if politica.ejercicio and nombre in rutas and politica.ejercicio not in rutas[nombre]
+    ]
+    return errores
@@ -0,0 +1,107 @@
+# usuarios/progreso.py
+
+
+class ProgresoUsuario:
+    """
+    Foto del progreso de un usuario en los bloques de ejercicios.
+
+    Carga con una sola consulta los códigos de ejercicios realizados y cruza
+    con el catálogo de ejercicios en memoria para saber la completitud de
+    cada bloque. Se memoriza en la instancia del usuario, de modo que dura lo
+    que dura la petición. Cuando se registra un ejercicio nuevo se actualiza
+    de forma incremental en lugar de volver a contar.
+    """
+
+    def __init__(self, usuario, bloques, ejercicios_realizados):
+        self.usuario = usuario
+        # {bloque: {'total': n, 'realizados': m}} sobre ejercicios activos
+        self.bloques = bloques
+        # Códigos de todos los ejercicios realizados (activos o no)
+        self.ejercicios_realizados = ejercicios_realizados
+        self._tests_completados = None
+
+    @classmethod
+    def cargar(cls, usuario):
+        """
+        Construye la foto con una sola consulta sobre los ejercicios realizados.
+        """
+        from ejercicios.catalogo import obtener_catalogo
+        from .models import EjercicioRealizado
+
+        ejercicios_realizados = set(
+            EjercicioRealizado.objects.filter(
+                usuario=usuario,
+                realizado=True
+            ).values_list('ejercicio_codigo', flat=True)
+        )
+
+        bloques = {}
+        for ejercicio in obtener_catalogo().activos():
+            datos = bloques.setdefault(ejercicio.bloque, {'total': 0, 'realizados': 0})
+            datos['total'] += 1
+            if ejercicio.codigo in ejercicios_realizados:
+                datos['realizados'] += 1
+        return cls(usuario, bloques, ejercicios_realizados)
+
+    def ejercicio_realizado(self, codigo):
+        """Indica si el usuario ha realizado el ejercicio con ese código."""
+        return codigo in self.ejercicios_realizados
+
+    def bloque_completado(self, bloque_numero):
+        """
+        Verifica si el usuario ha completado todos los ejercicios de un bloque.
+        """
+        datos = self.bloques.get(bloque_numero)
+        if not datos or datos['total'] == 0:
+            return True  # Si no hay ejercicios, consideramos el bloque completado
+        return datos['realizados'] >= datos['total']
+
+    def bloques_completados(self):
+        """Devuelve el conjunto de bloques completados."""
+        return {bloque for bloque in self.bloques if self.bloque_completado(bloque)}
+
+    @property
+    def tests_completados(self):
+        """Nombres de los tests completados (se cargan la primera vez que se piden)."""
+        if self._tests_completados is None:
+            from .models import ProgresoTests
+            self._tests_completados = set(
+                ProgresoTests.objects.filter(
+                    usuario=self.usuario,
+                    completado=True
+                ).values_list('test_nombre', flat=True)
+            )
+        return self._tests_completados
+
+    def test_completado(self, test_nombre):
+        """Indica si el usuario tiene el test marcado como completado."""
+        return test_nombre in self.tests_completados
+
+    def registrar_ejercicio(self, ejercicio):
+        """
+        Suma un ejercicio recién realizado sin volver a consultar.
+        """
+        if ejercicio.codigo in self.ejercicios_realizados:
+            return
+        self.ejercicios_realizados.add(ejercicio.codigo)
+        if not ejercicio.activo:
+            return
+        datos = self.bloques.setdefault(ejercicio.bloque, {'total': 1, 'realizados': 0})
+        datos['realizados'] = min(datos['realizados'] + 1, datos['total'])
+
+    def registrar_test(self, test_nombre):
+        """Marca un test como completado en la foto ya cargada."""
+        if self._tests_completados is not None:
+            self._tests_completados.add(test_nombre)
+
+
+def obtener_progreso(usuario):
+    """
+    Devuelve la foto de progreso del usuario, memorizada en la propia instancia.
+    Como request.user se crea en cada petición, la memoria dura una petición.
+    """
+    progreso = getattr(usuario, '_progreso_usuario', None)
+    if progreso is None:
+        progreso = ProgresoUsuario.cargar(usuario)
+        usuario._progreso_usuario = progreso
+    return progreso
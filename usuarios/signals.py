@@ -1,11 +1,11 @@
 # usuarios/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.conf import settings
-from django.urls import reverse
-from .models import Usuario
+from ejercicios.models import CategoriaEjercicio, Ejercicio
+from .contadores import reubicar_ejercicio
+from .estadisticas import invalidar_estadisticas_usuarios, invalidar_estadisticas_solicitudes
+from .models import ProgresoCategoria, Usuario, SolicitudCambioPlan
+from . import notificaciones
 
 
 @receiver(post_save, sender=Usuario)
@@ -15,40 +15,7 @@ def usuario_post_save(sender, instance, created, **kwargs):
     """
     if created and instance.tipo_usuario == 'usuario':
         # Enviar email de bienvenida a usuarios nuevos (no gestores)
-        enviar_email_bienvenida_signal(instance)
-
-
-def enviar_email_bienvenida_signal(usuario):
-    """
-    Envía email de bienvenida cuando se crea un usuario nuevo.
-    Función separada para poder ser llamada desde signals.
-    """
-    asunto = '¡Bienvenido a Turbo Speed Reader - Lectura Rápida!'
-    
-    # Contexto para el template
-    contexto = {
-        'usuario': usuario,
-        'site_name': 'Campayo',
-        'login_url': getattr(settings, 'SITE_URL', 'http://localhost:8000') + reverse('usuarios:login'),
-        'dashboard_url': getattr(settings, 'SITE_URL', 'http://localhost:8000') + reverse('usuarios:dashboard'),
-    }
-    
-    # Renderizar templates
-    mensaje_html = render_to_string('usuarios/emails/bienvenida.html', contexto)
-    mensaje_texto = render_to_string('usuarios/emails/bienvenida.txt', contexto)
-    
-    try:
-        send_mail(
-            asunto,
-            mensaje_texto,
-            getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@campayo.com'),
-            [usuario.email],
-            html_message=mensaje_html,
-            fail_silently=True  # No fallar si hay error de email
-        )
-        print(f"✓ Email de bienvenida enviado a {usuario.email}")
-    except Exception as e:
-        print(f"✗ Error enviando email de bienvenida a {usuario.email}: {e}")
+        notificaciones.notificar_bienvenida(instance)
 
 
 @receiver(post_save, sender=Usuario)
@@ -59,37 +26,85 @@ def notificar_cambio_plan(sender, instance, created, **kwargs):
     if not created and instance.tipo_usuario == 'usuario':
         # Verificar si cambió el plan
         if hasattr(instance, '_plan_anterior') and instance._plan_anterior != instance.plan:
-            enviar_email_cambio_plan_signal(instance, instance._plan_anterior, instance.plan)
+            notificaciones.notificar_cambio_plan(instance, instance._plan_anterior, instance.plan)
 
 
-def enviar_email_cambio_plan_signal(usuario, plan_anterior, plan_nuevo):
+@receiver(post_save, sender=Usuario)
+def usuario_estadisticas(sender, instance, created, **kwargs):
     """
-    Envía email cuando cambia el plan de un usuario.
+    Invalida las estadísticas de usuarios cuando cambian los totales:
+    alta, cambio de plan o de tipo. Guardar un usuario por otros motivos
+    (p.ej. last_login al entrar) no las invalida.
     """
-    asunto = f'Tu plan en Campayo ha sido actualizado a {plan_nuevo.title()}'
-    
-    contexto = {
-        'usuario': usuario,
-        'plan_anterior': plan_anterior,
-        'plan_nuevo': plan_nuevo,
-        'site_name': 'Campayo',
-        'dashboard_url': getattr(settings, 'SITE_URL', 'http://localhost:8000') + reverse('usuarios:dashboard'),
-        'es_upgrade': plan_nuevo == 'pro',
-        'es_downgrade': plan_nuevo == 'gratuito',
-    }
-    
-    mensaje_html = render_to_string('usuarios/emails/cambio_plan.html', contexto)
-    mensaje_texto = render_to_string('usuarios/emails/cambio_plan.txt', contexto)
-    
-    try:
-        send_mail(
-            asunto,
-            mensaje_texto,
-            getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@campayo.com'),
-            [usuario.email],
-            html_message=mensaje_html,
-            fail_silently=True
-        )
-        print(f"✓ Email de cambio de plan enviado a {usuario.email}")
-    except Exception as e:
-        print(f"✗ Error enviando email de cambio de plan a {usuario.email}: {e}")
\ No newline at end of file
+    if (
+        created
+        or getattr(instance, '_plan_anterior', instance.plan) != instance.plan
+        or getattr(instance, '_tipo_anterior', instance.tipo_usuario) != instance.tipo_usuario
+    ):
+        invalidar_estadisticas_usuarios()
+
+
+@receiver(post_delete, sender=Usuario)
+def usuario_eliminado(sender, instance, **kwargs):
+    invalidar_estadisticas_usuarios()
+
+
+@receiver([post_save, post_delete], sender=SolicitudCambioPlan)
+def solicitud_cambiada(sender, instance, **kwargs):
+    invalidar_estadisticas_solicitudes()
+
+
+def _clave_actual(ejercicio):
+    """(categoria_codigo, bloque) con el que cuenta el ejercicio, o None si está inactivo."""
+    if not ejercicio.activo:
+        return None
+    return ejercicio.categoria.codigo, ejercicio.bloque
+
+
+@receiver(pre_save, sender=Ejercicio)
+def ejercicio_pre_save(sender, instance, **kwargs):
+    """
+    Guarda dónde contaba el ejercicio antes del cambio: (codigo, (categoria, bloque) o None).
+    """
+    anterior = None
+    if instance.pk:
+        anterior = Ejercicio.objects.filter(pk=instance.pk).values_list(
+            'codigo', 'categoria__codigo', 'bloque', 'activo'
+        ).first()
+    instance._contador_anterior = anterior and (anterior[0], anterior[1:3] if anterior[3] else None)
+
+
+@receiver(post_save, sender=Ejercicio)
+def ejercicio_reubicado(sender, instance, created, **kwargs):
+    """
+    Ajusta los contadores de ProgresoCategoria cuando el ejercicio cambia de
+    bloque o de categoría, se activa o se desactiva, o cambia de código.
+    Un ejercicio nuevo cuenta para quien ya tuviera realizado su código.
+    """
+    anterior = getattr(instance, '_contador_anterior', None)
+    nueva = _clave_actual(instance)
+    if created or not anterior:
+        reubicar_ejercicio(instance.codigo, None, nueva)
+        return
+    codigo, clave = anterior
+    if codigo == instance.codigo:
+        reubicar_ejercicio(codigo, clave, nueva)
+    else:
+        reubicar_ejercicio(codigo, clave, None)
+        reubicar_ejercicio(instance.codigo, None, nueva)
+
+
+@receiver(post_delete, sender=Ejercicio)
+def ejercicio_eliminado(sender, instance, **kwargs):
+    """Descuenta el ejercicio borrado de los contadores."""
+    reubicar_ejercicio(instance.codigo, _clave_actual(instance), None)
+
+
+@receiver(pre_save, sender=CategoriaEjercicio)
+def categoria_renombrada(sender, instance, **kwargs):
+    """Los contadores van por código de categoría: si cambia, se renombran."""
+    if not instance.pk:
+        return
+    anterior = CategoriaEjercicio.objects.filter(pk=instance.pk).values_list('codigo', flat=True).first()
+    if anterior and anterior != instance.codigo:
+        ProgresoCategoria.objects.filter(categoria_codigo=anterior).update(categoria_codigo=instance.codigo)
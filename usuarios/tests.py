@@ -1,3 +1,695 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from unittest import skipIf, skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, modify_settings, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ejercicios.models import CategoriaEjercicio, Ejercicio
+
+from .contadores import registrar_realizado, resumen_usuario
+from .models import EjercicioRealizado, EmailOutbox, ProgresoCategoria, Usuario
+
+
+def crear_usuario(email='usuario@ejemplo.com', **extra):
+    return Usuario.objects.create_user(email, 'Nombre', 'Apellidos', 'clave-de-prueba-123', **extra)
+
+
+# Los catálogos se releen en cada petición: los tests no confirman transacciones.
+# Sin el middleware de actividad no queda nada pendiente al terminar.
+SIN_ACTIVIDAD = modify_settings(MIDDLEWARE={'remove': 'usuarios.middleware.UserActivityMiddleware'})
+
+
+@SIN_ACTIVIDAD
+@override_settings(REVISION_VERSION_DATOS=0)
+class ProgresoBloquesTests(TestCase):
+
+    def setUp(self):
+        self.usuario = crear_usuario()
+        self.categoria = CategoriaEjercicio.objects.create(codigo='EL', nombre='Lectura', descripcion='')
+        self.el1 = self._ejercicio('EL1', bloque=1)
+        self.el2 = self._ejercicio('EL2', bloque=1)
+
+    def _ejercicio(self, codigo, bloque):
+        return Ejercicio.objects.create(
+            categoria=self.categoria, codigo=codigo, nombre=codigo, descripcion='', instrucciones='',
+            nivel=1, bloque=bloque
+        )
+
+    def _realizar(self, ejercicio):
+        EjercicioRealizado.objects.create(usuario=self.usuario, ejercicio_codigo=ejercicio.codigo)
+        registrar_realizado(self.usuario, ejercicio.codigo)
+
+    def _progreso_bloques(self):
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('ejercicios:mi_progreso'))
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.context['progreso_bloques']
+
+    def test_ejercicio_desactivado_no_completa_el_bloque(self):
+        antiguo = self._ejercicio('EL9', bloque=1)
+        self._realizar(antiguo)
+        self._realizar(self.el1)
+        antiguo.activo = False
+        antiguo.save()
+
+        bloque = self._progreso_bloques()[1]
+        self.assertEqual((bloque['realizados'], bloque['total']), (1, 2))
+        self.assertFalse(bloque['completado'])
+
+        self._realizar(self.el2)
+        self.assertTrue(self._progreso_bloques()[1]['completado'])
+
+    def test_ejercicio_movido_cuenta_en_su_bloque_actual(self):
+        self._realizar(self.el1)
+        self.el1.bloque = 2
+        self.el1.save()
+
+        bloques = self._progreso_bloques()
+        self.assertEqual(bloques[1]['realizados'], 0)
+        self.assertEqual((bloques[2]['realizados'], bloques[2]['total']), (1, 1))
+        self.assertTrue(bloques[2]['completado'])
+
+        # Los contadores se han movido con el ejercicio
+        self.assertEqual(resumen_usuario(self.usuario)['por_bloque'], {1: 0, 2: 1})
+        self.assertFalse(ProgresoCategoria.objects.filter(usuario=self.usuario, bloque=1, realizados__gt=0).exists())
+
+    def test_contadores_solo_cuentan_ejercicios_activos(self):
+        from .utils import obtener_estadisticas_usuario
+
+        self._realizar(self.el1)
+        self._realizar(self.el2)
+        self.el2.activo = False
+        self.el2.save()
+        self.assertEqual(resumen_usuario(self.usuario)['total'], 1)
+        self.assertEqual(obtener_estadisticas_usuario(self.usuario)['ejercicios_realizados'], 1)
+        self.assertEqual(EjercicioRealizado.objects.estadisticas_usuario(self.usuario)['total_ejercicios'], 1)
+        self.assertEqual(self._progreso_bloques()[1]['realizados'], 1)
+
+        self.el2.activo = True
+        self.el2.save()
+        self.assertEqual(resumen_usuario(self.usuario)['por_categoria'], {'EL': 2})
+
+    def test_codigo_sin_ejercicio_cuenta_al_crearlo(self):
+        EjercicioRealizado.objects.create(usuario=self.usuario, ejercicio_codigo='EL7')
+        registrar_realizado(self.usuario, 'EL7')
+        self.assertEqual(resumen_usuario(self.usuario)['total'], 0)
+
+        el7 = self._ejercicio('EL7', bloque=3)
+        self.assertEqual(resumen_usuario(self.usuario)['por_bloque'], {3: 1})
+        el7.delete()
+        self.assertEqual(resumen_usuario(self.usuario)['total'], 0)
+
+    def test_categoria_renombrada_conserva_los_contadores(self):
+        self._realizar(self.el1)
+        self.categoria.codigo = 'LR'
+        self.categoria.save()
+        self.assertEqual(resumen_usuario(self.usuario)['por_categoria'], {'LR': 1})
+
+    def test_mi_progreso_lee_los_contadores(self):
+        self._realizar(self.el1)
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('ejercicios:mi_progreso'))
+        # Sesión, usuario, versión del catálogo, contadores y últimos realizados
+        with self.assertNumQueries(5):
+            respuesta = self.client.get(reverse('ejercicios:mi_progreso'))
+        self.assertEqual(respuesta.context['total_ejercicios_realizados'], 1)
+        self.assertEqual(respuesta.context['progreso_por_categoria']['EL']['realizados'], 1)
+
+
+@skipIf(connection.vendor == 'sqlite', "SQLite en memoria bloquea la tabla entera con escrituras simultáneas")
+class CrearUsuarioConcurrenteTests(TransactionTestCase):
+    """Altas simultáneas con la misma parte local del email."""
+
+    HILOS = 8
+
+    def test_usernames_unicos_con_altas_simultaneas(self):
+        barrera = threading.Barrier(self.HILOS)
+        errores = []
+
+        def alta(indice):
+            try:
+                barrera.wait()
+                crear_usuario(f'info@dominio{indice}.com')
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=alta, args=(indice,)) for indice in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        usernames = list(Usuario.objects.values_list('username', flat=True))
+        self.assertEqual(len(usernames), self.HILOS)
+        self.assertEqual(len(set(usernames)), self.HILOS)
+        self.assertTrue(all(username.startswith('info') for username in usernames))
+
+
+class CrearUsuarioConsultasTests(TestCase):
+
+    def test_alta_sin_colision_acota_las_consultas(self):
+        crear_usuario('otro@ejemplo.com')
+        # Usernames ocupados e INSERT del usuario; la signal de alta reserva la
+        # clave de la bienvenida y la encola (dos INSERT). El resto son
+        # savepoints de create_user, despachar y _reservar.
+        with self.assertNumQueries(10):
+            usuario = crear_usuario('nuevo@ejemplo.com')
+        self.assertEqual(usuario.username, 'nuevo')
+
+
+class PoliticasRutasTests(TestCase):
+
+    def _patrones(self, resolver=None, espacio=''):
+        """(nombre, patrón) de todas las rutas de la URLconf salvo el admin."""
+        from django.urls import URLPattern, get_resolver
+        from .politicas import ESPACIOS_EXCLUIDOS
+
+        for patron in (resolver or get_resolver()).url_patterns:
+            if isinstance(patron, URLPattern):
+                yield (f'{espacio}{patron.name}' if patron.name else None), patron
+            elif patron.namespace not in ESPACIOS_EXCLUIDOS:
+                prefijo = f'{espacio}{patron.namespace}:' if patron.namespace else espacio
+                yield from self._patrones(patron, prefijo)
+
+    def test_todas_las_rutas_tienen_politica(self):
+        from .politicas import POLITICAS
+
+        patrones = list(self._patrones())
+        self.assertTrue(patrones)
+        for nombre, patron in patrones:
+            with self.subTest(ruta=str(patron.pattern)):
+                # Sin nombre el middleware no podría encontrar su política
+                self.assertIsNotNone(nombre)
+                self.assertIn(nombre, POLITICAS)
+
+    def test_sin_errores_de_check(self):
+        from .politicas import comprobar_politicas
+
+        self.assertEqual(comprobar_politicas(), [])
+
+
+@SIN_ACTIVIDAD
+@override_settings(REVISION_VERSION_DATOS=0)
+class PlanAccessMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.usuario = crear_usuario()
+        self.gestor = crear_usuario('gestor@ejemplo.com', tipo_usuario='gestor')
+        categoria = CategoriaEjercicio.objects.create(codigo='EL', nombre='Lectura', descripcion='')
+        self.ejercicio_pro = Ejercicio.objects.create(
+            categoria=categoria, codigo='EL4', nombre='EL4', descripcion='', instrucciones='',
+            nivel=4, bloque=1
+        )
+
+    def _mensajes(self, respuesta):
+        return [(mensaje.level, str(mensaje)) for mensaje in respuesta.wsgi_request._messages]
+
+    def test_ruta_de_gestor_redirige_al_dashboard(self):
+        from django.contrib import messages
+
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('usuarios:gestionar_usuarios'))
+        self.assertRedirects(respuesta, reverse('usuarios:dashboard'), fetch_redirect_response=False)
+        self.assertEqual(
+            self._mensajes(respuesta),
+            [(messages.ERROR, 'No tienes permisos para acceder a esta página.')]
+        )
+
+    def test_ejercicio_pro_redirige_al_dashboard(self):
+        from django.contrib import messages
+
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('ejercicios:detalle', args=[self.ejercicio_pro.pk]))
+        self.assertRedirects(respuesta, reverse('usuarios:dashboard'), fetch_redirect_response=False)
+        self.assertEqual(
+            self._mensajes(respuesta),
+            [(messages.WARNING, 'Esta funcionalidad requiere un plan Pro.')]
+        )
+
+    def test_ruta_ajax_deniega_con_json(self):
+        self.client.force_login(self.usuario)
+        respuesta = self.client.post(reverse('usuarios:buscar_usuarios'), {'busqueda': 'nombre'})
+        self.assertEqual(respuesta.status_code, 403)
+        self.assertEqual(respuesta.json(), {'error': 'No tienes permisos para acceder a esta página.'})
+
+    def test_gestor_y_pro_pasan(self):
+        self.client.force_login(self.gestor)
+        self.assertEqual(self.client.post(reverse('usuarios:buscar_usuarios'), {'busqueda': ''}).status_code, 200)
+
+        self.usuario.plan = 'pro'
+        self.usuario.save()
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('ejercicios:detalle', args=[self.ejercicio_pro.pk]))
+        self.assertNotEqual(respuesta.get('Location'), reverse('usuarios:dashboard'))
+
+
+class RegistroActividadTests(TestCase):
+
+    def setUp(self):
+        from .actividad import RegistroActividad
+
+        self.usuario = crear_usuario()
+        self.registro = RegistroActividad()
+
+    def _ultima_actividad(self):
+        self.usuario.refresh_from_db()
+        return self.usuario.ultima_actividad
+
+    @override_settings(INTERVALO_ACTIVIDAD=300)
+    def test_acumula_hasta_el_intervalo_y_vuelca_en_una_sentencia(self):
+        momento = timezone.now()
+        with self.assertNumQueries(0):
+            self.registro.registrar(self.usuario.pk, momento - timedelta(seconds=1))
+            self.registro.registrar(self.usuario.pk, momento)
+        self.assertIsNone(self._ultima_actividad())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.registro.volcar(), 1)
+        self.assertEqual(self._ultima_actividad(), momento)
+        self.assertEqual(
+            self.registro.metricas(),
+            {'registros': 2, 'escrituras': 1, 'evitadas': 1, 'pendientes': 0}
+        )
+
+    @override_settings(INTERVALO_ACTIVIDAD=0)
+    def test_vuelca_al_cumplirse_el_intervalo(self):
+        self.registro.registrar(self.usuario.pk)
+        self.assertIsNotNone(self._ultima_actividad())
+        self.assertEqual(self.registro.metricas()['pendientes'], 0)
+
+    def test_no_retrasa_ni_toca_last_login(self):
+        from django.contrib.auth.tokens import default_token_generator
+
+        momento = timezone.now()
+        Usuario.objects.filter(pk=self.usuario.pk).update(ultima_actividad=momento, last_login=momento)
+        self.usuario.refresh_from_db()
+        token = default_token_generator.make_token(self.usuario)
+
+        self.registro.registrar(self.usuario.pk, momento - timedelta(minutes=5))
+        self.registro.volcar()
+        self.assertEqual(self._ultima_actividad(), momento)
+
+        self.registro.registrar(self.usuario.pk, momento + timedelta(minutes=5))
+        self.registro.volcar()
+        self.assertEqual(self._ultima_actividad(), momento + timedelta(minutes=5))
+        self.assertEqual(self.usuario.last_login, momento)
+        self.assertTrue(default_token_generator.check_token(self.usuario, token))
+
+    def test_alternativa_case(self):
+        otro = crear_usuario('otro@ejemplo.com')
+        momento = timezone.now()
+        self.registro._actualizar_case({self.usuario.pk: momento, otro.pk: momento - timedelta(minutes=1)})
+        self.assertEqual(self._ultima_actividad(), momento)
+        otro.refresh_from_db()
+        self.assertEqual(otro.ultima_actividad, momento - timedelta(minutes=1))
+
+    def test_sql_values(self):
+        from .actividad import sql_actualizar_values
+
+        momento = timezone.now()
+        sql, parametros = sql_actualizar_values({self.usuario.pk: momento, 7: momento})
+        self.assertIn('FROM (VALUES (%s, %s::timestamptz), (%s, %s::timestamptz)) AS v(id, momento)', sql)
+        self.assertIn('SET ultima_actividad = v.momento', sql)
+        self.assertNotIn('last_login', sql)
+        self.assertEqual(parametros, [self.usuario.pk, momento, 7, momento])
+
+    @skipUnless(connection.vendor == 'postgresql', "UPDATE ... FROM (VALUES ...) solo en PostgreSQL")
+    def test_values_en_postgresql(self):
+        otro = crear_usuario('otro@ejemplo.com')
+        momento = timezone.now()
+        Usuario.objects.filter(pk=otro.pk).update(ultima_actividad=momento)
+
+        self.registro._actualizar_values({self.usuario.pk: momento, otro.pk: momento - timedelta(minutes=1)})
+        self.assertEqual(self._ultima_actividad(), momento)
+        otro.refresh_from_db()
+        self.assertEqual(otro.ultima_actividad, momento)
+
+
+class ConexionFalsa:
+    """Conexión de correo que falla al abrir o al enviar."""
+
+    def __init__(self, fallo_al_abrir=False):
+        self.fallo_al_abrir = fallo_al_abrir
+
+    def open(self):
+        if self.fallo_al_abrir:
+            raise ConnectionRefusedError('SMTP caído')
+
+    def close(self):
+        pass
+
+    def send_messages(self, mensajes):
+        raise OSError('buzón lleno')
+
+
+class OutboxTests(TestCase):
+
+    def _encolar(self, asunto='Asunto', **campos):
+        from .outbox import encolar_email
+
+        fila = encolar_email(asunto, 'Texto', ['destino@ejemplo.com'])
+        if campos:
+            EmailOutbox.objects.filter(pk=fila.pk).update(**campos)
+        return fila
+
+    def test_reclamar_reserva_el_lote(self):
+        from .outbox import RESERVA_LOTE, reclamar_lote
+
+        primero, segundo = self._encolar('1'), self._encolar('2')
+        self._encolar('futuro', proximo_intento=timezone.now() + timedelta(hours=1))
+
+        lote = reclamar_lote(tamano=1)
+        self.assertEqual([fila.pk for fila in lote], [primero.pk])
+        self.assertEqual(lote[0].intentos, 1)
+        self.assertGreater(lote[0].proximo_intento, timezone.now() + RESERVA_LOTE - timedelta(seconds=5))
+
+        # Lo reservado y lo programado para más tarde no se vuelve a reclamar
+        self.assertEqual([fila.pk for fila in reclamar_lote()], [segundo.pk])
+        self.assertEqual(reclamar_lote(), [])
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_envio_correcto(self):
+        from django.core import mail
+        from .outbox import enviar_lote
+
+        fila = self._encolar()
+        resultado = enviar_lote()
+        self.assertEqual(resultado['enviados'], 1)
+        self.assertEqual(len(mail.outbox), 1)
+        fila.refresh_from_db()
+        self.assertEqual((fila.estado, fila.intentos), ('enviado', 1))
+
+    def test_fallo_de_envio_se_reintenta_con_espera_exponencial(self):
+        from .outbox import enviar_lote, espera_reintento
+
+        fila = self._encolar(intentos=2)
+        antes = timezone.now()
+        resultado = enviar_lote(conexion=ConexionFalsa())
+        self.assertEqual((resultado['reintentos'], resultado['fallidos']), (1, 0))
+
+        fila.refresh_from_db()
+        self.assertEqual((fila.estado, fila.intentos), ('pendiente', 3))
+        self.assertEqual(espera_reintento(3), timedelta(minutes=4))
+        self.assertAlmostEqual(
+            (fila.proximo_intento - antes).total_seconds(), espera_reintento(3).total_seconds(), delta=5
+        )
+        self.assertIn('buzón lleno', fila.ultimo_error)
+
+    def test_espera_maxima(self):
+        from .outbox import ESPERA_MAXIMA, espera_reintento
+
+        self.assertEqual(espera_reintento(1), timedelta(minutes=1))
+        self.assertEqual(espera_reintento(20), ESPERA_MAXIMA)
+
+    def test_tras_max_intentos_queda_fallido(self):
+        from .outbox import MAX_INTENTOS, enviar_lote, metricas
+
+        fila = self._encolar(intentos=MAX_INTENTOS - 1)
+        resultado = enviar_lote(conexion=ConexionFalsa())
+        self.assertEqual((resultado['reintentos'], resultado['fallidos']), (0, 1))
+
+        fila.refresh_from_db()
+        self.assertEqual((fila.estado, fila.intentos), ('fallido', MAX_INTENTOS))
+        self.assertEqual(enviar_lote(conexion=ConexionFalsa()), {
+            'enviados': 0, 'reintentos': 0, 'fallidos': 0, 'liberados': 0, 'segundos': 0.0
+        })
+        self.assertEqual(metricas()['fallidos'], 1)
+
+    def test_sin_conexion_libera_el_lote_sin_gastar_intentos(self):
+        from .outbox import ESPERA_BASE, MAX_INTENTOS, enviar_lote
+
+        # En el último intento: si la caída gastara un intento, pasaría a 'fallido'
+        fila = self._encolar(intentos=MAX_INTENTOS - 1)
+        antes = timezone.now()
+        resultado = enviar_lote(conexion=ConexionFalsa(fallo_al_abrir=True))
+        self.assertEqual(
+            (resultado['liberados'], resultado['reintentos'], resultado['fallidos']), (1, 0, 0)
+        )
+
+        fila.refresh_from_db()
+        self.assertEqual((fila.estado, fila.intentos), ('pendiente', MAX_INTENTOS - 1))
+        self.assertAlmostEqual(
+            (fila.proximo_intento - antes).total_seconds(), ESPERA_BASE.total_seconds(), delta=5
+        )
+        self.assertIn('SMTP caído', fila.ultimo_error)
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_lote_de_un_worker_caido_se_reenvia_al_caducar_la_reserva(self):
+        from django.core import mail
+        from .outbox import enviar_lote, reclamar_lote
+
+        # El worker reclama el lote y muere tras entregarlo, sin marcarlo enviado
+        fila = self._encolar()
+        reclamar_lote()
+        self.assertEqual(enviar_lote()['enviados'], 0)
+
+        # Pasada RESERVA_LOTE, otro worker lo vuelve a enviar
+        EmailOutbox.objects.filter(pk=fila.pk).update(proximo_intento=timezone.now())
+        self.assertEqual(enviar_lote()['enviados'], 1)
+        self.assertEqual(len(mail.outbox), 1)
+        fila.refresh_from_db()
+        self.assertEqual((fila.estado, fila.intentos), ('enviado', 2))
+
+
+@skipUnless(connection.features.has_select_for_update_skip_locked, "Requiere SELECT ... FOR UPDATE SKIP LOCKED")
+class OutboxConcurrenteTests(TransactionTestCase):
+
+    def test_skip_locked_reparte_filas_entre_workers(self):
+        from django.db import transaction
+        from .outbox import encolar_email, reclamar_lote
+
+        filas = [encolar_email(str(indice), 'Texto', ['destino@ejemplo.com']) for indice in range(4)]
+        bloqueadas = threading.Event()
+        terminar = threading.Event()
+
+        def otro_worker():
+            # Bloquea las dos primeras filas como si estuviera reclamándolas
+            try:
+                with transaction.atomic():
+                    list(EmailOutbox.objects.select_for_update().filter(pk__in=[filas[0].pk, filas[1].pk]))
+                    bloqueadas.set()
+                    terminar.wait(10)
+            finally:
+                connection.close()
+
+        hilo = threading.Thread(target=otro_worker)
+        hilo.start()
+        try:
+            self.assertTrue(bloqueadas.wait(10))
+            lote = reclamar_lote()
+        finally:
+            terminar.set()
+            hilo.join()
+        self.assertEqual([fila.pk for fila in lote], [filas[2].pk, filas[3].pk])
+
+
+@SIN_ACTIVIDAD
+class NotificacionesTests(TestCase):
+
+    def setUp(self):
+        self.usuario = crear_usuario()
+        self.gestor = crear_usuario('gestor@ejemplo.com', tipo_usuario='gestor')
+
+    def _emails(self, asunto):
+        return EmailOutbox.objects.filter(destinatarios=[self.usuario.email], asunto__contains=asunto).count()
+
+    def test_aprobar_solicitud_notifica_una_vez(self):
+        from .models import SolicitudCambioPlan
+        from .notificaciones import metricas_notificaciones
+
+        solicitud = SolicitudCambioPlan.objects.create(usuario=self.usuario, tipo_solicitud='solicitar_pro')
+        antes = metricas_notificaciones()
+
+        self.client.force_login(self.gestor)
+        respuesta = self.client.post(
+            reverse('usuarios:procesar_solicitud_plan'), {'solicitud_id': solicitud.pk, 'accion': 'aprobar'}
+        )
+        self.assertEqual(respuesta.status_code, 200)
+
+        # La vista encola el resultado y la signal de cambio de plan se suprime
+        self.assertEqual(self._emails('Plan actualizado'), 0)
+        self.assertEqual(self._emails('Tu plan ha sido actualizado'), 1)
+        despues = metricas_notificaciones()
+        self.assertEqual(despues['encoladas'] - antes['encoladas'], 1)
+        self.assertEqual(despues['suprimidas'] - antes['suprimidas'], 1)
+
+    def test_deduplica_sin_depender_de_la_cache(self):
+        from django.core.cache import cache
+        from .notificaciones import notificar_cambio_plan
+
+        self.assertTrue(notificar_cambio_plan(self.usuario, 'gratuito', 'pro'))
+        # Otro proceso no comparte la caché local
+        cache.clear()
+        self.assertFalse(notificar_cambio_plan(self.usuario, 'gratuito', 'pro'))
+        self.assertEqual(self._emails('actualizado a Pro'), 1)
+
+    def test_pasada_la_ventana_se_vuelve_a_notificar(self):
+        from .models import NotificacionEnviada
+        from .notificaciones import VENTANA_DEDUPLICACION, clave_idempotencia, notificar_cambio_plan
+
+        notificar_cambio_plan(self.usuario, 'gratuito', 'pro')
+        NotificacionEnviada.objects.filter(
+            clave=clave_idempotencia('cambio_plan', self.usuario.pk, 'gratuito>pro')
+        ).update(fecha=timezone.now() - timedelta(seconds=VENTANA_DEDUPLICACION + 1))
+
+        self.assertTrue(notificar_cambio_plan(self.usuario, 'gratuito', 'pro'))
+        self.assertEqual(self._emails('actualizado a Pro'), 2)
+
+    def test_transaccion_deshecha_libera_la_clave(self):
+        from django.db import transaction
+        from .notificaciones import notificar_cambio_plan
+
+        try:
+            with transaction.atomic():
+                self.assertTrue(notificar_cambio_plan(self.usuario, 'gratuito', 'pro'))
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self._emails('actualizado a Pro'), 0)
+        self.assertTrue(notificar_cambio_plan(self.usuario, 'gratuito', 'pro'))
+
+
+@skipIf(connection.vendor == 'sqlite', "SQLite en memoria bloquea la tabla entera con escrituras simultáneas")
+class NotificacionesConcurrentesTests(TransactionTestCase):
+
+    def test_misma_notificacion_desde_varios_procesos(self):
+        from .notificaciones import notificar_cambio_plan
+
+        usuario = crear_usuario()
+        barrera = threading.Barrier(4)
+        resultados = []
+
+        def notificar():
+            try:
+                barrera.wait()
+                resultados.append(notificar_cambio_plan(usuario, 'gratuito', 'pro'))
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=notificar) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(sorted(resultados), [False, False, False, True])
+        self.assertEqual(EmailOutbox.objects.filter(asunto__contains='actualizado a Pro').count(), 1)
+
+
+class NotificacionSolicitudesTests(TestCase):
+
+    def setUp(self):
+        self.usuario = crear_usuario()
+        self.gestores = [
+            crear_usuario(f'gestor{indice}@ejemplo.com', tipo_usuario='gestor') for indice in range(2)
+        ]
+
+    def _solicitud(self):
+        from .models import SolicitudCambioPlan
+
+        return SolicitudCambioPlan.objects.create(usuario=self.usuario, tipo_solicitud='solicitar_pro')
+
+    def _resumenes(self):
+        return EmailOutbox.objects.filter(asunto__contains='nueva(s) solicitud(es)')
+
+    @override_settings(NOTIFICACION_SOLICITUDES='inmediato')
+    def test_modo_inmediato_avisa_al_crear(self):
+        from .notificaciones import notificar_nueva_solicitud
+
+        self.assertTrue(notificar_nueva_solicitud(self._solicitud()))
+        aviso = EmailOutbox.objects.get(asunto__startswith='Nueva solicitud')
+        self.assertEqual(sorted(aviso.destinatarios), [gestor.email for gestor in self.gestores])
+
+    @override_settings(NOTIFICACION_SOLICITUDES='resumen')
+    def test_modo_resumen_un_email_por_gestor_y_ejecucion(self):
+        from .notificaciones import notificar_nueva_solicitud, notificar_resumen_solicitudes
+
+        desde = timezone.now() - timedelta(hours=1)
+        primera = self._solicitud()
+        self.assertFalse(notificar_nueva_solicitud(primera))
+        self.assertFalse(EmailOutbox.objects.filter(asunto__startswith='Nueva solicitud').exists())
+
+        self.assertEqual(notificar_resumen_solicitudes(desde), 2)
+        # Una ejecución solapada (o el cron siguiente) no repite el resumen
+        self.assertEqual(notificar_resumen_solicitudes(desde), 0)
+        self.assertEqual(self._resumenes().count(), 2)
+
+        segunda = self._solicitud()
+        self.assertEqual(notificar_resumen_solicitudes(timezone.now()), 2)
+        self.assertEqual(self._resumenes().count(), 4)
+        for gestor in self.gestores:
+            self.assertEqual(gestor.resumen_solicitudes.ultima_solicitud, segunda.pk)
+        self.assertGreater(segunda.pk, primera.pk)
+
+    @override_settings(NOTIFICACION_SOLICITUDES='resumen')
+    def test_resumen_no_retrocede_la_marca(self):
+        from .models import ResumenSolicitudesGestor
+        from .notificaciones import notificar_resumen_solicitudes
+
+        solicitud = self._solicitud()
+        for gestor in self.gestores:
+            # Otro proceso ya envió este resumen
+            ResumenSolicitudesGestor.objects.create(gestor=gestor, ultima_solicitud=solicitud.pk)
+        self.assertEqual(notificar_resumen_solicitudes(timezone.now() - timedelta(hours=1)), 0)
+        self.assertFalse(self._resumenes().exists())
+
+
+class BusquedaUsuariosTests(TestCase):
+
+    def setUp(self):
+        self.jose = crear_usuario('jose.nunez@ejemplo.com')
+        Usuario.objects.filter(pk=self.jose.pk).update(nombre='José', apellidos='Núñez González')
+        self.angel = crear_usuario('angel@correo.es')
+        Usuario.objects.filter(pk=self.angel.pk).update(nombre='Ángel', apellidos='Ibáñez')
+
+    def _buscar(self, termino, queryset=None, prefijo=''):
+        from .busqueda import filtrar_busqueda
+
+        return set(filtrar_busqueda(Usuario.objects.all() if queryset is None else queryset, termino, prefijo))
+
+    def test_sin_tildes_ni_mayusculas(self):
+        self.assertEqual(self._buscar('jose'), {self.jose})
+        self.assertEqual(self._buscar('NUÑEZ'), {self.jose})
+        self.assertEqual(self._buscar('gonzalez'), {self.jose})
+        self.assertEqual(self._buscar('ángel'), {self.angel})
+        self.assertEqual(self._buscar('ANGEL'), {self.angel})
+        self.assertEqual(self._buscar('ibanez'), {self.angel})
+
+    def test_prefijos_y_fragmentos(self):
+        self.assertEqual(self._buscar('Gonz'), {self.jose})
+        self.assertEqual(self._buscar('  ib '), {self.angel})
+        self.assertEqual(self._buscar('angel@corr'), {self.angel})
+        self.assertEqual(self._buscar('ejemplo.com'), {self.jose})
+        self.assertEqual(self._buscar('inexistente'), set())
+
+    def test_termino_vacio_no_filtra(self):
+        self.assertEqual(self._buscar('   '), set(Usuario.objects.all()))
+
+    def test_a_traves_de_una_relacion(self):
+        from .models import SolicitudCambioPlan
+
+        solicitud = SolicitudCambioPlan.objects.create(usuario=self.angel, tipo_solicitud='solicitar_pro')
+        self.assertEqual(self._buscar('angel', SolicitudCambioPlan.objects.all(), 'usuario__'), {solicitud})
+
+    def test_buscar_usuarios_ordena(self):
+        from .busqueda import buscar_usuarios
+
+        self.assertEqual(list(buscar_usuarios(Usuario.objects.all(), 'nunez')), [self.jose])
+
+    @skipUnless(connection.vendor == 'postgresql', "Solo se ordena por relevancia en PostgreSQL")
+    def test_relevancia_solo_entre_los_candidatos_recientes(self):
+        from unittest import mock
+
+        from .busqueda import buscar_usuarios
+
+        tercero = crear_usuario('josefina@otro.es')
+        Usuario.objects.filter(pk=tercero.pk).update(nombre='Josefina', apellidos='Pérez')
+        self.assertEqual(list(buscar_usuarios(Usuario.objects.all(), 'jose')), [self.jose, tercero])
+        with mock.patch('usuarios.busqueda.MAX_CANDIDATOS_RELEVANCIA', 1):
+            self.assertEqual(list(buscar_usuarios(Usuario.objects.all(), 'jose')), [tercero])
@@ -1,5 +1,4 @@
 # usuarios/utils.py
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.urls import reverse
@@ -9,6 +8,8 @@ from django.utils.encoding import force_bytes
 import json
 import random
 import os
+import threading
+import time
 
 import logging
 
@@ -18,6 +19,7 @@ logger = logging.getLogger(__name__)
 def enviar_email_template(usuario, asunto, template_name, contexto_extra=None, fail_silently=True):
     """
     Función genérica para enviar emails usando templates HTML y texto.
+    El email se encola en EmailOutbox y lo envía el comando send_outbox.
     
     Args:
         usuario: Instancia del modelo Usuario
@@ -43,21 +45,15 @@ def enviar_email_template(usuario, asunto, template_name, contexto_extra=None, f
         mensaje_html = render_to_string(f'usuarios/emails/{template_name}.html', contexto)
         mensaje_texto = render_to_string(f'usuarios/emails/{template_name}.txt', contexto)
         
-        # Enviar email
-        send_mail(
-            asunto,
-            mensaje_texto,
-            getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@campayo.com'),
-            [usuario.email],
-            html_message=mensaje_html,
-            fail_silently=fail_silently
-        )
+        # Encolar email
+        from .outbox import encolar_email
+        encolar_email(asunto, mensaje_texto, [usuario.email], html=mensaje_html)
         
-        logger.info(f"Email '{asunto}' enviado exitosamente a {usuario.email}")
+        logger.info(f"Email '{asunto}' encolado para {usuario.email}")
         return True
         
     except Exception as e:
-        logger.error(f"Error enviando email '{asunto}' a {usuario.email}: {e}")
+        logger.error(f"Error encolando email '{asunto}' a {usuario.email}: {e}")
         if not fail_silently:
             raise
         return False
@@ -130,7 +126,8 @@ def obtener_estadisticas_usuario(usuario):
     Returns:
         dict: Diccionario con estadísticas del usuario
     """
-    from .models import ProgresoTests, EjercicioRealizado
+    from .models import ProgresoTests
+    from .contadores import resumen_usuario
     
     # Tests completados
     tests_completados = ProgresoTests.objects.filter(
@@ -144,11 +141,8 @@ def obtener_estadisticas_usuario(usuario):
     if progresos.exists():
         mejor_velocidad = max([p.velocidad_lectura for p in progresos])
     
-    # Ejercicios realizados
-    ejercicios_realizados = EjercicioRealizado.objects.filter(
-        usuario=usuario,
-        realizado=True
-    ).count()
+    # Ejercicios realizados (contadores de ProgresoCategoria)
+    ejercicios_realizados = resumen_usuario(usuario)['total']
     
     # Último test realizado
     ultimo_test = ProgresoTests.objects.filter(
@@ -178,16 +172,11 @@ def filtrar_usuarios_para_gestor(queryset, filtros):
     Returns:
         QuerySet filtrado
     """
-    from django.db.models import Q
+    from .busqueda import filtrar_busqueda
     
     # Filtro por búsqueda de texto
     if filtros.get('busqueda'):
-        busqueda = filtros['busqueda']
-        queryset = queryset.filter(
-            Q(nombre__icontains=busqueda) |
-            Q(apellidos__icontains=busqueda) |
-            Q(email__icontains=busqueda)
-        )
+        queryset = filtrar_busqueda(queryset, filtros['busqueda'])
     
     # Filtro por plan
     if filtros.get('plan'):
@@ -214,45 +203,26 @@ def filtrar_usuarios_para_gestor(queryset, filtros):
 def obtener_resumen_sistema():
     """
     Obtiene un resumen estadístico del sistema para gestores.
+    Lee las estadísticas cacheadas de usuarios.estadisticas.
     
     Returns:
         dict: Estadísticas generales del sistema
     """
-    from .models import Usuario, ProgresoTests, EjercicioRealizado
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    # Usuarios
-    total_usuarios = Usuario.objects.filter(tipo_usuario='usuario').count()
-    usuarios_pro = Usuario.objects.filter(tipo_usuario='usuario', plan='pro').count()
-    usuarios_gratuitos = Usuario.objects.filter(tipo_usuario='usuario', plan='gratuito').count()
-    
-    # Usuarios registrados esta semana
-    hace_una_semana = timezone.now() - timedelta(days=7)
-    usuarios_esta_semana = Usuario.objects.filter(
-        tipo_usuario='usuario',
-        fecha_registro__gte=hace_una_semana
-    ).count()
-    
-    # Tests completados
-    total_tests = ProgresoTests.objects.filter(completado=True).count()
-    tests_esta_semana = ProgresoTests.objects.filter(
-        completado=True,
-        fecha_realizacion__gte=hace_una_semana
-    ).count()
+    from .estadisticas import estadisticas_usuarios, estadisticas_actividad
     
-    # Ejercicios realizados
-    total_ejercicios = EjercicioRealizado.objects.count()
+    usuarios = estadisticas_usuarios()
+    actividad = estadisticas_actividad()
+    total_usuarios = usuarios['total_usuarios']
     
     return {
         'total_usuarios': total_usuarios,
-        'usuarios_pro': usuarios_pro,
-        'usuarios_gratuitos': usuarios_gratuitos,
-        'porcentaje_pro': round((usuarios_pro / total_usuarios * 100), 1) if total_usuarios > 0 else 0,
-        'usuarios_esta_semana': usuarios_esta_semana,
-        'total_tests_completados': total_tests,
-        'tests_esta_semana': tests_esta_semana,
-        'total_ejercicios_realizados': total_ejercicios,
+        'usuarios_pro': usuarios['usuarios_pro'],
+        'usuarios_gratuitos': usuarios['usuarios_gratuitos'],
+        'porcentaje_pro': round((usuarios['usuarios_pro'] / total_usuarios * 100), 1) if total_usuarios > 0 else 0,
+        'usuarios_esta_semana': usuarios['usuarios_esta_semana'],
+        'total_tests_completados': actividad['total_tests_completados'],
+        'tests_esta_semana': actividad['tests_esta_semana'],
+        'total_ejercicios_realizados': actividad['total_ejercicios_realizados'],
     }
 
 
@@ -278,24 +248,81 @@ class EmailTemplates:
         }
         return asuntos.get(template_name, 'Notificación de Campayo')
     
+# Frases de respaldo si no se puede leer frases.json
+FRASES_RESPALDO = (
+    "La velocidad importa, pero la comprensión es el verdadero poder.",
+    "Hoy es un buen día para superar tu récord personal, {nombre}.",
+    "La constancia es la clave del progreso real.",
+    "Tu cerebro es capaz de mucho más de lo que imaginas, {nombre}.",
+    "¡Vamos {nombre}! Hoy puede ser el día en que superes tu mejor marca."
+)
+
+# Segundos entre comprobaciones de la fecha de modificación de frases.json
+INTERVALO_REVISION_FRASES = 60
+
+
+class AlmacenFrases:
+    """
+    Frases motivacionales cargadas una vez por proceso.
+
+    Cada frase se guarda ya partida alrededor de {nombre}, así que
+    personalizarla es un join. El archivo solo se vuelve a leer si cambia su
+    fecha de modificación, y esa fecha se comprueba como mucho una vez cada
+    INTERVALO_REVISION_FRASES segundos: la mayoría de peticiones no tocan disco.
+    """
+
+    def __init__(self):
+        self._frases = None
+        self._partes = None
+        self._mtime = None
+        self._revisado = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _ruta():
+        return os.path.join(settings.STATIC_ROOT or settings.STATICFILES_DIRS[0], 'frases', 'frases.json')
+
+    def _cargar(self):
+        """Lee frases.json si ha cambiado desde la última carga."""
+        try:
+            ruta = self._ruta()
+            mtime = os.stat(ruta).st_mtime_ns
+            if self._frases is not None and mtime == self._mtime:
+                return
+            with open(ruta, 'r', encoding='utf-8') as file:
+                frases = tuple(json.load(file).get('frases', []))
+        except (OSError, json.JSONDecodeError, IndexError, AttributeError) as e:
+            if self._frases is not None and self._mtime is None:
+                return
+            logger.warning(f"FRASES: no se pudo leer frases.json, se usan las de respaldo: {e}")
+            mtime, frases = None, ()
+
+        self._frases = frases or FRASES_RESPALDO
+        self._partes = tuple(tuple(frase.split('{nombre}')) for frase in self._frases)
+        self._mtime = mtime
+
+    def partes(self):
+        """Frases partidas alrededor de {nombre}, revalidando el archivo si toca."""
+        if self._partes is None or time.monotonic() - self._revisado >= INTERVALO_REVISION_FRASES:
+            with self._lock:
+                if self._partes is None or time.monotonic() - self._revisado >= INTERVALO_REVISION_FRASES:
+                    self._cargar()
+                    self._revisado = time.monotonic()
+        return self._partes
+
+    def frases(self):
+        self.partes()
+        return self._frases
+
+
+almacen_frases = AlmacenFrases()
+
+
 def cargar_frases():
     """
-    Carga las frases desde el archivo JSON.
+    Devuelve las frases de frases.json (sin personalizar).
     """
-    try:
-        frases_path = os.path.join(settings.STATIC_ROOT or settings.STATICFILES_DIRS[0], 'frases', 'frases.json')
-        with open(frases_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-            return data.get('frases', [])
-    except (FileNotFoundError, json.JSONDecodeError, IndexError):
-        # Frases de respaldo en caso de error
-        return [
-            "La velocidad importa, pero la comprensión es el verdadero poder.",
-            "Hoy es un buen día para superar tu récord personal, {nombre}.",
-            "La constancia es la clave del progreso real.",
-            "Tu cerebro es capaz de mucho más de lo que imaginas, {nombre}.",
-            "¡Vamos {nombre}! Hoy puede ser el día en que superes tu mejor marca."
-        ]
+    return list(almacen_frases.frases())
 
 
 def personalizar_frase(frase, nombre_usuario):
@@ -322,9 +349,7 @@ def obtener_frase_aleatoria(nombre_usuario):
     Returns:
         str: Una frase personalizada y aleatoria
     """
-    frases = cargar_frases()
-    frase_aleatoria = random.choice(frases)
-    return personalizar_frase(frase_aleatoria, nombre_usuario)
+    return nombre_usuario.join(random.choice(almacen_frases.partes()))
 
 
 def obtener_frases_personalizadas(nombre_usuario, cantidad=5):
@@ -338,6 +363,5 @@ def obtener_frases_personalizadas(nombre_usuario, cantidad=5):
     Returns:
         list: Lista de frases personalizadas
     """
-    frases = cargar_frases()
-    frases_seleccionadas = random.sample(frases, min(cantidad, len(frases)))
-    return [personalizar_frase(frase, nombre_usuario) for frase in frases_seleccionadas]
\ No newline at end of file
+    partes = almacen_frases.partes()
+    return [nombre_usuario.join(frase) for frase in random.sample(partes, min(cantidad, len(partes)))]
@@ -6,8 +6,6 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import PasswordResetView, PasswordResetConfirmView
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
-from django.db.models import Q
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
@@ -16,8 +14,8 @@ from django.contrib.auth.tokens import default_token_generator
 from django.urls import reverse_lazy, reverse
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
-from django.core.paginator import Paginator
 from django.utils import timezone
+from django.db import transaction
 import json
 
 from .models import Usuario, ProgresoTests, SolicitudCambioPlan
@@ -26,7 +24,17 @@ from .forms import (
     RecuperarPasswordForm, BuscarUsuarioForm, CambiarPlanForm
 )
 from .decorators import usuario_no_autenticado_required
-from .utils import obtener_frase_aleatoria
+from .utils import obtener_frase_aleatoria, filtrar_usuarios_para_gestor
+from .busqueda import buscar_usuarios, filtrar_busqueda
+from .paginacion import paginar_keyset, contar_cacheado, CursorInvalido
+from .estadisticas import estadisticas_usuarios, estadisticas_solicitudes
+from .notificaciones import (
+    notificar_bienvenida, notificar_cambio_plan, notificar_nueva_solicitud, notificar_resultado_solicitud
+)
+
+# Tamaño de página de los listados de gestión
+USUARIOS_POR_PAGINA = 20
+SOLICITUDES_POR_PAGINA = 15
 
 logger = logging.getLogger(__name__)
 
@@ -50,7 +58,7 @@ def registro_view(request):
             user = form.save()
             
             # Enviar email de bienvenida
-            enviar_email_bienvenida(user)
+            notificar_bienvenida(user)
             
             # Hacer login automático
             login(request, user)
@@ -151,12 +159,7 @@ def dashboard_view(request):
     if usuario.es_gestor():
         logger.info("Rendering GESTOR dashboard")
         # Dashboard para gestores
-        total_usuarios = Usuario.objects.filter(tipo_usuario='usuario').count()
-        usuarios_pro = Usuario.objects.filter(tipo_usuario='usuario', plan='pro').count()
-        usuarios_gratuitos = Usuario.objects.filter(tipo_usuario='usuario', plan='gratuito').count()
-        
-        # Contar solicitudes pendientes
-        solicitudes_pendientes = SolicitudCambioPlan.objects.filter(estado='pendiente').count()
+        stats_usuarios = estadisticas_usuarios()
         
         # Usuarios recientes (iniciales - se cargan con HTMX después)
         usuarios_recientes = Usuario.objects.filter(
@@ -165,12 +168,12 @@ def dashboard_view(request):
         
         context = {
             'es_gestor': True,
-            'total_usuarios': total_usuarios,
-            'usuarios_pro': usuarios_pro,
-            'usuarios_gratuitos': usuarios_gratuitos,
+            'total_usuarios': stats_usuarios['total_usuarios'],
+            'usuarios_pro': stats_usuarios['usuarios_pro'],
+            'usuarios_gratuitos': stats_usuarios['usuarios_gratuitos'],
             'usuarios': usuarios_recientes,  # Para la carga inicial
             'busqueda': '',
-            'solicitudes_pendientes': solicitudes_pendientes,
+            'solicitudes_pendientes': estadisticas_solicitudes()['pendientes'],
         }
         logger.info(f"Context for gestor: {context}")
     else:
@@ -241,7 +244,7 @@ def solicitar_cambio_plan_view(request):
     )
     
     # Enviar email a gestores
-    enviar_email_nueva_solicitud_gestor(solicitud)
+    notificar_nueva_solicitud(solicitud)
     
     # Respuesta exitosa
     return JsonResponse({
@@ -315,15 +318,17 @@ def procesar_solicitud_plan_view(request):
                 usuario.plan = 'pro'
             else:  # volver_gratuito
                 usuario.plan = 'gratuito'
-            usuario.save()
             
             # Marcar solicitud como procesada
             solicitud.estado = 'procesada'
             solicitud.procesada_por = request.user
-            solicitud.save()
             
-            # Enviar email al usuario sobre aprobación
-            enviar_email_resultado_solicitud_usuario(solicitud, aprobada=True)
+            with transaction.atomic():
+                # Enviar email al usuario sobre aprobación antes de guardar,
+                # para que sustituya al de cambio de plan de la signal
+                notificar_resultado_solicitud(solicitud, aprobada=True)
+                usuario.save()
+                solicitud.save()
             
             mensaje = f'Plan cambiado a {usuario.get_plan_display()} para {usuario.nombre_completo}'
             
@@ -333,7 +338,7 @@ def procesar_solicitud_plan_view(request):
             solicitud.save()
             
             # Enviar email al usuario sobre rechazo
-            enviar_email_resultado_solicitud_usuario(solicitud, aprobada=False)
+            notificar_resultado_solicitud(solicitud, aprobada=False)
             
             mensaje = f'Solicitud rechazada para {solicitud.usuario.nombre_completo}'
         
@@ -377,38 +382,42 @@ def gestionar_solicitudes_view(request):
         solicitudes = solicitudes.filter(tipo_solicitud=filtro_tipo)
     
     if busqueda:
-        solicitudes = solicitudes.filter(
-            Q(usuario__nombre__icontains=busqueda) |
-            Q(usuario__apellidos__icontains=busqueda) |
-            Q(usuario__email__icontains=busqueda)
-        )
+        solicitudes = filtrar_busqueda(solicitudes, busqueda, prefijo='usuario__')
     
-    # Ordenar por fecha
-    solicitudes = solicitudes.order_by('-fecha_solicitud')
-    
-    # Paginación
-    paginator = Paginator(solicitudes, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Estadísticas rápidas
-    stats = {
-        'pendientes': SolicitudCambioPlan.objects.filter(estado='pendiente').count(),
-        'procesadas_hoy': SolicitudCambioPlan.objects.filter(
-            estado='procesada',
-            fecha_procesada__date=timezone.now().date()
-        ).count(),
-    }
+    # Paginación por cursor (fecha_solicitud, id)
+    cursor = request.GET.get('cursor')
+    try:
+        pagina = paginar_keyset(solicitudes, 'fecha_solicitud', cursor, SOLICITUDES_POR_PAGINA)
+    except CursorInvalido:
+        cursor = None
+        pagina = paginar_keyset(solicitudes, 'fecha_solicitud', None, SOLICITUDES_POR_PAGINA)
     
     context = {
-        'page_obj': page_obj,
+        'pagina': pagina,
+        'siguiente_url': _url_siguiente_pagina(request, pagina),
         'filtro_estado': filtro_estado,
         'filtro_tipo': filtro_tipo,
         'busqueda': busqueda,
+    }
+    
+    # "Cargar más" con HTMX: solo las solicitudes siguientes
+    if cursor and request.headers.get('HX-Request'):
+        return render(request, 'usuarios/partials/pagina_solicitudes.html', context)
+    
+    stats = estadisticas_solicitudes()
+    if filtro_estado or filtro_tipo or busqueda:
+        total_resultados = contar_cacheado(
+            solicitudes, f'solicitudes:{filtro_estado}:{filtro_tipo}:{busqueda}'
+        )
+    else:
+        total_resultados = stats['total']
+    
+    context.update({
+        'total_resultados': total_resultados,
         'stats': stats,
         'estados': SolicitudCambioPlan.ESTADO_CHOICES,
         'tipos': SolicitudCambioPlan.TIPO_SOLICITUD,
-    }
+    })
     
     return render(request, 'usuarios/gestionar_solicitudes.html', context)
 
@@ -468,14 +477,11 @@ def buscar_usuarios_view(request):
             tipo_usuario='usuario'
         ).order_by('-fecha_registro')[:10]
     else:
-        # Búsqueda activa
-        usuarios = Usuario.objects.filter(
-            tipo_usuario='usuario'
-        ).filter(
-            Q(nombre__icontains=busqueda) |
-            Q(apellidos__icontains=busqueda) |
-            Q(email__icontains=busqueda)
-        ).order_by('-fecha_registro')[:20]
+        # Búsqueda activa, con los resultados más parecidos primero
+        usuarios = buscar_usuarios(
+            Usuario.objects.filter(tipo_usuario='usuario'),
+            busqueda
+        )[:20]
     
     return render(request, 'usuarios/partials/lista_usuarios.html', {
         'usuarios': usuarios,
@@ -506,7 +512,7 @@ def cambiar_plan_usuario_view(request):
         usuario.save()
         
         # Enviar email de cambio de plan
-        enviar_email_cambio_plan(usuario, plan_anterior, nuevo_plan)
+        notificar_cambio_plan(usuario, plan_anterior, nuevo_plan)
         
         # Renderizar solo la tarjeta actualizada
         html = render_to_string('usuarios/partials/user_card.html', {
@@ -531,166 +537,61 @@ def gestionar_usuarios_view(request):
         messages.error(request, 'No tienes permisos para acceder a esta página.')
         return redirect('usuarios:dashboard')
     
-    # Obtener usuarios con paginación
-    usuarios = Usuario.objects.filter(tipo_usuario='usuario').order_by('-fecha_registro')
-    paginator = Paginator(usuarios, 20)  # 20 usuarios por página
+    busqueda = request.GET.get('busqueda', '').strip()
+    filtro_plan = request.GET.get('plan', '')
     
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    context = {
-        'page_obj': page_obj,
-        'form_buscar': BuscarUsuarioForm(),
-        'total_usuarios': usuarios.count(),
-        'usuarios_pro': usuarios.filter(plan='pro').count(),
-        'usuarios_gratuitos': usuarios.filter(plan='gratuito').count()
-    }
-    
-    return render(request, 'usuarios/gestionar_usuarios.html', context)
-
-
-# ============================================================================
-# FUNCIONES AUXILIARES PARA EMAILS
-# ============================================================================
-
-def enviar_email_bienvenida(usuario):
-    """
-    Envía email de bienvenida a nuevo usuario.
-    """
-    asunto = f'¡Bienvenido a Campayo, {usuario.nombre}!'
-    mensaje_html = render_to_string('usuarios/emails/bienvenida.html', {
-        'usuario': usuario,
-        'login_url': getattr(settings, 'SITE_URL', 'http://localhost:8000') + reverse('usuarios:login'),
-        'dashboard_url': getattr(settings, 'SITE_URL', 'http://localhost:8000') + reverse('usuarios:dashboard'),
-    })
-    mensaje_texto = render_to_string('usuarios/emails/bienvenida.txt', {
-        'usuario': usuario,
-        'dashboard_url': getattr(settings, 'SITE_URL', 'http://localhost:8000') + reverse('usuarios:dashboard'),
-    })
+    usuarios = filtrar_usuarios_para_gestor(
+        Usuario.objects.filter(tipo_usuario='usuario'),
+        {'busqueda': busqueda, 'plan': filtro_plan}
+    )
     
+    # Paginación por cursor (fecha_registro, id)
+    cursor = request.GET.get('cursor')
     try:
-        send_mail(
-            asunto,
-            mensaje_texto,
-            getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@campayo.com'),
-            [usuario.email],
-            html_message=mensaje_html,
-            fail_silently=True
-        )
-        logger.info(f"✓ Email de bienvenida enviado a {usuario.email}")
-    except Exception as e:
-        logger.error(f"✗ Error enviando email de bienvenida a {usuario.email}: {e}")
-
-
-def enviar_email_nueva_solicitud_gestor(solicitud):
-    """
-    Envía email a todos los gestores cuando hay una nueva solicitud.
-    """
-    # Obtener todos los gestores
-    gestores = Usuario.objects.filter(tipo_usuario='gestor', is_active=True)
-    
-    if not gestores.exists():
-        logger.warning("No hay gestores activos para notificar la nueva solicitud")
-        return
+        pagina = paginar_keyset(usuarios, 'fecha_registro', cursor, USUARIOS_POR_PAGINA)
+    except CursorInvalido:
+        cursor = None
+        pagina = paginar_keyset(usuarios, 'fecha_registro', None, USUARIOS_POR_PAGINA)
     
-    emails_gestores = [gestor.email for gestor in gestores]
-    
-    asunto = f'Nueva solicitud de {solicitud.get_tipo_solicitud_display().lower()} - {solicitud.usuario.nombre_completo}'
-    
-    contexto = {
-        'solicitud': solicitud,
-        'gestionar_url': getattr(settings, 'SITE_URL', 'http://localhost:8000') + reverse('usuarios:gestionar_solicitudes'),
+    context = {
+        'pagina': pagina,
+        'siguiente_url': _url_siguiente_pagina(request, pagina),
+        'busqueda': busqueda,
+        'filtro_plan': filtro_plan,
     }
     
-    mensaje_html = render_to_string('usuarios/emails/nueva_solicitud_gestor.html', contexto)
-    mensaje_texto = render_to_string('usuarios/emails/nueva_solicitud_gestor.txt', contexto)
-    
-    try:
-        send_mail(
-            asunto,
-            mensaje_texto,
-            getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@campayo.com'),
-            emails_gestores,
-            html_message=mensaje_html,
-            fail_silently=True
-        )
-        logger.info(f"✓ Email de nueva solicitud enviado a {len(emails_gestores)} gestores")
-    except Exception as e:
-        logger.error(f"✗ Error enviando email de nueva solicitud a gestores: {e}")
-
-
-def enviar_email_resultado_solicitud_usuario(solicitud, aprobada):
-    """
-    Envía email al usuario notificando el resultado de su solicitud.
-    """
-    usuario = solicitud.usuario
+    # "Cargar más" con HTMX: solo los usuarios siguientes
+    if cursor and request.headers.get('HX-Request'):
+        return render(request, 'usuarios/partials/pagina_usuarios.html', context)
     
-    if aprobada:
-        asunto = f'¡Tu plan ha sido actualizado a {usuario.get_plan_display()}! - Campayo'
+    stats = estadisticas_usuarios()
+    if busqueda or filtro_plan:
+        total_resultados = contar_cacheado(usuarios, f'usuarios:{filtro_plan}:{busqueda}')
     else:
-        asunto = 'Solicitud de cambio de plan procesada - Campayo'
-    
-    contexto = {
-        'usuario': usuario,
-        'solicitud': solicitud,
-        'aprobada': aprobada,
-        'dashboard_url': getattr(settings, 'SITE_URL', 'http://localhost:8000') + reverse('usuarios:dashboard'),
-    }
-    
-    mensaje_html = render_to_string('usuarios/emails/resultado_solicitud_usuario.html', contexto)
-    mensaje_texto = render_to_string('usuarios/emails/resultado_solicitud_usuario.txt', contexto)
+        total_resultados = stats['total_usuarios']
+    
+    context.update({
+        'form_buscar': BuscarUsuarioForm(initial={'busqueda': busqueda}),
+        'planes': Usuario.PLAN,
+        'total_resultados': total_resultados,
+        'total_usuarios': stats['total_usuarios'],
+        'usuarios_pro': stats['usuarios_pro'],
+        'usuarios_gratuitos': stats['usuarios_gratuitos'],
+    })
     
-    try:
-        send_mail(
-            asunto,
-            mensaje_texto,
-            getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@campayo.com'),
-            [usuario.email],
-            html_message=mensaje_html,
-            fail_silently=True
-        )
-        status = "aprobada" if aprobada else "rechazada"
-        logger.info(f"✓ Email de solicitud {status} enviado a {usuario.email}")
-    except Exception as e:
-        logger.error(f"✗ Error enviando email de resultado a {usuario.email}: {e}")
+    return render(request, 'usuarios/gestionar_usuarios.html', context)
 
 
-def enviar_email_cambio_plan(usuario, plan_anterior, plan_nuevo):
+def _url_siguiente_pagina(request, pagina):
     """
-    Envía email de notificación de cambio de plan directo por gestor.
+    URL de la página siguiente de un listado paginado por cursor, con los
+    mismos filtros que la petición actual. None si es la última.
     """
-    asunto = f'Tu plan ha sido actualizado a {plan_nuevo.title()} - Campayo'
-    
-    contexto = {
-        'usuario': usuario,
-        'plan_anterior': plan_anterior,
-        'plan_nuevo': plan_nuevo,
-        'dashboard_url': getattr(settings, 'SITE_URL', 'http://localhost:8000') + reverse('usuarios:dashboard'),
-    }
-    
-    mensaje_html = render_to_string('usuarios/emails/resultado_solicitud_usuario.html', {
-        **contexto,
-        'aprobada': True,
-        'solicitud': None,
-    })
-    mensaje_texto = render_to_string('usuarios/emails/resultado_solicitud_usuario.txt', {
-        **contexto,
-        'aprobada': True,
-        'solicitud': None,
-    })
-    
-    try:
-        send_mail(
-            asunto,
-            mensaje_texto,
-            getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@campayo.com'),
-            [usuario.email],
-            html_message=mensaje_html,
-            fail_silently=True
-        )
-        logger.info(f"✓ Email de cambio de plan enviado a {usuario.email}")
-    except Exception as e:
-        logger.error(f"✗ Error enviando email de cambio de plan a {usuario.email}: {e}")
+    if not pagina.has_next:
+        return None
+    parametros = request.GET.copy()
+    parametros['cursor'] = pagina.siguiente_cursor
+    return f"{request.path}?{parametros.urlencode()}"
 
 
 # ============================================================================